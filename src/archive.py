@@ -0,0 +1,341 @@
+import abc
+import bz2
+import dataclasses
+import gzip
+import lzma
+import tarfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from stat import S_ISLNK
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+
+from content_index import ContentEntry, hash_chunks
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bytes read from an archive at a time when hashing or streaming a member
+ARCHIVE_CHUNK_SIZE = 1 << 20
+
+# Members read while the archive is indexed, so that ignore rules never send
+# a compressed tar back to its start
+_PRELOADED_NAMES = frozenset({".gitignore"})
+
+# Leading bytes of the compressed streams a tar may be wrapped in
+_COMPRESSION_MAGIC = (
+    (b"\x1f\x8b", "gz"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zst"),
+)
+
+_DECOMPRESSION_ERRORS: tuple = (tarfile.TarError, EOFError, OSError, lzma.LZMAError)
+if zstandard is not None:
+    _DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+
+@dataclass(frozen=True, slots=True)
+class ArchiveMember:
+    """A regular file inside an archive."""
+
+    size: int
+    mtime_ns: int
+    # Offset of the content in the (decompressed) tar stream; unused for zip
+    offset: int
+    # Content hash, if computed while indexing
+    digest: Optional[str] = None
+
+
+def _member_path(name: str) -> Optional[str]:
+    """
+    Normalizes a member name to a "/"-separated relative path, or returns
+    None for names that would point outside the archive.
+    """
+    parts = [
+        part for part in name.replace("\\", "/").split("/") if part not in ("", ".")
+    ]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+class Archive(abc.ABC):
+    """
+    The regular files of an archive, readable without extracting it.
+
+    members maps "/"-separated paths to ArchiveMember in archive order.
+    Directories, links and special files are not members. Reads are safe
+    from several threads.
+    """
+
+    # False if reading members out of order is costly
+    random_access = True
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.members: Dict[str, ArchiveMember] = {}
+
+    def _member(self, path: str) -> ArchiveMember:
+        """Looks up a member, raising FileNotFoundError if there is none."""
+        member = self.members.get(path)
+        if member is None:
+            raise FileNotFoundError(f"No such file in {self.path}: {path}")
+        return member
+
+    @abc.abstractmethod
+    def read(self, path: str, limit: Optional[int] = None) -> bytes:
+        """
+        Reads a member's content.
+
+        Args:
+            path: "/"-separated path of the member.
+            limit: Maximum number of bytes to read, or None for all of it.
+
+        Returns:
+            The content.
+
+        Raises:
+            OSError: If the member does not exist or cannot be read.
+        """
+
+    @abc.abstractmethod
+    def iter_chunks(
+        self, path: str, chunk_size: int = ARCHIVE_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Yields a member's content in chunks of at most chunk_size bytes.
+
+        Raises:
+            OSError: If the member does not exist or cannot be read.
+        """
+
+    def content_entry(self, path: str) -> ContentEntry:
+        """
+        Returns the content hash of a member, hashing it on first use.
+
+        Raises:
+            OSError: If the member does not exist or cannot be read.
+        """
+        member = self._member(path)
+        if member.digest is None:
+            entry = hash_chunks(self.iter_chunks(path), member.size, member.mtime_ns)
+            member = dataclasses.replace(member, digest=entry.digest)
+            self.members[path] = member
+        return ContentEntry(member.size, member.mtime_ns, member.digest)
+
+    def close(self) -> None:
+        """Releases the open archive file."""
+
+
+class ZipArchive(Archive):
+    """A zip archive, such as a wheel. Members are read independently."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        super().__init__(path)
+        try:
+            self._zip = zipfile.ZipFile(self.path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise ValueError(f"Cannot read archive {path}: {e}") from e
+        self._infos: Dict[str, zipfile.ZipInfo] = {}
+        for info in self._zip.infolist():
+            member_path = _member_path(info.filename)
+            if member_path is None or info.is_dir():
+                continue
+            if S_ISLNK(info.external_attr >> 16):
+                continue
+            self.members[member_path] = ArchiveMember(
+                info.file_size, self._mtime_ns(info), info.header_offset
+            )
+            self._infos[member_path] = info
+
+    @staticmethod
+    def _mtime_ns(info: zipfile.ZipInfo) -> int:
+        """Converts a member's local-time timestamp, 0 if it is invalid."""
+        try:
+            return int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+        except (OverflowError, ValueError):
+            return 0
+
+    def read(self, path: str, limit: Optional[int] = None) -> bytes:
+        self._member(path)
+        with self._zip.open(self._infos[path]) as f:
+            return f.read() if limit is None else f.read(limit)
+
+    def iter_chunks(
+        self, path: str, chunk_size: int = ARCHIVE_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        self._member(path)
+        with self._zip.open(self._infos[path]) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+class TarArchive(Archive):
+    """
+    A tar archive, optionally compressed with gzip, bzip2, xz or zstd.
+
+    The archive is read once up front to index its members. A compressed
+    tar has no random access, so members are then read from a single shared
+    stream that only moves forward: reading members in archive order, which
+    is the order FileGetter lists them in, decompresses the archive once
+    more in total, while going back to an earlier member starts over from
+    the beginning. Content hashes are computed during indexing in that case,
+    since the content is decompressed anyway.
+    """
+
+    def __init__(self, path: Union[str, Path], compression: Optional[str]) -> None:
+        """
+        Indexes the archive at path.
+
+        Args:
+            path: Location of the archive.
+            compression: "gz", "bz2", "xz" or "zst", or None for a plain tar.
+
+        Raises:
+            ValueError: If the archive cannot be read, or is compressed with
+                zstd and the zstandard package is not installed.
+        """
+        super().__init__(path)
+        if compression == "zst" and zstandard is None:
+            raise ValueError(
+                f"Reading {path} requires the zstandard package (pip install zstandard)"
+            )
+        self.compression = compression
+        self.random_access = compression is None
+        self._preloaded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        # Shared read stream and its position in the uncompressed tar
+        self._stream: Optional[BinaryIO] = None
+        self._position = 0
+        try:
+            with self._open_stream() as stream:
+                # Stream mode reads a compressed tar front to back only once
+                mode = "r:" if self.random_access else "r|"
+                with tarfile.open(fileobj=stream, mode=mode) as tar:
+                    for info in tar:
+                        self._add_member(tar, info)
+        except _DECOMPRESSION_ERRORS as e:
+            raise ValueError(f"Cannot read archive {path}: {e}") from e
+
+    def _open_stream(self) -> BinaryIO:
+        """Opens the uncompressed tar stream at its start."""
+        if self.compression == "gz":
+            return gzip.open(self.path, "rb")
+        if self.compression == "bz2":
+            return bz2.open(self.path, "rb")
+        if self.compression == "xz":
+            return lzma.open(self.path, "rb")
+        if self.compression == "zst":
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(self.path, "rb"), closefd=True
+            )
+        return open(self.path, "rb")
+
+    def _add_member(self, tar: tarfile.TarFile, info: tarfile.TarInfo) -> None:
+        """Records a member found while indexing."""
+        member_path = _member_path(info.name)
+        if member_path is None or not info.isreg() or info.sparse is not None:
+            return
+        mtime_ns = int(info.mtime * 1_000_000_000)
+        preload = member_path.rpartition("/")[2] in _PRELOADED_NAMES
+        digest = None
+        if preload or not self.random_access:
+            f = tar.extractfile(info)
+            if preload:
+                self._preloaded[member_path] = f.read()
+                chunks: Iterator[bytes] = iter([self._preloaded[member_path]])
+            else:
+                chunks = iter(lambda: f.read(ARCHIVE_CHUNK_SIZE), b"")
+            digest = hash_chunks(chunks, info.size, mtime_ns).digest
+        # A later entry for the same path replaces the earlier one, as when
+        # extracting
+        self.members.pop(member_path, None)
+        self.members[member_path] = ArchiveMember(
+            info.size, mtime_ns, info.offset_data, digest
+        )
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        """Reads from the shared stream. The caller holds the lock."""
+        if self._stream is None or (offset < self._position and not self.random_access):
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = self._open_stream()
+            self._position = 0
+        self._stream.seek(offset)
+        data = self._stream.read(size)
+        self._position = offset + len(data)
+        if len(data) < size:
+            raise OSError(f"Unexpected end of archive {self.path}")
+        return data
+
+    def read(self, path: str, limit: Optional[int] = None) -> bytes:
+        member = self._member(path)
+        preloaded = self._preloaded.get(path)
+        if preloaded is not None:
+            return preloaded if limit is None else preloaded[:limit]
+        size = member.size if limit is None else min(limit, member.size)
+        with self._lock:
+            return self._read_at(member.offset, size)
+
+    def iter_chunks(
+        self, path: str, chunk_size: int = ARCHIVE_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        member = self._member(path)
+        preloaded = self._preloaded.get(path)
+        if preloaded is not None:
+            yield preloaded
+            return
+        done = 0
+        while done < member.size:
+            with self._lock:
+                chunk = self._read_at(
+                    member.offset + done, min(chunk_size, member.size - done)
+                )
+            done += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+
+def open_archive(path: Union[str, Path]) -> Archive:
+    """
+    Opens a zip or tar archive, detecting the format from its content.
+
+    Args:
+        path: Location of the archive: a zip (including wheels) or a tar,
+            plain or compressed with gzip, bzip2, xz or zstd.
+
+    Returns:
+        The indexed archive.
+
+    Raises:
+        ValueError: If the file is not a supported archive or cannot be read.
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            return ZipArchive(path)
+        with open(path, "rb") as f:
+            head = f.read(6)
+    except OSError as e:
+        raise ValueError(f"Cannot read archive {path}: {e}") from e
+    for magic, compression in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return TarArchive(path, compression)
+    if not tarfile.is_tarfile(path):
+        raise ValueError(f"Not a zip or tar archive: {path}")
+    return TarArchive(path, None)
@@ -0,0 +1,130 @@
+import asyncio
+import functools
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List, Optional, Union
+
+from file_getter import FileGetter
+
+# Paths handed from the walk thread to the event loop at a time
+DEFAULT_BATCH_SIZE = 256
+
+
+def _next_batch(paths: Iterator[str], size: int) -> List[str]:
+    """Pulls up to size paths from a walk; an empty list means it is done."""
+    batch: List[str] = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+class AsyncFileGetter:
+    """
+    An asyncio front end to FileGetter.
+
+    Walking and reading run on an executor, never on the event loop. The walk
+    is pulled in batches, with the next batch read ahead while the caller
+    handles the current one, so at most two batches of paths are held at a
+    time and a caller that stops early stops the walk.
+    """
+
+    def __init__(
+        self,
+        file_getter: FileGetter,
+        executor: Optional[Executor] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """
+        Wraps an existing FileGetter.
+
+        Args:
+            file_getter: The FileGetter doing the work.
+            executor: Executor for blocking calls. Defaults to the event
+                loop's default executor.
+            batch_size: Number of paths handed over per executor call.
+        """
+        self.file_getter = file_getter
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+
+    @classmethod
+    async def open(
+        cls,
+        repo_path: Union[str, Path] = ".",
+        executor: Optional[Executor] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        **kwargs: Any,
+    ) -> "AsyncFileGetter":
+        """
+        Creates the FileGetter on the executor, since loading ignore rules
+        reads files.
+
+        Args:
+            repo_path: Path to the repository root.
+            executor: Executor for blocking calls.
+            batch_size: Number of paths handed over per executor call.
+            **kwargs: Further FileGetter arguments.
+
+        Raises:
+            ValueError: If the repository path doesn't exist or isn't a directory.
+        """
+        loop = asyncio.get_running_loop()
+        file_getter = await loop.run_in_executor(
+            executor, functools.partial(FileGetter, repo_path, **kwargs)
+        )
+        return cls(file_getter, executor, batch_size)
+
+    async def _run(self, function: Any, *args: Any) -> Any:
+        """Runs a blocking call on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def aiter_file_paths(self, relative: bool = False) -> AsyncIterator[str]:
+        """
+        Yields file paths as the repository is walked on the executor.
+
+        Args:
+            relative: If True, yields paths relative to repo_path. If False,
+                yields absolute paths.
+
+        Yields:
+            File paths as strings, in the order of iter_file_paths().
+        """
+        paths = self.file_getter.iter_file_paths(relative)
+        next_batch = asyncio.ensure_future(
+            self._run(_next_batch, paths, self.batch_size)
+        )
+        try:
+            while True:
+                # Shielded so a cancelled caller still waits for the pull
+                batch = await asyncio.shield(next_batch)
+                if not batch:
+                    return
+                # Walk on while the caller works through this batch
+                next_batch = asyncio.ensure_future(
+                    self._run(_next_batch, paths, self.batch_size)
+                )
+                for path in batch:
+                    yield path
+        finally:
+            # The generator must not be closed while a batch is being pulled
+            await asyncio.wait([next_batch])
+            if not next_batch.cancelled():
+                next_batch.exception()
+            await self._run(paths.close)
+
+    async def aget_file_paths(self, relative: bool = False) -> List[str]:
+        """Returns the list of file paths, walking on the executor."""
+        return await self._run(self.file_getter.get_file_paths, relative)
+
+    async def aread_file_text(self, file_path: Union[str, Path]) -> Optional[str]:
+        """
+        Reads a file as text on the executor; see FileGetter.read_file_text.
+
+        Raises:
+            UnicodeDecodeError: If the file cannot be decoded as UTF-8.
+            PermissionError: If there are insufficient permissions to read the file.
+        """
+        return await self._run(self.file_getter.read_file_text, file_path)
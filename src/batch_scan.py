@@ -0,0 +1,300 @@
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from count_tokens import TokenCounter
+from file_getter import FileGetter, parse_pattern_list
+from result_cache import ResultCache
+
+# Repositories scanned at once by default
+DEFAULT_REPO_WORKERS = 4
+
+
+@dataclass
+class RepoReport:
+    """The outcome of scanning one repository."""
+
+    repo_path: str
+    file_count: int = 0
+    total_tokens: int = 0
+    # Files left uncounted because they are binary, oversized or unreadable
+    skipped_files: int = 0
+    # Name of the scan budget that stopped the walk early, if one did
+    truncated_by: Optional[str] = None
+    # Why the repository could not be scanned at all
+    error: Optional[str] = None
+    # Token count of each file, keyed by path relative to repo_path, if
+    # requested
+    token_counts: Optional[Dict[str, Optional[int]]] = None
+
+    def to_dict(self) -> dict:
+        """Returns the report as a JSON-serializable dictionary."""
+        report = {
+            "files": self.file_count,
+            "tokens": self.total_tokens,
+            "skipped": self.skipped_files,
+            "truncated_by": self.truncated_by,
+            "error": self.error,
+        }
+        if self.token_counts is not None:
+            report["token_counts"] = self.token_counts
+        return report
+
+
+def scan_repository(
+    repo_path: str,
+    model: str = "gpt-4o",
+    result_cache: Optional[ResultCache] = None,
+    per_file: bool = False,
+    **file_getter_kwargs,
+) -> RepoReport:
+    """
+    Count the tokens in one repository.
+
+    Errors are recorded in the report instead of raised, so that one broken
+    repository does not stop a batch.
+
+    Args:
+        repo_path: Path to the repository root or an archive
+        model: Name of the model whose encoding to count with
+        result_cache: Store of counts keyed by content hash, shared between
+            repositories
+        per_file: Whether to keep each file's count in the report
+        **file_getter_kwargs: FileGetter arguments, such as patterns and
+            scan budgets
+
+    Returns:
+        The repository's report
+    """
+    try:
+        file_getter = FileGetter(repo_path, **file_getter_kwargs)
+        counter = TokenCounter(
+            model=model, file_getter=file_getter, result_cache=result_cache
+        )
+        token_counts = counter.count_all_files()
+    except Exception as e:
+        return RepoReport(repo_path, error=f"{type(e).__name__}: {e}")
+
+    root = Path(file_getter.repo_path)
+    return RepoReport(
+        repo_path,
+        file_count=len(token_counts),
+        total_tokens=sum(count for count in token_counts.values() if count),
+        skipped_files=sum(1 for count in token_counts.values() if count is None),
+        truncated_by=file_getter.truncated_by,
+        token_counts=(
+            {
+                Path(path).relative_to(root).as_posix(): count
+                for path, count in token_counts.items()
+            }
+            if per_file
+            else None
+        ),
+    )
+
+
+def scan_repositories(
+    repo_paths: Iterable[str],
+    model: str = "gpt-4o",
+    max_workers: int = DEFAULT_REPO_WORKERS,
+    result_cache: Optional[ResultCache] = None,
+    per_file: bool = False,
+    **file_getter_kwargs,
+) -> Dict[str, RepoReport]:
+    """
+    Count the tokens in many repositories concurrently in one process.
+
+    The common ignore patterns and any include/exclude patterns are compiled
+    once and shared by every scan. So is the encoding, through tiktoken's
+    registry: it is loaded once, and only if some file is not in the result
+    cache. tiktoken releases the GIL while encoding, so repositories are
+    scanned on a thread pool.
+
+    Args:
+        repo_paths: Paths to repository roots or archives; duplicates are
+            scanned once
+        model: Name of the model whose encoding to count with
+        max_workers: Number of repositories scanned at once
+        result_cache: Store of counts keyed by content hash, shared between
+            repositories
+        per_file: Whether to keep each file's count in the reports
+        **file_getter_kwargs: FileGetter arguments applied to every
+            repository
+
+    Returns:
+        Report of each repository, keyed by its path as given, in the order
+        of repo_paths
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            repo_path: executor.submit(
+                scan_repository,
+                repo_path,
+                model,
+                result_cache,
+                per_file,
+                **file_getter_kwargs,
+            )
+            for repo_path in dict.fromkeys(repo_paths)
+        }
+        reports = {repo_path: future.result() for repo_path, future in futures.items()}
+    if result_cache is not None:
+        result_cache.flush()
+    return reports
+
+
+def read_repo_list(path: str) -> List[str]:
+    """
+    Read repository paths from a file, one per line. Blank lines and lines
+    starting with "#" are skipped.
+
+    Args:
+        path: Path to the file, or "-" for standard input
+
+    Returns:
+        List of repository paths
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def combined_report(reports: Dict[str, RepoReport], model: str) -> dict:
+    """
+    Combine per-repository reports into one JSON-serializable report.
+
+    Args:
+        reports: Report of each repository, keyed by path
+        model: Name of the model the counts are for
+
+    Returns:
+        Dictionary with the totals and a "repos" entry keyed by path
+    """
+    return {
+        "model": model,
+        "repos_scanned": len(reports),
+        "repos_failed": sum(1 for report in reports.values() if report.error),
+        "total_files": sum(report.file_count for report in reports.values()),
+        "total_tokens": sum(report.total_tokens for report in reports.values()),
+        "repos": {path: report.to_dict() for path, report in reports.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Count tokens in many repositories in one process."
+    )
+    parser.add_argument(
+        "repo_paths",
+        nargs="*",
+        help="Paths to repositories or archives",
+    )
+    parser.add_argument(
+        "--repo-list",
+        metavar="FILE",
+        help='File listing repository paths, one per line ("-" for stdin)',
+    )
+    parser.add_argument(
+        "--model",
+        default="gpt-4o",
+        help="Model whose encoding to count with (default: gpt-4o)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_REPO_WORKERS,
+        help="Number of repositories scanned at once "
+        f"(default: {DEFAULT_REPO_WORKERS})",
+    )
+    parser.add_argument(
+        "--include",
+        type=parse_pattern_list,
+        help='Comma-separated glob patterns to include. Example: "*.py,src/**/*.js"',
+    )
+    parser.add_argument(
+        "--exclude",
+        type=parse_pattern_list,
+        help='Comma-separated glob patterns to exclude. Example: "test_*.py"',
+    )
+    parser.add_argument(
+        "--git-index",
+        action="store_true",
+        help="List the files tracked in the git index instead of walking the tree",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        help="Stop scanning a repository after this many files",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        help="Stop scanning a repository after this many seconds",
+    )
+    parser.add_argument(
+        "--result-cache",
+        action="store_true",
+        help="Reuse counts of file contents seen in earlier runs",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for persistent caches (default: ~/.cache/eye-or)",
+    )
+    parser.add_argument(
+        "--per-file",
+        action="store_true",
+        help="Include each file's token count in the report",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Path to save the combined report as JSON (default: stdout)",
+    )
+
+    args = parser.parse_args()
+    repo_paths = list(args.repo_paths)
+    if args.repo_list:
+        repo_paths.extend(read_repo_list(args.repo_list))
+    if not repo_paths:
+        parser.error("no repositories given")
+
+    result_cache = ResultCache.open(args.cache_dir) if args.result_cache else None
+    reports = scan_repositories(
+        repo_paths,
+        model=args.model,
+        max_workers=args.workers,
+        result_cache=result_cache,
+        per_file=args.per_file,
+        include_patterns=args.include,
+        exclude_patterns=args.exclude,
+        use_git_index=args.git_index,
+        cache_dir=args.cache_dir,
+        content_index=args.result_cache,
+        max_files=args.max_files,
+        time_limit=args.time_limit,
+    )
+    if result_cache is not None:
+        result_cache.close()
+
+    for path, report in reports.items():
+        if report.error:
+            print(f"Error scanning {path}: {report.error}", file=sys.stderr)
+
+    report = json.dumps(combined_report(reports, args.model), indent=2)
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+# Entries for files or directories modified this close to the start of a run
+# are not persisted: a later change in the same timestamp tick would leave
+# their size and mtime unchanged.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def default_cache_dir() -> Path:
+    """
+    Returns the directory for persistent caches: $EYE_OR_CACHE_DIR if set,
+    otherwise eye-or under $XDG_CACHE_HOME or ~/.cache.
+    """
+    override = os.environ.get("EYE_OR_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "eye-or"
+
+
+def cache_file_for(
+    repo_path: Union[str, Path],
+    name: str,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    Returns the path of a per-repository cache file.
+
+    Args:
+        repo_path: Repository the cache belongs to.
+        name: File name of the cache, e.g. "scan.json".
+        cache_dir: Cache directory, or None for default_cache_dir().
+
+    Returns:
+        Path inside a directory named after a hash of the resolved repo path.
+    """
+    root = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    key = hashlib.blake2b(
+        str(Path(repo_path).resolve()).encode("utf-8", "surrogateescape"),
+        digest_size=16,
+    ).hexdigest()
+    return root / key / name
+
+
+def load_cache_file(path: Path, version: int, key: str) -> dict:
+    """
+    Reads the entries of a versioned JSON cache file.
+
+    Args:
+        path: Location of the cache file.
+        version: Format version the caller understands.
+        key: Name of the section holding the entries.
+
+    Returns:
+        The entries, or an empty dict if the file is missing, unreadable or
+        of another version.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != version:
+        return {}
+    return data.get(key, {})
+
+
+def write_cache_file(path: Path, version: int, key: str, entries: dict) -> None:
+    """
+    Atomically replaces a versioned JSON cache file. Errors are ignored, as
+    a cache that cannot be written is only a missed speed-up.
+
+    Args:
+        path: Location of the cache file.
+        version: Format version of the entries.
+        key: Name of the section holding the entries.
+        entries: JSON-serializable entries.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # json.dumps uses the C encoder; json.dump streams in Python
+            f.write(
+                json.dumps({"version": version, key: entries}, separators=(",", ":"))
+            )
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Union
+
+from cache_dir import (
+    RACY_WINDOW_NS,
+    cache_file_for,
+    load_cache_file,
+    write_cache_file,
+)
+
+CONTENT_INDEX_VERSION = 1
+
+# Bytes hashed per read; large enough that hashlib releases the GIL
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True, slots=True)
+class ContentEntry:
+    """
+    The content hash of a file, with the size and mtime it was taken at.
+    """
+
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def hash_file(path: Union[str, Path]) -> ContentEntry:
+    """
+    Hashes a file's content with BLAKE2b.
+
+    The size and mtime are taken from the open file, so they describe the
+    content that was hashed even if the file is replaced meanwhile.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        The file's ContentEntry.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(_HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        stat = os.fstat(f.fileno())
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return ContentEntry(stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+
+
+def hash_chunks(chunks: Iterable[bytes], size: int, mtime_ns: int) -> ContentEntry:
+    """
+    Hashes content that does not come from a file on disk, such as an
+    archive member, the same way hash_file does.
+
+    Args:
+        chunks: The content, in order.
+        size: Size to record for the content.
+        mtime_ns: Modification time to record for the content.
+
+    Returns:
+        The content's ContentEntry.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(chunk)
+    return ContentEntry(size, mtime_ns, digest.hexdigest())
+
+
+class ContentIndex:
+    """
+    A persistent map from file paths to content hashes.
+
+    A stored hash is reused as long as the file's size and mtime are
+    unchanged, so only new and modified files are read again. The digest is
+    a key for anything derived from a file's content: results cached under
+    it stay valid across renames and across runs.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        """
+        Loads the index at path, starting empty if it is missing or stale.
+
+        Args:
+            path: Location of the index file, or None to keep the index in
+                memory only.
+        """
+        self.path = Path(path) if path is not None else None
+        self.started_ns = time.time_ns()
+        self._entries: Dict[str, list] = self._load()
+        self._dirty = False
+
+    @classmethod
+    def for_repo(
+        cls, repo_path: Union[str, Path], cache_dir: Optional[Union[str, Path]] = None
+    ) -> "ContentIndex":
+        """Opens the content index of a repository in cache_dir."""
+        return cls(cache_file_for(repo_path, "content.json", cache_dir))
+
+    def _load(self) -> Dict[str, list]:
+        """Reads the index file, returning no entries if it is unusable."""
+        if self.path is None:
+            return {}
+        return load_cache_file(self.path, CONTENT_INDEX_VERSION, "files")
+
+    def lookup(self, relative_path: str, stat: os.stat_result) -> Optional[str]:
+        """
+        Returns the stored digest of a file if its size and mtime match.
+
+        Args:
+            relative_path: "/"-separated path relative to the repository.
+            stat: Current stat result of the file.
+
+        Returns:
+            The digest, or None on a miss.
+        """
+        entry = self._entries.get(relative_path)
+        if entry is None:
+            return None
+        size, mtime_ns, digest = entry
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        return digest
+
+    def store(self, relative_path: str, entry: ContentEntry) -> None:
+        """
+        Records the hash of a file.
+
+        Args:
+            relative_path: "/"-separated path relative to the repository.
+            entry: The file's freshly computed hash.
+        """
+        if entry.mtime_ns >= self.started_ns - RACY_WINDOW_NS:
+            # Too recent to trust size and mtime next time
+            if self._entries.pop(relative_path, None) is not None:
+                self._dirty = True
+            return
+        self._entries[relative_path] = [entry.size, entry.mtime_ns, entry.digest]
+        self._dirty = True
+
+    def discard(self, relative_path: str) -> None:
+        """Forgets a file, e.g. because it was deleted."""
+        if self._entries.pop(relative_path, None) is not None:
+            self._dirty = True
+
+    def prune(self, keep: Set[str]) -> None:
+        """Forgets every file not in keep, e.g. after a full scan."""
+        stale = [path for path in self._entries if path not in keep]
+        for path in stale:
+            del self._entries[path]
+        self._dirty = self._dirty or bool(stale)
+
+    def save(self) -> None:
+        """
+        Writes the index if it changed. Errors writing the file are ignored.
+        """
+        if self.path is None or not self._dirty:
+            return
+        write_cache_file(self.path, CONTENT_INDEX_VERSION, "files", self._entries)
+        self._dirty = False
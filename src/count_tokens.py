@@ -1,37 +1,259 @@
-from typing import Dict, Optional
+import asyncio
+import codecs
+import functools
+import itertools
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import tiktoken
 
-from .file_getter import FileGetter
+from async_file_getter import AsyncFileGetter
+from file_getter import DEFAULT_MMAP_THRESHOLD, FileGetter, ReadResult
+from file_kind import DEFAULT_MAX_FILE_SIZE, OVERSIZED, SNIFF_SIZE, TEXT, classify_head
+from result_cache import ResultCache
+from token_estimator import (
+    ESTIMATE_SAMPLE_BYTES,
+    ByteStats,
+    TokenEstimate,
+    TokenEstimator,
+    byte_stats,
+)
+from watcher import DELETED, FileChange
+
+# With several encoding threads, files are encoded in batches of at most this
+# many files or characters
+ENCODE_BATCH_FILES = 256
+ENCODE_BATCH_CHARS = 4 << 20
+
+# Files of each extension counted exactly to calibrate the estimator
+CALIBRATION_FILES_PER_EXTENSION = 8
+
+# Characters encoded at a time when counting a file as a stream
+STREAM_CHUNK_CHARS = 1 << 20
+
+# Places where the pre-tokenizers of cl100k_base and o200k_base always end a
+# piece, so text cut there encodes to the same tokens as the whole: after a
+# newline that is followed by neither whitespace nor "/" (o200k_base keeps
+# "/" after a newline with punctuation before it, as in ";\n//"), and before
+# a space between a non-space and a letter (a piece ending in whitespace
+# would merge it, as cl100k_base's "\s++$" does)
+_LINE_BOUNDARY = re.compile(r"\n(?=[^\s/])")
+_WORD_BOUNDARY = re.compile(r"(?<=\S) (?=[^\W\d_])")
+
+
+def _split_point(text: str, end: int) -> int:
+    """
+    Finds where to cut text, at most end characters in, so that the part
+    before the cut can be encoded on its own.
+
+    Line boundaries are preferred over word boundaries, and the last of
+    either kind is taken. Without any, the cut is made at end.
+    """
+    for pattern, offset in ((_LINE_BOUNDARY, 1), (_WORD_BOUNDARY, 0)):
+        # Search back from end in growing windows, as the last match is
+        # usually close to it
+        window = 4096
+        start = end
+        while start > 0:
+            start = max(0, end - window)
+            cut = 0
+            for match in pattern.finditer(text, start, end):
+                cut = match.start() + offset
+            if cut > 0:
+                return cut
+            window *= 4
+    return end
+
+
+def encoding_name_for(model: str = "gpt-4o") -> str:
+    """
+    Look up the name of the encoding a model uses, without loading it.
+
+    Args:
+        model: Name of the model, or of an encoding such as o200k_base
+
+    Returns:
+        The encoding's name, or cl100k_base if the model is unknown
+    """
+    if model in tiktoken.list_encoding_names():
+        return model
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        # Fallback to cl100k_base encoding if model not found
+        return "cl100k_base"
+
+
+def _cache_kind_for(encoding_name: str) -> str:
+    """Returns the result cache namespace of an encoding's counts."""
+    return f"tokens:{encoding_name}"
+
+
+def _extension(file_path: str) -> str:
+    """Returns the lower-case extension of a path, such as ".py"."""
+    return os.path.splitext(file_path)[1].lower()
+
+
+def _reserve_slots(
+    file_paths: Iterable[str], results: Dict[str, Any], empty: Callable[[], Any]
+) -> Iterator[str]:
+    """
+    Passes file paths on after giving each an empty result, so results keep
+    the listing order however the results come in later.
+
+    Args:
+        file_paths: Paths of the files, in listing order
+        results: Results keyed by path, filled in later
+        empty: Returns the placeholder result of a file
+    """
+    for file_path in file_paths:
+        results[file_path] = empty()
+        yield file_path
 
 
 class TokenCounter:
-    def __init__(self, repo_path: str = ".", model: str = "gpt-4o") -> None:
+    def __init__(
+        self,
+        repo_path: str = ".",
+        model: Union[str, Sequence[str]] = "gpt-4o",
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+        file_getter: Optional[FileGetter] = None,
+        result_cache: Optional[ResultCache] = None,
+        tokenizer: Optional[tiktoken.Encoding] = None,
+        num_threads: int = 1,
+        stream_large_files: bool = False,
+        estimate: bool = False,
+        cache_dir: Optional[Union[str, Path]] = None,
+    ) -> None:
         """
         Initialize TokenCounter with repository path and model name.
 
         Args:
             repo_path: Path to the repository root
-            model: Name of the model to use for tokenization (default: "gpt-4")
+            model: Name of the model to use for tokenization (default: "gpt-4"),
+                or of an encoding. A list of them is counted with at once by
+                count_all_encodings; everything else uses the first.
+            max_file_size: Files larger than this many bytes are skipped
+                (None for no limit)
+            file_getter: FileGetter to list and read files with, e.g. one
+                with patterns or scan budgets. Overrides repo_path and
+                max_file_size.
+            result_cache: Store of counts keyed by content hash and
+                encoding. Files whose content was counted before are neither
+                read nor encoded again, and the encoding is only loaded once
+                a file needs counting. Without file_getter, content hashes
+                are then persisted too, so unchanged files are recognized
+                by a stat.
+            tokenizer: Encoding to count with, e.g. one shared by several
+                counters. Overrides the first model.
+            num_threads: Number of threads encoding files in count_all_files.
+                Above 1, files are encoded in batches on all these threads
+                while the next files are being read.
+            stream_large_files: Count files over the file getter's
+                max_file_size with count_tokens_in_file_streaming instead
+                of skipping them.
+            estimate: Estimate counts in count_all_files and handle_change
+                from byte statistics instead of encoding files; see
+                estimate_tokens_in_file. count_tokens_in_file stays exact,
+                for files that need an exact count.
+            cache_dir: Directory for the persisted content hashes when
+                file_getter is not given. Defaults to the directory of
+                result_cache, so both caches live together.
+
+        Raises:
+            ValueError: If model is an empty list.
         """
-        self.file_getter = FileGetter(repo_path)
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(model)
-        except KeyError:
-            # Fallback to cl100k_base encoding if model not found
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        models = [model] if isinstance(model, str) else list(model)
+        if not models:
+            raise ValueError("At least one model is required")
+        if cache_dir is None and result_cache is not None:
+            cache_dir = result_cache.path.parent
+        self.file_getter = file_getter or FileGetter(
+            repo_path,
+            max_file_size=max_file_size,
+            cache_dir=cache_dir,
+            content_index=result_cache is not None,
+        )
+        self.model = models[0]
+        self.models = models
+        self.encoding_name = (
+            tokenizer.name if tokenizer is not None else encoding_name_for(models[0])
+        )
+        # Every encoding to count with in count_all_encodings, first one first
+        self.encoding_names = list(
+            dict.fromkeys([self.encoding_name, *map(encoding_name_for, models[1:])])
+        )
+        self._tokenizers: Dict[str, tiktoken.Encoding] = {}
+        if tokenizer is not None:
+            self._tokenizers[tokenizer.name] = tokenizer
+        self._tokenizer_lock = threading.Lock()
+        self.result_cache = result_cache
+        self.num_threads = max(1, num_threads)
+        self.stream_large_files = stream_large_files
+        self.estimate = estimate
+        # Uncalibrated until calibrate_estimator runs
+        self.estimator = TokenEstimator()
+        # Result of the last count_all_files, kept current by handle_change
+        self.token_counts: Dict[str, Optional[int]] = {}
+        # Files left uncounted because they are binary or oversized, with
+        # their classification
+        self.skipped_files: Dict[str, str] = {}
+        # Error bound of each estimated count in token_counts, 0 for files
+        # counted exactly
+        self.estimate_errors: Dict[str, int] = {}
+
+    @property
+    def tokenizer(self) -> tiktoken.Encoding:
+        """
+        The encoding, loaded on first use: a run answered entirely from the
+        result cache never loads it.
+        """
+        return self._load_encoding(self.encoding_name)
+
+    def _load_encoding(self, encoding_name: str) -> tiktoken.Encoding:
+        """Returns one of encoding_names, loading it on first use."""
+        tokenizer = self._tokenizers.get(encoding_name)
+        if tokenizer is None:
+            with self._tokenizer_lock:
+                tokenizer = self._tokenizers.get(encoding_name)
+                if tokenizer is None:
+                    tokenizer = tiktoken.get_encoding(encoding_name)
+                    self._tokenizers[encoding_name] = tokenizer
+        return tokenizer
 
     def count_tokens_in_text(self, text: str) -> int:
         """
         Count the number of tokens in a given text.
 
+        Text looking like a special token, such as <|endoftext|>, is counted
+        as ordinary text, as in every other counting path.
+
         Args:
             text: The text to count tokens for
 
         Returns:
             Number of tokens in the text
         """
-        return len(self.tokenizer.encode(text))
+        return len(self.tokenizer.encode_ordinary(text))
 
     def count_tokens_in_file(self, file_path: str) -> Optional[int]:
         """
@@ -41,12 +263,323 @@ class TokenCounter:
             file_path: Path to the file relative to repo root
 
         Returns:
-            Number of tokens in the file or None if file cannot be read
+            Number of tokens in the file or None if file cannot be read, is
+            binary or oversized, or is not valid UTF-8
         """
-        content = self.file_getter.read_file_text(file_path)
+        try:
+            content = self.file_getter.read_file_text(file_path)
+        except UnicodeDecodeError:
+            return None
         if content is not None:
             return self.count_tokens_in_text(content)
-        return None
+        return self._count_if_oversized(file_path)
+
+    def count_tokens_in_stream(
+        self,
+        chunks: Iterable[Union[bytes, memoryview]],
+        chunk_chars: int = STREAM_CHUNK_CHARS,
+    ) -> int:
+        """
+        Count the tokens in UTF-8 text given as a stream of byte chunks,
+        holding only about chunk_chars characters at a time.
+
+        The text is decoded incrementally, with universal newlines as in
+        read_file_text, and encoded in pieces of at most chunk_chars
+        characters. Pieces are cut after a newline followed by neither
+        whitespace nor "/", or failing that before a space between a
+        non-space and a letter. The pre-tokenizers of cl100k_base and
+        o200k_base split the text there anyway, so for them the sum is the
+        exact count of the whole text.
+        With the older r50k_base and p50k_base encodings, a cut after spaces
+        that end a line splits them from the newline, so the sum may differ
+        from the exact count by about one token per piece. A piece is only cut
+        elsewhere if chunk_chars characters hold no such place, as in a
+        single huge word; the count may then differ by the tokens of that
+        word's two halves, a few at most.
+
+        Text looking like a special token is counted as ordinary text.
+
+        Args:
+            chunks: The text's bytes, e.g. from file_getter.read_file_stream
+            chunk_chars: Maximum number of characters encoded at a time
+
+        Returns:
+            Number of tokens in the text
+
+        Raises:
+            UnicodeDecodeError: If the bytes are not valid UTF-8
+        """
+        return self._count_stream(chunks, [self.tokenizer], chunk_chars)[0]
+
+    @staticmethod
+    def _count_stream(
+        chunks: Iterable[Union[bytes, memoryview]],
+        tokenizers: List[tiktoken.Encoding],
+        chunk_chars: int = STREAM_CHUNK_CHARS,
+    ) -> List[int]:
+        """
+        Counts the tokens in a stream of UTF-8 chunks with each of the
+        encodings; see count_tokens_in_stream.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        totals = [0] * len(tokenizers)
+        pending = ""
+        # A carriage return at the end of a chunk may start a \r\n pair
+        carriage_return = ""
+        for chunk in chunks:
+            text = carriage_return + decoder.decode(chunk)
+            carriage_return = "\r" if text.endswith("\r") else ""
+            if carriage_return:
+                text = text[:-1]
+            pending += text.replace("\r\n", "\n").replace("\r", "\n")
+            while len(pending) >= chunk_chars:
+                cut = _split_point(pending, chunk_chars)
+                piece = pending[:cut]
+                for i, tokenizer in enumerate(tokenizers):
+                    totals[i] += len(tokenizer.encode_ordinary(piece))
+                pending = pending[cut:]
+        text = carriage_return + decoder.decode(b"", final=True)
+        pending += text.replace("\r\n", "\n").replace("\r", "\n")
+        for i, tokenizer in enumerate(tokenizers):
+            totals[i] += len(tokenizer.encode_ordinary(pending))
+        return totals
+
+    def count_tokens_in_file_streaming(self, file_path: str) -> Optional[int]:
+        """
+        Count tokens in a single file without reading it whole, so memory
+        stays constant however large the file is.
+
+        Unlike count_tokens_in_file, files over max_file_size are counted.
+        See count_tokens_in_stream for how the count may differ from the
+        exact one.
+
+        Args:
+            file_path: Path to the file relative to repo root
+
+        Returns:
+            Number of tokens in the file or None if file cannot be read, is
+            binary, or is not valid UTF-8
+        """
+        counts = self._count_file_streaming(file_path, [self.tokenizer])
+        return counts[0] if counts is not None else None
+
+    def _count_file_streaming(
+        self, file_path: str, tokenizers: List[tiktoken.Encoding]
+    ) -> Optional[List[int]]:
+        """
+        Counts the tokens in a file with each of the encodings, streaming it
+        once; see count_tokens_in_file_streaming.
+        """
+        try:
+            chunks = self.file_getter.read_file_stream(
+                file_path, mmap_threshold=DEFAULT_MMAP_THRESHOLD
+            )
+        except PermissionError:
+            return None
+        if chunks is None:
+            return None
+        try:
+            first = next(chunks, b"")
+            if classify_head(bytes(first[:SNIFF_SIZE])) != TEXT:
+                return None
+            return self._count_stream(itertools.chain([first], chunks), tokenizers)
+        except (UnicodeDecodeError, OSError):
+            return None
+        finally:
+            chunks.close()
+
+    def _count_if_oversized(self, file_path: str) -> Optional[int]:
+        """
+        Counts a file that was not read for its size by streaming it, if
+        stream_large_files is set.
+        """
+        counts = self._stream_if_oversized(file_path, [self.encoding_name])
+        return counts[0] if counts is not None else None
+
+    def _stream_if_oversized(
+        self, file_path: str, encoding_names: List[str]
+    ) -> Optional[List[int]]:
+        """
+        Counts a file that was not read for its size with each of the
+        encodings by streaming it, if stream_large_files is set.
+        """
+        if not self.stream_large_files:
+            return None
+        if self.file_getter.classify_file(file_path) != OVERSIZED:
+            return None
+        tokenizers = [self._load_encoding(name) for name in encoding_names]
+        return self._count_file_streaming(file_path, tokenizers)
+
+    def estimate_tokens_in_file(
+        self, file_path: str, size: Optional[int] = None
+    ) -> Optional[TokenEstimate]:
+        """
+        Estimate the tokens in a single file without encoding it.
+
+        Only the size and the first ESTIMATE_SAMPLE_BYTES bytes are read.
+        The estimate comes from self.estimator, which is calibrated on this
+        repository by calibrate_estimator; before that it uses rough
+        defaults. Files that are not valid UTF-8 are estimated anyway.
+
+        Args:
+            file_path: Path to the file relative to repo root
+            size: Size of the file in bytes, if already known
+
+        Returns:
+            The estimate and its error bound, or None if the file cannot be
+            read, is binary, or is oversized and stream_large_files is not
+            set
+        """
+        stats = self._byte_stats(file_path, size)
+        if stats is None:
+            return None
+        return self.estimator.estimate(_extension(file_path), stats)
+
+    def _byte_stats(self, file_path: str, size: Optional[int]) -> Optional[ByteStats]:
+        """Takes the byte stats of a text file from its start."""
+        if size is None:
+            stat = self.file_getter.file_stat(file_path)
+            if stat is None:
+                return None
+            size = stat[0]
+        max_file_size = self.file_getter.max_file_size
+        if max_file_size is not None and size > max_file_size:
+            if not self.stream_large_files:
+                return None
+        try:
+            chunks = self.file_getter.read_file_stream(
+                file_path, ESTIMATE_SAMPLE_BYTES, mmap_threshold=None
+            )
+        except PermissionError:
+            return None
+        if chunks is None:
+            return None
+        try:
+            head = next(chunks, b"")
+        except OSError:
+            return None
+        finally:
+            chunks.close()
+        if classify_head(head[:SNIFF_SIZE]) != TEXT:
+            return None
+        return byte_stats(head, size)
+
+    def calibrate_estimator(
+        self, file_paths: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Calibrate self.estimator on files of this repository.
+
+        Up to CALIBRATION_FILES_PER_EXTENSION files of each extension,
+        spread over the listing, are counted exactly.
+
+        Args:
+            file_paths: Files to pick from (default: all files in the
+                repository)
+
+        Returns:
+            Exact counts of the files that were counted, keyed by path
+        """
+        if file_paths is None:
+            file_paths = self.file_getter.iter_file_paths()
+        by_extension: Dict[str, List[str]] = {}
+        for file_path in file_paths:
+            by_extension.setdefault(_extension(file_path), []).append(file_path)
+
+        exact_counts: Dict[str, int] = {}
+        samples: List[Tuple[str, ByteStats, int]] = []
+        for extension, paths in by_extension.items():
+            picks = min(len(paths), CALIBRATION_FILES_PER_EXTENSION)
+            for i in range(picks):
+                file_path = paths[i * len(paths) // picks]
+                count = self._count_file(file_path)[0]
+                if count is None:
+                    continue
+                exact_counts[file_path] = count
+                stats = self._byte_stats(file_path, None)
+                if stats is not None:
+                    samples.append((extension, stats, count))
+        self.estimator = TokenEstimator.calibrate(samples)
+        return exact_counts
+
+    def _estimate_all_files(self) -> Dict[str, Optional[int]]:
+        """
+        Estimates the tokens in all files after calibrating the estimator.
+        Files counted for the calibration keep their exact counts.
+        """
+        records = self.file_getter.get_file_records()
+        root = os.path.join(str(self.file_getter.repo_path), "")
+        file_paths = [root + path.replace("/", os.sep) for path in records.paths()]
+        exact_counts = self.calibrate_estimator(file_paths)
+        self._save_caches()
+
+        token_counts: Dict[str, Optional[int]] = {}
+        self.skipped_files = {}
+        self.estimate_errors = {}
+        for file_path, record in zip(file_paths, records):
+            if file_path in exact_counts:
+                token_counts[file_path] = exact_counts[file_path]
+                self.estimate_errors[file_path] = 0
+                continue
+            self._store_estimate(
+                file_path,
+                self.estimate_tokens_in_file(file_path, record.size),
+                token_counts,
+            )
+        self.token_counts = token_counts
+        return token_counts
+
+    def _store_estimate(
+        self,
+        file_path: str,
+        estimate: Optional[TokenEstimate],
+        token_counts: Dict[str, Optional[int]],
+    ) -> None:
+        """Records an estimate, or why a file could not be estimated."""
+        if estimate is None:
+            token_counts[file_path] = None
+            self.estimate_errors.pop(file_path, None)
+            self._record_skip(file_path, self._skip_reason(file_path, None))
+        else:
+            token_counts[file_path] = estimate.tokens
+            self.estimate_errors[file_path] = estimate.error
+            self._record_skip(file_path, None)
+
+    def _skip_reason(self, file_path: str, count: Optional[int]) -> Optional[str]:
+        """Returns BINARY or OVERSIZED if that is why a file was not counted."""
+        if count is not None:
+            return None
+        kind = self.file_getter.classify_file(file_path)
+        return kind if kind is not None and kind != TEXT else None
+
+    def _record_skip(self, file_path: str, reason: Optional[str]) -> None:
+        """Remembers why a file that could not be counted was skipped."""
+        if reason is not None:
+            self.skipped_files[file_path] = reason
+        else:
+            self.skipped_files.pop(file_path, None)
+
+    def _count_file(self, file_path: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Count tokens in a single file, going through the result cache if
+        there is one.
+
+        Returns:
+            Tuple of the count, as from count_tokens_in_file, and the reason
+            the file was skipped, if it was
+        """
+        digest = None
+        if self.result_cache is not None:
+            entry = self.file_getter.content_hash(file_path, self._counted_kinds)
+            if entry is not None:
+                digest = entry.digest
+                cached = self.result_cache.get(self._cache_kind, digest)
+                if cached is not None:
+                    return cached, None
+        count = self.count_tokens_in_file(file_path)
+        if count is not None and digest is not None:
+            self.result_cache.put(self._cache_kind, digest, count)
+        return count, self._skip_reason(file_path, count)
 
     def count_all_files(self) -> Dict[str, Optional[int]]:
         """
@@ -55,10 +588,384 @@ class TokenCounter:
         Returns:
             Dictionary mapping file paths to their token counts
             Files that couldn't be read will have None as their value
+            If a scan budget stopped the walk, only the files listed before
+            that are counted and file_getter.truncated is set
+            In estimate mode, the counts are estimates, with their error
+            bounds in estimate_errors
         """
+        if self.estimate:
+            return self._estimate_all_files()
         token_counts: Dict[str, Optional[int]] = {}
+        self.skipped_files = {}
+        # Content digest of each file, for storing new counts
+        digests: Dict[str, str] = {}
+
+        def store_cached(file_path: str, counts: List[Optional[int]]) -> None:
+            token_counts[file_path] = counts[0]
+
+        # Stream paths so reading starts before the walk finishes, and read
+        # ahead on a thread pool while tokenizing
+        file_paths = _reserve_slots(
+            self.file_getter.iter_file_paths(), token_counts, lambda: None
+        )
+        if self.result_cache is not None:
+            file_paths = self._uncached_paths(
+                file_paths, [self.encoding_name], store_cached, digests
+            )
+        contents = self.file_getter.read_many(file_paths)
+        if self.num_threads > 1:
+            self._count_batched(contents, token_counts, digests)
+        else:
+            for file_path, content in contents:
+                if isinstance(content, str):
+                    count = self.count_tokens_in_text(content)
+                elif content is None:
+                    count = self._count_if_oversized(file_path)
+                else:
+                    count = None
+                self._store_count(file_path, count, token_counts, digests)
+
+        self._save_caches()
+        self.token_counts = token_counts
+        return token_counts
+
+    def _save_caches(self) -> None:
+        """
+        Writes new counts to the result cache and new content hashes to the
+        content index, if there is a result cache.
+        """
+        if self.result_cache is not None:
+            self.result_cache.flush()
+            self.file_getter.save_content_index()
+
+    def _store_count(
+        self,
+        file_path: str,
+        count: Optional[int],
+        token_counts: Dict[str, Optional[int]],
+        digests: Dict[str, str],
+    ) -> None:
+        """Records a new count, and stores it in the result cache if set."""
+        token_counts[file_path] = count
+        self._record_skip(file_path, self._skip_reason(file_path, count))
+        if count is not None and file_path in digests:
+            self.result_cache.put(self._cache_kind, digests[file_path], count)
+
+    def _count_batched(
+        self,
+        contents: Iterable[Tuple[str, ReadResult]],
+        token_counts: Dict[str, Optional[int]],
+        digests: Dict[str, str],
+    ) -> None:
+        """
+        Counts file contents in batches with encode_ordinary_batch.
+
+        Batches are encoded on a separate thread, where tiktoken spreads
+        them over num_threads threads without holding the GIL, so reading
+        goes on meanwhile. At most one batch waits while another is being
+        encoded, which bounds memory.
+
+        Counts equal those of count_tokens_in_text.
+        """
+        batch: List[Tuple[str, str]] = []
+        batch_chars = 0
+        in_flight: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=1) as encoder:
+            for file_path, content in contents:
+                if not isinstance(content, str):
+                    count = (
+                        self._count_if_oversized(file_path) if content is None else None
+                    )
+                    self._store_count(file_path, count, token_counts, digests)
+                    continue
+                batch.append((file_path, content))
+                batch_chars += len(content)
+                if len(batch) < ENCODE_BATCH_FILES and batch_chars < ENCODE_BATCH_CHARS:
+                    continue
+                in_flight.append(encoder.submit(self._encode_batch, batch))
+                batch = []
+                batch_chars = 0
+                if len(in_flight) > 1:
+                    for file_path, count in in_flight.popleft().result():
+                        self._store_count(file_path, count, token_counts, digests)
+            if batch:
+                in_flight.append(encoder.submit(self._encode_batch, batch))
+            while in_flight:
+                for file_path, count in in_flight.popleft().result():
+                    self._store_count(file_path, count, token_counts, digests)
+
+    def _encode_batch(self, batch: List[Tuple[str, str]]) -> List[Tuple[str, int]]:
+        """Counts the tokens of a batch of (path, text) pairs."""
+        tokens = self.tokenizer.encode_ordinary_batch(
+            [content for _, content in batch], num_threads=self.num_threads
+        )
+        return [
+            (file_path, len(file_tokens))
+            for (file_path, _), file_tokens in zip(batch, tokens)
+        ]
+
+    @property
+    def _cache_kind(self) -> str:
+        """Result cache namespace of this counter's encoding."""
+        return _cache_kind_for(self.encoding_name)
+
+    def count_all_encodings(self) -> Dict[str, Dict[str, Optional[int]]]:
+        """
+        Count tokens in all files with every encoding in encoding_names,
+        walking the repository and reading each file once.
+
+        Counts equal those of a separate counter for each model. With a
+        result cache, a file is only read if some encoding has no cached
+        count for its content.
+
+        Returns:
+            Dictionary mapping file paths to a record of their counts, keyed
+            by encoding name in the order of encoding_names
+            Files that couldn't be read will have None for every encoding
+            If a scan budget stopped the walk, only the files listed before
+            that are counted and file_getter.truncated is set
+        """
+        records: Dict[str, Dict[str, Optional[int]]] = {}
+        self.skipped_files = {}
+        # Content digest of each file, for storing new counts
+        digests: Dict[str, str] = {}
+
+        def store_cached(file_path: str, counts: List[Optional[int]]) -> None:
+            records[file_path] = dict(zip(self.encoding_names, counts))
+
+        file_paths = _reserve_slots(
+            self.file_getter.iter_file_paths(),
+            records,
+            lambda: dict.fromkeys(self.encoding_names),
+        )
+        if self.result_cache is not None:
+            file_paths = self._uncached_paths(
+                file_paths, self.encoding_names, store_cached, digests
+            )
+        for file_path, content in self.file_getter.read_many(file_paths):
+            record = records[file_path]
+            missing = [name for name, count in record.items() if count is None]
+            counts = self._count_content(file_path, content, missing)
+            for name, count in zip(missing, counts):
+                record[name] = count
+                if count is not None and file_path in digests:
+                    self.result_cache.put(
+                        _cache_kind_for(name), digests[file_path], count
+                    )
+            self._record_skip(file_path, self._skip_reason(file_path, counts[0]))
+
+        self._save_caches()
+        return records
+
+    def _count_content(
+        self, file_path: str, content: ReadResult, encoding_names: List[str]
+    ) -> List[Optional[int]]:
+        """Counts a file read by read_many with each of the encodings."""
+        if isinstance(content, str):
+            return [
+                len(self._load_encoding(name).encode_ordinary(content))
+                for name in encoding_names
+            ]
+        counts = None
+        if content is None:
+            counts = self._stream_if_oversized(file_path, encoding_names)
+        return counts if counts is not None else [None] * len(encoding_names)
 
-        for file_path in self.file_getter.get_file_paths():
-            token_counts[file_path] = self.count_tokens_in_file(file_path)
+    @property
+    def _counted_kinds(self) -> Tuple[str, ...]:
+        """Kinds of files this counter counts, and so hashes for the cache."""
+        return (TEXT, OVERSIZED) if self.stream_large_files else (TEXT,)
 
+    def _uncached_paths(
+        self,
+        file_paths: Iterator[str],
+        encoding_names: List[str],
+        store_cached: Callable[[str, List[Optional[int]]], None],
+        digests: Dict[str, str],
+    ) -> Iterator[str]:
+        """
+        Looks files up in the result cache, passing on the paths of those
+        that some of the encodings still needs to count. Digests of those
+        are put in digests.
+
+        Only files that will be counted are hashed; binary files, and
+        oversized ones unless stream_large_files is set, are passed on
+        unhashed for the read to skip.
+
+        Args:
+            file_paths: Paths of the files, in listing order
+            encoding_names: Encodings to look up counts for
+            store_cached: Called with each file and its cached count for
+                each encoding, None where there is none
+            digests: Receives the digests of the files passed on
+        """
+        for file_path in file_paths:
+            counts: List[Optional[int]] = [None] * len(encoding_names)
+            entry = self.file_getter.content_hash(file_path, self._counted_kinds)
+            if entry is not None:
+                counts = [
+                    self.result_cache.get(_cache_kind_for(name), entry.digest)
+                    for name in encoding_names
+                ]
+            store_cached(file_path, counts)
+            if entry is not None:
+                if None not in counts:
+                    continue
+                digests[file_path] = entry.digest
+            yield file_path
+
+    def handle_change(self, change: FileChange) -> None:
+        """
+        Update token_counts for a change reported by a watched FileGetter.
+
+        Subscribe with file_getter.subscribe(counter.handle_change) after
+        calling file_getter.watch().
+
+        Args:
+            change: The change to apply
+        """
+        if change.kind == DELETED:
+            self.token_counts.pop(change.absolute_path, None)
+            self.skipped_files.pop(change.absolute_path, None)
+            self.estimate_errors.pop(change.absolute_path, None)
+        elif self.estimate:
+            self._store_estimate(
+                change.absolute_path,
+                self.estimate_tokens_in_file(change.path),
+                self.token_counts,
+            )
+        else:
+            count = self.count_tokens_in_file(change.path)
+            self.token_counts[change.absolute_path] = count
+            self._record_skip(
+                change.absolute_path, self._skip_reason(change.path, count)
+            )
+
+
+class AsyncTokenCounter:
+    """
+    An asyncio front end to TokenCounter.
+
+    Reading and tokenizing run on an executor with at most max_concurrency
+    files in flight, so the event loop is never blocked and memory stays
+    bounded. tiktoken releases the GIL while encoding, so files are counted
+    in parallel. A counter in estimate mode estimates all files in one
+    executor call instead, since estimating does not encode.
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        max_concurrency: int = 8,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """
+        Wraps an existing TokenCounter.
+
+        Args:
+            counter: The TokenCounter doing the work
+            max_concurrency: Maximum number of files read or tokenized at once
+            executor: Executor for blocking calls (default: the event loop's
+                default executor)
+        """
+        self.counter = counter
+        self.max_concurrency = max(1, max_concurrency)
+        self.executor = executor
+        self.file_getter = AsyncFileGetter(counter.file_getter, executor)
+
+    @classmethod
+    async def open(
+        cls,
+        repo_path: str = ".",
+        model: str = "gpt-4o",
+        max_concurrency: int = 8,
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ) -> "AsyncTokenCounter":
+        """
+        Create the TokenCounter on the executor, since setting up its
+        FileGetter reads ignore files.
+
+        Args:
+            repo_path: Path to the repository root
+            model: Name of the model to use for tokenization
+            max_concurrency: Maximum number of files read or tokenized at once
+            executor: Executor for blocking calls
+            **kwargs: Further TokenCounter arguments
+        """
+        loop = asyncio.get_running_loop()
+        counter = await loop.run_in_executor(
+            executor, functools.partial(TokenCounter, repo_path, model, **kwargs)
+        )
+        return cls(counter, max_concurrency, executor)
+
+    async def iter_counts(self) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        """
+        Count tokens in all files, yielding each count as it is ready.
+
+        Yields:
+            Tuples of (absolute file path, token count or None), in
+            completion order; in estimate mode, estimated counts in listing
+            order, with their error bounds in counter.estimate_errors
+        """
+        loop = asyncio.get_running_loop()
+        if self.counter.estimate:
+            token_counts = await loop.run_in_executor(
+                self.executor, self.counter.count_all_files
+            )
+            for file_path, count in token_counts.items():
+                yield file_path, count
+            return
+
+        self.counter.skipped_files = {}
+        pending: Set[asyncio.Future] = set()
+
+        try:
+            async for file_path in self.file_getter.aiter_file_paths():
+                if len(pending) >= self.max_concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield self._record(*future.result())
+                pending.add(
+                    loop.run_in_executor(self.executor, self._count_file, file_path)
+                )
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield self._record(*future.result())
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _count_file(self, file_path: str) -> Tuple[str, Optional[int], Optional[str]]:
+        """Counts one file on the executor."""
+        return (file_path, *self.counter._count_file(file_path))
+
+    def _record(
+        self, file_path: str, count: Optional[int], reason: Optional[str]
+    ) -> Tuple[str, Optional[int]]:
+        """Records a finished count on the event loop thread."""
+        self.counter._record_skip(file_path, reason)
+        return file_path, count
+
+    async def count_all_files(self) -> Dict[str, Optional[int]]:
+        """
+        Count tokens in all files in the repository without blocking the
+        event loop.
+
+        Returns:
+            Dictionary mapping file paths to their token counts, as
+            TokenCounter.count_all_files; also kept as counter.token_counts
+        """
+        token_counts: Dict[str, Optional[int]] = {}
+        async for file_path, count in self.iter_counts():
+            token_counts[file_path] = count
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.counter._save_caches
+        )
+        self.counter.token_counts = token_counts
         return token_counts
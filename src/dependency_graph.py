@@ -1,53 +1,76 @@
 import ast
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
 
+from file_getter import FileGetter, ReadResult
 from file_info import FileInfo
 from graph import Graph
+from result_cache import ResultCache
+from watcher import DELETED, FileChange
 
 
 class DependencyGraph:
-    def __init__(self, file_paths: List[str], root_path: Union[str, Path]):
+    def __init__(
+        self,
+        file_paths: Iterable[str],
+        root_path: Union[str, Path],
+        file_getter: Optional[FileGetter] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
         """Initialize DependencyGraph with a list of file paths.
 
         Args:
-            file_paths (List[str]): List of absolute paths to analyze
+            file_paths (Iterable[str]): Absolute paths to analyze. May be a
+                generator such as FileGetter.iter_file_paths(); files are
+                parsed as soon as their paths arrive.
             root_path (Union[str, Path], optional): Root path for relative path calculations.
                                                   If not provided, uses the common parent of all files.
+            file_getter (FileGetter, optional): Used to read the files. Defaults
+                to a FileGetter for root_path.
+            result_cache (ResultCache, optional): Store of parsed imports keyed
+                by content hash. Files parsed before are not read again.
         """
         if root_path is None:
             raise ValueError("Could not determine common parent directory for files")
 
         self.root_path = Path(root_path).resolve()
+        self.file_getter = file_getter or FileGetter(self.root_path)
+        self.result_cache = result_cache
         self.files: Dict[str, FileInfo] = {}
-        self._initialize_files(file_paths)
-        self.graph = self._build_graph()
+        # Module imports of each file, keyed like self.files, kept so
+        # dependencies can be re-resolved when files come and go
+        self.imports: Dict[str, Set[str]] = {}
+        self.graph = self._build_graph(file_paths)
 
-    def _initialize_files(self, file_paths: List[str]):
-        """Create FileInfo instances for all Python files."""
+    def _initialize_files(self, file_paths: Iterable[str]) -> Iterator[FileInfo]:
+        """Create FileInfo instances for Python files as their paths arrive."""
         for path in file_paths:
             if not str(path).endswith(".py"):
                 continue
             file_info = FileInfo(path, self.root_path)
             # Use relative path as key for consistent lookup
             self.files[str(file_info.relative_path)] = file_info
+            yield file_info
 
-    def _parse_imports(self, file_info: FileInfo) -> Set[str]:
+    def _parse_imports(
+        self, file_info: FileInfo, source: Optional[ReadResult] = None
+    ) -> Set[str]:
         """Parse Python file and extract its imports.
 
         Args:
             file_info (FileInfo): FileInfo object for the Python file
+            source (ReadResult, optional): Content of the file as returned by
+                FileGetter.read_many. The file is read if not given.
 
         Returns:
             Set[str]: Set of imported module paths (relative to root)
         """
         imports = set()
         try:
-            with open(file_info.absolute_path, "r", encoding="utf-8") as f:
-                tree = ast.parse(f.read(), filename=str(file_info.absolute_path))
+            source = self._source_of(file_info, source)
+            tree = ast.parse(source, filename=str(file_info.absolute_path))
         except Exception as e:
             print(f"Error parsing {file_info.absolute_path}: {e}")
             return imports
@@ -73,47 +96,157 @@ class DependencyGraph:
 
         return imports
 
-    def _build_graph(self) -> Graph:
-        """Build dependency graph using parallel processing.
+    @staticmethod
+    def _source_of(file_info: FileInfo, source: Optional[ReadResult]) -> str:
+        """Return the text to parse, reading the file if source is None."""
+        if source is None:
+            with open(file_info.absolute_path, "r", encoding="utf-8") as f:
+                return f.read()
+        if isinstance(source, Exception):
+            raise source
+        return source
+
+    def _build_graph(self, file_paths: Iterable[str]) -> Graph:
+        """Build dependency graph, reading files on a thread pool.
+
+        Files are read while file_paths is still being consumed and parsed
+        as their content arrives; imports are resolved once every file is
+        known.
+
+        Args:
+            file_paths (Iterable[str]): Absolute paths to analyze
 
         Returns:
             Graph: A Graph instance containing all files and their dependencies
         """
+        file_infos: Dict[Path, FileInfo] = {}
+        # Result cache key of each file that still needs parsing
+        cache_keys: Dict[Path, str] = {}
+
+        def uncached_paths() -> Iterator[Path]:
+            for file_info in self._initialize_files(file_paths):
+                if self._load_cached_imports(file_info, cache_keys):
+                    continue
+                file_infos[file_info.absolute_path] = file_info
+                yield file_info.absolute_path
+
+        results = self.file_getter.read_many(uncached_paths(), ordered=False)
+        for path, content in results:
+            file_info = file_infos[path]
+            if content is None:
+                content = ValueError("binary, oversized or unreadable file")
+            imports = self._parse_imports(file_info, content)
+            self.imports[str(file_info.relative_path)] = imports
+            if path in cache_keys:
+                self.result_cache.put("imports", cache_keys[path], sorted(imports))
 
-        def process_file(file_info: FileInfo) -> Tuple[FileInfo, Set[str]]:
-            imports = self._parse_imports(file_info)
-            return file_info, imports
-
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(process_file, file_info): file_info
-                for file_info in self.files.values()
-            }
-
-            for future in as_completed(futures):
-                file_info, imports = future.result()
-                # Convert module imports to FileInfo dependencies
-                for imp in imports:
-                    # Convert module path to file path
-                    file_path = imp.replace(".", os.sep) + ".py"
-                    if file_path in self.files:
-                        file_info.dependencies.add(self.files[file_path])
+        if self.result_cache is not None:
+            self.result_cache.flush()
+            self.file_getter.save_content_index()
+
+        for file_info in self.files.values():
+            self._resolve_dependencies(file_info)
 
         return Graph(files=self.files)
 
-    def save_json(self, output_path: str):
+    def _load_cached_imports(
+        self, file_info: FileInfo, cache_keys: Dict[Path, str]
+    ) -> bool:
+        """Take a file's imports from the result cache if it has them.
+
+        Relative imports resolve differently depending on where the file is,
+        so the cache key combines its content hash with its relative path.
+
+        Args:
+            file_info (FileInfo): The file to look up
+            cache_keys (Dict[Path, str]): Receives the key of a file that is
+                not cached yet, under its absolute path
+
+        Returns:
+            bool: True if the imports were found in the cache
+        """
+        if self.result_cache is None:
+            return False
+        try:
+            entry = self.file_getter.content_hash(file_info.absolute_path)
+        except ValueError:
+            return False  # Outside the FileGetter's repository
+        if entry is None:
+            return False
+        key = f"{entry.digest}:{file_info.relative_path.as_posix()}"
+        cached = self.result_cache.get("imports", key)
+        if cached is None:
+            cache_keys[file_info.absolute_path] = key
+            return False
+        self.imports[str(file_info.relative_path)] = set(cached)
+        return True
+
+    def _resolve_dependencies(self, file_info: FileInfo):
+        """Convert a file's module imports to FileInfo dependencies."""
+        file_info.dependencies.clear()
+        for imp in self.imports.get(str(file_info.relative_path), ()):
+            # Convert module path to file path
+            file_path = imp.replace(".", os.sep) + ".py"
+            if file_path in self.files:
+                file_info.dependencies.add(self.files[file_path])
+
+    def handle_change(self, change: FileChange):
+        """Update the graph for a change reported by a watched FileGetter.
+
+        Subscribe with FileGetter.subscribe(graph.handle_change). Only the
+        changed file is re-parsed; dependencies of the other files are
+        re-resolved against the new set of files.
+
+        Args:
+            change (FileChange): The change to apply
+        """
+        if not change.path.endswith(".py"):
+            return
+        try:
+            key = str(Path(change.absolute_path).relative_to(self.root_path))
+        except ValueError:
+            return  # Outside root_path
+
+        if change.kind == DELETED:
+            if self.files.pop(key, None) is None:
+                return
+            self.imports.pop(key, None)
+        else:
+            file_info = self.files.get(key)
+            if file_info is None:
+                file_info = FileInfo(change.absolute_path, self.root_path)
+                self.files[key] = file_info
+            self.imports[key] = self._parse_imports(file_info)
+
+        for file_info in self.files.values():
+            self._resolve_dependencies(file_info)
+        self.graph = Graph(files=self.files)
+
+    def to_dict(self, only: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+        """Map each file to the relative paths of its dependencies.
+
+        Args:
+            only (Set[str], optional): Relative paths of the files to include,
+                e.g. the files changed in a pull request. Defaults to all.
+
+        Returns:
+            Dict[str, List[str]]: Dependencies keyed by relative path
+        """
+        return {
+            key: [str(dep.relative_path) for dep in file_info.dependencies]
+            for key, file_info in self.files.items()
+            if only is None or key in only
+        }
+
+    def save_json(self, output_path: str, only: Optional[Set[str]] = None):
         """Save dependency graph to JSON file.
 
         Args:
             output_path (str): Path to save JSON file
+            only (Set[str], optional): Relative paths of the files to save,
+                e.g. the files changed in a pull request. Defaults to all.
         """
-        # Convert to serializable format
-        serializable = {
-            str(file_info.relative_path): [
-                str(dep.relative_path) for dep in file_info.dependencies
-            ]
-            for file_info in self.files.values()
-        }
+        serializable = self.to_dict(only)
 
         try:
             with open(output_path, "w", encoding="utf-8") as f:
@@ -1,11 +1,72 @@
 import argparse
-import fnmatch
+import functools
+import json
+import mmap
 import os
-from functools import lru_cache
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Iterator, List, Optional, Set, Union
+from stat import S_ISDIR, S_ISREG
+from typing import (
+    BinaryIO,
+    Callable,
+    Collection,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from archive import Archive, open_archive
 from common_ignores import COMMON_IGNORE_PATTERNS
+from content_index import ContentEntry, ContentIndex, hash_file
+from file_record import FileRecord, FileTable
+from file_kind import DEFAULT_MAX_FILE_SIZE, OVERSIZED, SNIFF_SIZE, TEXT, classify_head
+from git_changes import changed_files
+from git_index import IndexEntry, find_work_tree, read_git_index
+from gitignore import GitIgnoreMatcher, IgnoreStack
+from pattern_matcher import PatternMatcher
+from scan_cache import ScanCache
+from watcher import DELETED, FileChange, FileWatcher
+from work_stealing import WorkStealingQueue
+
+# Chunk size used by read_file_stream
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Suggested mmap_threshold for read_file_stream consumers that accept
+# memoryview chunks
+DEFAULT_MMAP_THRESHOLD = 16 << 20
+# read_many stops starting reads while this much content waits to be consumed
+DEFAULT_MAX_BYTES_IN_FLIGHT = 64 << 20
+
+# Output formats of the command line listing. "list" prints one Python list
+# once the walk is done; the others write one record per file as it is found.
+OUTPUT_FORMATS = ("list", "lines", "null", "ndjson")
+
+# What read_many yields for a file: its text, None if it cannot be read or is
+# binary or oversized, or the error read_file_text raised
+ReadResult = Union[str, None, Exception]
+
+# The common ignore patterns never change, so they are compiled once per
+# process and shared by every FileGetter; the stack is immutable and safe to
+# use from several threads.
+COMMON_IGNORE_STACK = IgnoreStack(GitIgnoreMatcher(COMMON_IGNORE_PATTERNS))
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_patterns(patterns: FrozenSet[str]) -> PatternMatcher:
+    """
+    Compiles include or exclude patterns, reusing the matcher of an earlier
+    FileGetter with the same patterns.
+    """
+    return PatternMatcher(patterns)
 
 
 class FileGetter:
@@ -14,59 +75,217 @@ class FileGetter:
         repo_path: Union[str, Path] = ".",
         include_patterns: Optional[List[str]] = None,
         exclude_patterns: Optional[List[str]] = None,
+        walk_threads: int = 1,
+        use_git_index: bool = False,
+        include_untracked: bool = False,
+        scan_cache: bool = False,
+        cache_dir: Optional[Union[str, Path]] = None,
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+        content_index: bool = False,
+        max_files: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        since: Optional[str] = None,
     ) -> None:
         """
         Initializes the FileGetter.
 
+        A walk stopped early by max_files, max_bytes, max_depth or time_limit
+        sets truncated; the files listed up to that point are still returned.
+
+        repo_path may also be a zip or tar archive (see open_archive), whose
+        members are listed and read in place without extracting it. Ignore
+        rules and patterns apply as for a directory; use_git_index,
+        scan_cache, content_index persistence and watch() do not.
+
         Args:
-            repo_path: Path to the repository root.
-            include_patterns: List of glob patterns to include.
+            repo_path: Path to the repository root, or to an archive.
+            include_patterns: List of glob patterns to include. Supports
+                "{a,b}" alternatives and "**"; see PatternMatcher.
             exclude_patterns: List of glob patterns to exclude.
+            walk_threads: Number of threads listing directories. Values above
+                1 help when listings are latency-bound, e.g. on NFS.
+            use_git_index: If True and repo_path is inside a git work tree,
+                list the files tracked in .git/index instead of walking the
+                tree, with sizes and mtimes as recorded in the index.
+                Tracked files are kept even if a .gitignore matches them,
+                and deleted ones are listed until the deletion is staged,
+                as in git ls-files; include/exclude and common ignore
+                patterns still apply.
+            include_untracked: With use_git_index, also walk the tree for
+                untracked, non-ignored files. This costs a full walk on top
+                of reading the index.
+            scan_cache: If True, reuse directory listings from the previous
+                run for directories whose mtime is unchanged, and save a new
+                snapshot after each complete walk.
+            cache_dir: Directory for persistent caches. Defaults to
+                ~/.cache/eye-or.
+            max_file_size: Files larger than this many bytes are classified
+                as oversized and not read as text. None disables the limit.
+            content_index: If True, persist the content hashes computed by
+                build_content_index() and content_hash() in cache_dir, and
+                reuse them for files whose size and mtime are unchanged.
+            max_files: Stop the walk after this many files.
+            max_bytes: Stop the walk before the total size of the listed
+                files exceeds this many bytes. Costs a stat per file unless
+                sizes come from the git index.
+            max_depth: Do not descend more than this many directories below
+                repo_path; 0 lists only the files at the root.
+            time_limit: Stop the walk after this many seconds.
+            since: A git ref. If set, only files that differ from it are
+                listed; see changed_since(). The tree is not walked.
 
         Raises:
-            ValueError: If the repository path doesn't exist or isn't a directory.
+            ValueError: If the repository path doesn't exist or isn't a
+                directory or a readable archive, or since is given for an
+                archive.
         """
         self.repo_path = Path(repo_path).resolve()
-        if not self.repo_path.exists() or not self.repo_path.is_dir():
+        # Set when repo_path is an archive; every read then goes through it
+        self.archive: Optional[Archive] = None
+        if self.repo_path.is_file():
+            if since is not None:
+                raise ValueError(f"Cannot list changes since {since} in an archive")
+            self.archive = open_archive(self.repo_path)
+        elif not self.repo_path.is_dir():
             raise ValueError(f"Invalid repository path: {repo_path}")
 
         self.include_patterns = include_patterns or []
         self.exclude_patterns = exclude_patterns or []
-        self.ignored_files = self._get_gitignore_patterns()
-        self.file_paths = self._retrieve_file_paths()
+        self.walk_threads = max(1, walk_threads)
+        self.use_git_index = use_git_index
+        self.include_untracked = include_untracked
+        # Tracked files keyed by path relative to repo_path, filled when the
+        # git index is read. Sizes, mtimes and blob ids come for free.
+        self.git_index: Dict[str, IndexEntry] = {}
+        self.cache_dir = cache_dir
+        self.max_file_size = max_file_size
+        # classify_file results keyed by absolute path, so binary and
+        # oversized files are only opened once
+        self._file_kinds: Dict[str, str] = {}
+        self._scan_cache = (
+            ScanCache.for_repo(self.repo_path, cache_dir)
+            if scan_cache and self.archive is None
+            else None
+        )
+        self._content_index = (
+            ContentIndex.for_repo(self.repo_path, cache_dir)
+            if content_index and self.archive is None
+            else ContentIndex()
+        )
+        # Result of the last build_content_index, keyed by "/"-separated
+        # path relative to repo_path
+        self.content_hashes: Dict[str, ContentEntry] = {}
+        # Compile include/exclude once; matching is then a few set probes
+        # and a single regex per path instead of one fnmatch call per pattern.
+        self._include_matcher = _compile_patterns(frozenset(self.include_patterns))
+        self._exclude_matcher = _compile_patterns(frozenset(self.exclude_patterns))
+        # Ignore rules compiled per directory, keyed by "/"-terminated
+        # relative prefix ("" for the root) and inherited by subdirectories.
+        self._common_ignore_stack = COMMON_IGNORE_STACK
+        self._ignore_stacks: Dict[str, IgnoreStack] = {
+            "": self._get_root_ignore_stack()
+        }
+        # Filled on first use by get_file_paths; iter_file_paths streams
+        # without it.
+        self._relative_paths: Optional[List[str]] = None
+        # Filled on first use by get_file_records, and reused for paths
+        self._file_records: Optional[FileTable] = None
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.since = since
+        # Set when a budget stopped the last walk early, with the name of the
+        # budget in truncated_by
+        self.truncated = False
+        self.truncated_by: Optional[str] = None
+        # time.monotonic() deadline of the walk in progress, if time-limited
+        self._deadline: Optional[float] = None
+        # Set by watch(); keeps the listing live instead of rescanning
+        self._watcher: Optional[FileWatcher] = None
+        self._change_callbacks: List[Callable[[FileChange], None]] = []
 
-    # Using LRU cache here for performance optimization since:
-    # 1. The .gitignore patterns rarely change during the lifetime of an instance
-    # 2. Reading and parsing .gitignore is an I/O operation we want to minimize
-    # 3. The patterns are used frequently during file traversal
-    # maxsize=1 is sufficient as the patterns only depend on the repo_path,
-    # which is set at initialization
-    @lru_cache(maxsize=1)
-    def _get_gitignore_patterns(self) -> Set[str]:
+    def _get_root_ignore_stack(self) -> IgnoreStack:
         """
-        Retrieves patterns from .gitignore and adds common ignore patterns.
-        Uses lru_cache for performance optimization.
+        Builds the ignore rules that apply at the repository root, in
+        increasing order of precedence: common ignore patterns,
+        .git/info/exclude, then the root .gitignore.
 
         Returns:
-            Set of ignore patterns.
+            IgnoreStack for the repository root.
         """
-        patterns: Set[str] = set()
-        gitignore_path = self.repo_path / ".gitignore"
+        stack = self._common_ignore_stack.push(
+            self._load_ignore_file(".git/info/exclude"), ""
+        )
+        return stack.push(self._load_ignore_file(".gitignore"), "")
 
-        if gitignore_path.exists():
-            try:
-                with open(gitignore_path, "r") as f:
-                    # Read patterns directly from .gitignore file
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            patterns.add(line)
-            except Exception:
-                # If there's any error reading .gitignore, just use common patterns
-                pass
-
-        patterns.update(COMMON_IGNORE_PATTERNS)
-        return patterns
+    def _load_ignore_file(self, relative_path: str) -> Optional[GitIgnoreMatcher]:
+        """
+        Compiles an ignore file from disk or from the archive.
+
+        Args:
+            relative_path: "/"-separated path of the file relative to
+                repo_path.
+
+        Returns:
+            The compiled matcher, or None if the file is missing, unreadable
+            or holds no rules.
+        """
+        if self.archive is None:
+            return GitIgnoreMatcher.from_file(
+                os.path.join(self.repo_path, relative_path)
+            )
+        if relative_path not in self.archive.members:
+            return None
+        try:
+            data = self.archive.read(relative_path)
+        except OSError:
+            return None
+        matcher = GitIgnoreMatcher(data.decode("utf-8", "replace").splitlines())
+        return matcher if matcher.rules else None
+
+    def _ignore_stack_for(
+        self, prefix: str, has_gitignore: Optional[bool] = None
+    ) -> IgnoreStack:
+        """
+        Returns the ignore rules that apply inside a directory, compiling the
+        .gitignore files of it and its ancestors on first use.
+
+        Args:
+            prefix: "/"-terminated directory path relative to repo_path,
+                or "" for the root.
+            has_gitignore: Whether the directory has a .gitignore, if already
+                known from its listing; None to check on disk.
+
+        Returns:
+            IgnoreStack for the directory.
+        """
+        stack = self._ignore_stacks.get(prefix)
+        if stack is None:
+            parent = prefix[:-1].rpartition("/")[0]
+            stack = self._ignore_stack_for(parent + "/" if parent else "")
+            if has_gitignore is not False:
+                stack = stack.push(
+                    self._load_ignore_file(prefix + ".gitignore"), prefix
+                )
+            self._ignore_stacks[prefix] = stack
+        return stack
+
+    def _invalidate_ignore_rules(self, prefix: str) -> None:
+        """
+        Drops the compiled ignore rules of a directory and everything below
+        it, so they are recompiled from the .gitignore files on disk.
+
+        Args:
+            prefix: "/"-terminated directory path relative to repo_path,
+                or "" for the root.
+        """
+        for key in [key for key in self._ignore_stacks if key.startswith(prefix)]:
+            del self._ignore_stacks[key]
+        if not prefix:
+            self._ignore_stacks[""] = self._get_root_ignore_stack()
 
     def _is_ignored(self, file_path: Path, is_dir: bool = False) -> bool:
         """
@@ -80,124 +299,1271 @@ class FileGetter:
             True if ignored, False otherwise.
         """
         try:
-            relative_path = file_path.relative_to(self.repo_path)
+            relative_path = file_path.relative_to(self.repo_path).as_posix()
         except ValueError:
             return True  # Path is outside repo directory
 
+        return self._is_ignored_relative(relative_path, is_dir)
+
+    def _is_ignored_relative(
+        self,
+        relative_path: str,
+        is_dir: bool = False,
+        ignore_stack: Optional[IgnoreStack] = None,
+    ) -> bool:
+        """
+        Determines if a path relative to the repository root should be ignored.
+
+        Args:
+            relative_path: "/"-separated path relative to repo_path.
+            is_dir: True if the path is a directory.
+            ignore_stack: Ignore rules of the containing directory, if the
+                caller already has them.
+
+        Returns:
+            True if ignored, False otherwise.
+        """
         # Check exclude patterns
-        if any(
-            fnmatch.fnmatch(str(relative_path), pattern)
-            for pattern in self.exclude_patterns
-        ):
+        if self._exclude_matcher.matches(relative_path, is_dir):
             return True
 
-        if not is_dir:
-            # Check include patterns only for files
-            if self.include_patterns and not any(
-                fnmatch.fnmatch(str(relative_path), pat)
-                for pat in self.include_patterns
-            ):
+        if self._include_matcher:
+            if is_dir:
+                # Prune subtrees no include pattern can reach
+                if not self._include_matcher.can_match_under(relative_path + "/"):
+                    return True
+            elif not self._include_matcher.matches(relative_path):
                 return True
 
-        # Check .gitignore and common ignores
-        return any(
-            fnmatch.fnmatch(str(relative_path), pat) for pat in self.ignored_files
+        # Check .gitignore files and common ignores
+        prefix, _, name = relative_path.rpartition("/")
+        if is_dir and name == ".git":
+            # Like git itself, never descend into repository metadata, even
+            # if a negated rule such as "!*/" would re-include it
+            return True
+        if ignore_stack is None:
+            ignore_stack = self._ignore_stack_for(prefix + "/" if prefix else "")
+        return ignore_stack.is_ignored(relative_path, name, is_dir)
+
+    def _list_directory(
+        self, prefix: str, file_entries: Optional[Dict[str, os.DirEntry]] = None
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Lists one directory, classifying entries from the listing itself.
+
+        With the scan cache enabled, the directory is stat'ed first and its
+        previous listing is reused if its mtime and inode are unchanged.
+
+        Args:
+            prefix: "/"-terminated directory path relative to repo_path,
+                or "" for the root.
+            file_entries: If given, filled with the DirEntry of each file
+                when the directory is actually listed, for stat'ing it
+                without resolving its path again.
+
+        Returns:
+            Tuple of (file names, subdirectory names) in listing order, or
+            None if the directory cannot be read.
+        """
+        directory = os.path.join(self.repo_path, prefix)
+        scan_cache = self._scan_cache
+        if scan_cache is not None:
+            try:
+                stat = os.stat(directory)
+            except OSError:
+                return None
+            cached = scan_cache.lookup(prefix, stat)
+            if cached is not None:
+                return cached
+
+        try:
+            # List the whole directory up front so no descriptor stays open
+            # while the caller works on the yielded paths
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return None
+
+        files, dirs = self._classify_entries(entries, file_entries)
+        if scan_cache is not None:
+            scan_cache.store(prefix, stat, files, dirs)
+        return files, dirs
+
+    @staticmethod
+    def _classify_entries(
+        entries: List[os.DirEntry], file_entries: Optional[Dict[str, os.DirEntry]]
+    ) -> Tuple[List[str], List[str]]:
+        """Splits a listing into file and subdirectory names."""
+        files: List[str] = []
+        dirs: List[str] = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif not (entry.is_symlink() and entry.is_dir()):
+                    files.append(entry.name)
+                    if file_entries is not None:
+                        file_entries[entry.name] = entry
+            except OSError:
+                continue
+        return files, dirs
+
+    def _scan_directory(
+        self, prefix: str, records: bool = False
+    ) -> Optional[Tuple[List, List[str]]]:
+        """
+        Lists one directory and applies the ignore rules to its entries.
+
+        Args:
+            prefix: "/"-terminated directory path relative to repo_path,
+                or "" for the root.
+            records: If True, return a FileRecord for each kept file instead
+                of its path.
+
+        Returns:
+            Tuple of (relative paths or records of kept files, prefixes of
+            kept subdirectories) in listing order, or None if the directory
+            cannot be read or the walk's time limit has passed.
+        """
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self._truncate("time_limit")
+            return None
+        file_entries: Optional[Dict[str, os.DirEntry]] = {} if records else None
+        listing = self._list_directory(prefix, file_entries)
+        if listing is None:
+            return None
+        files, dirs = listing
+
+        # Compile this directory's own .gitignore once; subdirectories
+        # inherit it through the stack.
+        ignore_stack = self._ignore_stack_for(prefix, ".gitignore" in files)
+
+        kept_files = [
+            prefix + name
+            for name in files
+            if not self._is_ignored_relative(prefix + name, False, ignore_stack)
+        ]
+        kept_dirs = [
+            prefix + name + "/"
+            for name in dirs
+            if not self._is_ignored_relative(prefix + name, True, ignore_stack)
+        ]
+        if kept_dirs and self._exceeds_max_depth(prefix + "/"):
+            self._truncate("max_depth")
+            kept_dirs = []
+        if records:
+            return self._stat_records(prefix, kept_files, file_entries), kept_dirs
+        return kept_files, kept_dirs
+
+    def _stat_records(
+        self, prefix: str, paths: List[str], file_entries: Dict[str, os.DirEntry]
+    ) -> List[FileRecord]:
+        """
+        Stats the kept files of one directory through their DirEntry, which
+        costs nothing extra on Windows. Files that vanished since the
+        listing are dropped. Listings from the scan cache have no entries,
+        so their files are stat'ed by path.
+        """
+        records: List[FileRecord] = []
+        directory = sys.intern(prefix)
+        for path in paths:
+            name = path[len(prefix) :]
+            entry = file_entries.get(name)
+            try:
+                if entry is not None:
+                    stat = entry.stat()
+                else:
+                    stat = os.stat(os.path.join(self.repo_path, path))
+            except OSError:
+                continue
+            records.append(FileRecord(directory, name, stat.st_size, stat.st_mtime_ns))
+        return records
+
+    def _exceeds_max_depth(self, path: str) -> bool:
+        """Checks whether a file path lies deeper than max_depth."""
+        return self.max_depth is not None and path.count("/") > self.max_depth
+
+    def _truncate(self, budget: str) -> None:
+        """Marks the walk as stopped early by a budget."""
+        self.truncated = True
+        if self.truncated_by is None:
+            self.truncated_by = budget
+
+    def _walk(self, records: bool = False) -> Iterator:
+        """
+        Enumerates the files of the repository, from the git index if
+        use_git_index is set and an index is available, otherwise by walking
+        the file system.
+
+        Args:
+            records: If True, yield a FileRecord per file instead of its path.
+
+        Yields:
+            "/"-separated file paths relative to repo_path, or FileRecords.
+        """
+        self.truncated = False
+        self.truncated_by = None
+        if self.time_limit is not None:
+            self._deadline = time.monotonic() + self.time_limit
+        try:
+            paths = self._walk_sources(records)
+            if self.max_files is not None or self.max_bytes is not None:
+                paths = self._apply_count_budgets(paths)
+            yield from paths
+        finally:
+            # Rescans by the watcher are not time-limited
+            self._deadline = None
+
+    def _walk_sources(self, records: bool = False) -> Iterator:
+        """
+        Yields archive members, changed files, or files from the git index or
+        file system, as paths or, if records is set, as FileRecords.
+        """
+        if self.archive is not None:
+            paths: Iterator = self._walk_archive(self.archive)
+        elif self.since is not None:
+            paths = (path for path in self.changed_since(self.since))
+        else:
+            tracked = self._load_git_index() if self.use_git_index else None
+            if tracked is not None:
+                paths = self._walk_git_index(tracked, records)
+            else:
+                paths = self._walk_filesystem(records)
+        if records:
+            paths = self._complete_records(paths)
+        yield from paths
+
+    def _complete_records(self, paths: Iterator) -> Iterator[FileRecord]:
+        """
+        Turns the paths of files not found by walking the file system into
+        FileRecords, passing records from the walk through. Files that can
+        no longer be stat'ed are dropped.
+        """
+        try:
+            for path in paths:
+                if isinstance(path, FileRecord):
+                    yield path
+                    continue
+                record = self.file_record(path)
+                if record is not None:
+                    yield record
+        finally:
+            paths.close()
+
+    def _apply_count_budgets(self, paths: Iterator) -> Iterator:
+        """Passes paths through until max_files or max_bytes is reached."""
+        count = 0
+        total = 0
+        try:
+            for path in paths:
+                if self.max_files is not None and count >= self.max_files:
+                    self._truncate("max_files")
+                    return
+                if self.max_bytes is not None:
+                    if isinstance(path, FileRecord):
+                        total += path.size
+                    else:
+                        total += self._file_size(path)
+                    if total > self.max_bytes:
+                        self._truncate("max_bytes")
+                        return
+                count += 1
+                yield path
+        finally:
+            paths.close()
+
+    def _file_size(self, relative_path: str) -> int:
+        """Returns a file's size from the git index or a stat, 0 on error."""
+        if self.archive is not None:
+            member = self.archive.members.get(relative_path)
+            return member.size if member is not None else 0
+        entry = self.git_index.get(relative_path)
+        if entry is not None:
+            return entry.size
+        try:
+            return os.stat(os.path.join(self.repo_path, relative_path)).st_size
+        except OSError:
+            return 0
+
+    def file_stat(self, file_path: Union[str, Path]) -> Optional[Tuple[int, int]]:
+        """
+        Returns the current size and mtime of a file or archive member.
+
+        Args:
+            file_path: Path to the file, absolute or relative to repo_path.
+
+        Returns:
+            Tuple of (size in bytes, mtime in nanoseconds), or None if the
+            file no longer exists or cannot be stat'ed.
+        """
+        if self.archive is not None:
+            member = self.archive.members.get(self._relative_key(file_path))
+            return (member.size, member.mtime_ns) if member is not None else None
+        try:
+            stat = os.stat(self.repo_path / file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def file_record(self, file_path: Union[str, Path]) -> Optional[FileRecord]:
+        """
+        Returns a FileRecord with the current size and mtime of a file.
+
+        Args:
+            file_path: Path to the file, absolute or relative to repo_path.
+
+        Returns:
+            The record, or None if the file cannot be stat'ed.
+        """
+        stat = self.file_stat(file_path)
+        if stat is None:
+            return None
+        return FileRecord.from_path(self._relative_key(file_path), *stat)
+
+    def _load_git_index(self) -> Optional[Dict[str, IndexEntry]]:
+        """
+        Reads the tracked files under repo_path from the git index.
+
+        Returns:
+            Index entries keyed by path relative to repo_path, or None if
+            repo_path is not in a git work tree or the index is unreadable.
+        """
+        location = find_work_tree(self.repo_path)
+        if location is None:
+            return None
+        work_tree, git_dir = location
+        try:
+            entries = read_git_index(git_dir)
+        except (OSError, ValueError):
+            return None
+
+        prefix = self.repo_path.relative_to(work_tree).as_posix()
+        if prefix == ".":
+            self.git_index = {entry.path: entry for entry in entries}
+        else:
+            prefix += "/"
+            self.git_index = {
+                entry.path[len(prefix) :]: entry
+                for entry in entries
+                if entry.path.startswith(prefix)
+            }
+        return self.git_index
+
+    def _is_dir_ignored(
+        self,
+        directory: str,
+        cache: Dict[str, bool],
+        ignore_stack: Optional[IgnoreStack] = None,
+    ) -> bool:
+        """
+        Checks a directory and its ancestors against the include/exclude
+        patterns and ignore rules, memoizing in cache.
+
+        Args:
+            directory: "/"-separated path relative to repo_path.
+            cache: Verdicts of the directories checked so far.
+            ignore_stack: Ignore rules to apply to every level, such as the
+                common ignore patterns alone for files git already vetted.
+                By default, each level gets the rules that apply to it, as
+                in a walk.
+        """
+        ignored = cache.get(directory)
+        if ignored is None:
+            parent = directory.rpartition("/")[0]
+            ignored = (
+                bool(parent) and self._is_dir_ignored(parent, cache, ignore_stack)
+            ) or self._is_ignored_relative(directory, True, ignore_stack)
+            cache[directory] = ignored
+        return ignored
+
+    def _walk_git_index(
+        self, tracked: Dict[str, IndexEntry], records: bool = False
+    ) -> Iterator:
+        """
+        Yields tracked files from the index, then untracked files found by
+        walking the tree if include_untracked is set.
+
+        Directories are checked against the ignore rules once each; per
+        file, only the rules that can match it by name or path apply. Sizes
+        and mtimes come from the index, so no file is stat'ed: as in git
+        ls-files, a tracked file deleted from the work tree is still listed
+        and reported missing when read. Symlinks are the exception; they
+        are stat'ed to follow them as the walk does.
+
+        Args:
+            tracked: Index entries keyed by path relative to repo_path.
+            records: If True, files are yielded as FileRecords.
+
+        Yields:
+            "/"-separated file paths relative to repo_path: tracked files in
+            index order, then untracked files in walk order.
+        """
+        ignored_dirs: Dict[str, bool] = {}
+        # "/"-terminated prefix of each directory whose files are listed, or
+        # None if they are not
+        prefixes: Dict[str, Optional[str]] = {}
+        # Common ignore verdicts by file name, if names alone decide them
+        ignored_names: Optional[Dict[str, bool]] = (
+            {} if self._common_ignore_stack.files_match_by_name else None
         )
+        for path, entry in tracked.items():
+            directory, _, name = path.rpartition("/")
+            if directory not in prefixes:
+                if self._deadline is not None and time.monotonic() > self._deadline:
+                    self._truncate("time_limit")
+                    return
+                prefixes[directory] = self._tracked_dir_prefix(directory, ignored_dirs)
+            prefix = prefixes[directory]
+            if prefix is None or self._is_tracked_file_ignored(
+                path, name, ignored_names
+            ):
+                continue
+            if entry.is_symlink:
+                record = self._tracked_symlink_record(path)
+                if record is None:
+                    continue
+            elif records:
+                record = FileRecord(prefix, name, entry.size, entry.mtime_ns)
+            yield record if records else path
 
-    def _retrieve_file_paths(self) -> List[Path]:
+        if self.include_untracked:
+            yield from self._walk_untracked(tracked, records)
+
+    def _walk_untracked(
+        self, tracked: Dict[str, IndexEntry], records: bool = False
+    ) -> Iterator:
+        """Walks the file system for the files that are not in tracked."""
+        for item in self._walk_filesystem(records):
+            if (item.path if records else item) not in tracked:
+                yield item
+
+    def _tracked_symlink_record(self, path: str) -> Optional[FileRecord]:
+        """
+        Stats a tracked symlink, following it as the walk does. Returns None
+        if it is broken or links to a directory, which the walk skips too.
+        """
+        try:
+            stat = os.stat(os.path.join(self.repo_path, path))
+        except OSError:
+            return None
+        if S_ISDIR(stat.st_mode):
+            return None
+        return FileRecord.from_path(path, stat.st_size, stat.st_mtime_ns)
+
+    def _is_tracked_file_ignored(
+        self, path: str, name: str, ignored_names: Optional[Dict[str, bool]]
+    ) -> bool:
+        """
+        Applies include/exclude and common ignore patterns to a tracked file
+        whose directory is listed. As this runs for every tracked file,
+        empty pattern sets are skipped and common ignore verdicts are
+        memoized by name in ignored_names, if given.
         """
-        Retrieves the list of file paths in the repository based on the patterns.
+        if self._exclude_matcher and self._exclude_matcher.matches(path):
+            return True
+        if self._include_matcher and not self._include_matcher.matches(path):
+            return True
+        if ignored_names is None:
+            return self._common_ignore_stack.is_ignored(path, name, False)
+        ignored = ignored_names.get(name)
+        if ignored is None:
+            ignored = self._common_ignore_stack.is_ignored(name, name, False)
+            ignored_names[name] = ignored
+        return ignored
+
+    def _tracked_dir_prefix(
+        self, directory: str, ignored_dirs: Dict[str, bool]
+    ) -> Optional[str]:
+        """
+        Returns the "/"-terminated prefix of a directory of tracked files, or
+        None if max_depth or an ignore rule excludes its files.
+        """
+        if not directory:
+            return ""
+        if self._exceeds_max_depth(directory + "/"):
+            self._truncate("max_depth")
+            return None
+        if self._is_dir_ignored(directory, ignored_dirs, self._common_ignore_stack):
+            return None
+        return sys.intern(directory + "/")
+
+    def _is_git_path_listed(self, path: str, dir_cache: Dict[str, bool]) -> bool:
+        """
+        Checks a file git already vetted against .gitignore, applying the
+        walk budgets, include/exclude and common ignore patterns.
+        """
+        if not self._within_walk_budgets(path):
+            return False
+        directory = path.rpartition("/")[0]
+        if directory and self._is_dir_ignored(
+            directory, dir_cache, self._common_ignore_stack
+        ):
+            return False
+        return not self._is_ignored_relative(path, False, self._common_ignore_stack)
+
+    def changed_since(self, ref: str) -> List[str]:
+        """
+        Lists the files that differ from a git ref, after applying
+        include/exclude and common ignore patterns.
+
+        Committed, staged and unstaged changes count, as do untracked files
+        git does not ignore. Deleted files are not listed.
+
+        Args:
+            ref: Any git revision, e.g. "origin/main".
 
         Returns:
-            List of Path objects.
+            "/"-separated paths relative to repo_path.
+
+        Raises:
+            ValueError: If repo_path is not in a git work tree or ref is
+                unknown.
         """
-        file_paths: List[Path] = []
+        dir_cache: Dict[str, bool] = {}
+        return [
+            path
+            for path in changed_files(self.repo_path, ref)
+            if self._is_git_path_listed(path, dir_cache)
+            and os.path.isfile(os.path.join(self.repo_path, path))
+        ]
 
-        for root, dirs, files in os.walk(self.repo_path):
-            root_path = Path(root)
-            # Modify dirs in-place to skip ignored directories
-            dirs[:] = [
-                d for d in dirs if not self._is_ignored(root_path / d, is_dir=True)
-            ]
+    def _within_walk_budgets(self, path: str) -> bool:
+        """Applies max_depth and time_limit to a file listed without a walk."""
+        if self._exceeds_max_depth(path):
+            self._truncate("max_depth")
+            return False
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self._truncate("time_limit")
+            return False
+        return True
+
+    def _walk_archive(self, archive: Archive) -> Iterator[str]:
+        """
+        Yields the members of an archive that pass the ignore rules.
+
+        Members are listed in archive order rather than directory by
+        directory, so reading them in listing order never seeks backwards in
+        a compressed tar.
+
+        Yields:
+            "/"-separated member paths.
+        """
+        dir_cache: Dict[str, bool] = {}
+        for path in list(archive.members):
+            if not self._within_walk_budgets(path):
+                continue
+            directory = path.rpartition("/")[0]
+            if directory and self._is_dir_ignored(directory, dir_cache):
+                continue
+            if not self._is_ignored_relative(path):
+                yield path
+
+    def _walk_filesystem(self, records: bool = False) -> Iterator:
+        """
+        Walks the repository with os.scandir, pruning ignored directories.
+
+        Entry types come from the directory listing itself, so no stat calls
+        are made except to classify symlinks, and the only object allocated
+        per file is the relative path string that is yielded. As with
+        os.walk, symlinks to directories are not followed.
+
+        Args:
+            records: If True, stat each kept file through its DirEntry and
+                yield a FileRecord instead of its path.
+
+        Yields:
+            "/"-separated file paths relative to repo_path, or FileRecords,
+            directory by directory in depth-first order.
+        """
+        if self.walk_threads > 1:
+            yield from self._walk_parallel(records)
+        else:
+            pending: List[str] = [""]
+            while pending:
+                result = self._scan_directory(pending.pop(), records)
+                if result is None:
+                    continue
+                files, dirs = result
+                yield from files
+                # Push in reverse so subdirectories are visited in listing order
+                pending.extend(reversed(dirs))
+
+        # Only a complete walk knows which directories no longer exist
+        if self._scan_cache is not None and not self.truncated:
+            self._scan_cache.save()
+
+    def _walk_worker(
+        self,
+        queue: WorkStealingQueue[str],
+        index: int,
+        results: Dict[str, object],
+        ready: threading.Condition,
+        records: bool = False,
+    ) -> None:
+        """
+        Scans directories from the queue until the walk is done, publishing
+        each result (or the exception it raised) under its prefix.
+        """
+        while True:
+            prefix = queue.get(index)
+            if prefix is None:
+                return
+            try:
+                result: object = self._scan_directory(prefix, records)
+            except Exception as e:
+                result = e
+            with ready:
+                results[prefix] = result
+                ready.notify_all()
+            if isinstance(result, tuple):
+                queue.put(index, result[1])
+            queue.task_done()
+
+    def _walk_parallel(self, records: bool = False) -> Iterator:
+        """
+        Walks the repository with a pool of walk_threads listing threads.
+
+        Directories are shared through a work-stealing queue. Each scanned
+        directory is handed back to this generator, which replays them in
+        the same depth-first order as the sequential walk, so the output does
+        not depend on thread scheduling.
+
+        Yields:
+            "/"-separated file paths relative to repo_path, or FileRecords
+            if records is set.
+        """
+        queue: WorkStealingQueue[str] = WorkStealingQueue(self.walk_threads)
+        results: Dict[str, object] = {}
+        ready = threading.Condition()
+
+        queue.put(0, [""])
+        with ThreadPoolExecutor(max_workers=self.walk_threads) as executor:
+            for index in range(self.walk_threads):
+                executor.submit(
+                    self._walk_worker, queue, index, results, ready, records
+                )
+            try:
+                pending: List[str] = [""]
+                while pending:
+                    prefix = pending.pop()
+                    with ready:
+                        while prefix not in results:
+                            ready.wait()
+                        result = results.pop(prefix)
+                    if isinstance(result, Exception):
+                        raise result
+                    if result is None:
+                        continue
+                    files, dirs = result
+                    yield from files
+                    pending.extend(reversed(dirs))
+            finally:
+                # Release the workers if the caller stops early
+                queue.close()
+
+    def _get_relative_paths(self) -> List[str]:
+        """
+        Walks the repository on first use and caches the result.
+
+        Returns:
+            List of "/"-separated file paths relative to repo_path.
+        """
+        if self._watcher is not None:
+            return self._watcher.snapshot()
+        if self._relative_paths is None:
+            self._relative_paths = list(self._walk())
+        return self._relative_paths
+
+    @property
+    def file_paths(self) -> List[Path]:
+        """Paths of all matching files relative to repo_path."""
+        return [Path(path) for path in self._get_relative_paths()]
+
+    def iter_file_paths(self, relative: bool = False) -> Iterator[str]:
+        """
+        Yields file paths as the repository is walked.
+
+        Unlike get_file_paths, this does not wait for the walk to finish or
+        hold the full listing in memory, so callers can start on the first
+        file right away and stop early. If the listing has already been
+        collected, it is reused instead of walking again.
 
-            for file in files:
-                file_path = root_path / file
-                if not self._is_ignored(file_path, is_dir=False):
-                    try:
-                        file_paths.append(file_path.relative_to(self.repo_path))
-                    except ValueError:
-                        continue  # Skip files outside repo directory
+        Args:
+            relative: If True, yields paths relative to repo_path. If False,
+                yields absolute paths.
 
-        return file_paths
+        Yields:
+            File paths as strings.
+        """
+        paths = self._relative_paths
+        if self._watcher is not None:
+            paths = self._watcher.snapshot()
+        elif paths is None and self._file_records is not None:
+            paths = self._file_records.paths()
+        elif paths is None:
+            paths = self._walk()
+        if os.sep != "/":
+            paths = (path.replace("/", os.sep) for path in paths)
+        if relative:
+            yield from paths
+        else:
+            root = os.path.join(str(self.repo_path), "")
+            for path in paths:
+                yield root + path
 
     def get_file_paths(self, relative: bool = False) -> List[str]:
         """
         Returns the list of file paths as strings.
 
+        The repository is walked on the first call and the listing is cached.
+
         Args:
             relative: If True, returns paths relative to repo_path. If False, returns absolute paths.
 
         Returns:
             List of file paths as strings.
         """
-        if relative:
-            return [str(path) for path in self.file_paths]
-        return [str(self.repo_path / path) for path in self.file_paths]
+        if self._file_records is None:
+            self._get_relative_paths()
+        return list(self.iter_file_paths(relative))
+
+    def iter_file_records(self) -> Iterator[FileRecord]:
+        """
+        Yields a FileRecord for each file as the repository is walked.
+
+        Sizes and mtimes are taken from the directory listing during the
+        walk, so consumers need not stat files again. Files listed from the
+        git index, by since or while watching are stat'ed as they are
+        yielded; archive members take them from the archive. If the records
+        have already been collected, they are reused.
+
+        Yields:
+            FileRecords with paths relative to repo_path.
+        """
+        if self._watcher is not None:
+            snapshot = self._watcher.snapshot()
+            yield from self._complete_records(path for path in snapshot)
+        elif self._file_records is not None:
+            yield from self._file_records
+        else:
+            yield from self._walk(records=True)
+
+    def get_file_records(self) -> FileTable:
+        """
+        Returns a FileRecord for each file.
+
+        The repository is walked on the first call and the records are
+        cached in a FileTable, which holds a listing with sizes and mtimes
+        in about the memory of the bare path strings, and a third of what
+        Path objects take. get_file_paths reuses it.
+
+        Returns:
+            FileTable of FileRecords with paths relative to repo_path.
+        """
+        if self._watcher is not None:
+            return FileTable(self.iter_file_records())
+        if self._file_records is None:
+            self._file_records = FileTable(self._walk(records=True))
+        return self._file_records
+
+    def watch(self, poll_interval: float = 1.0, use_inotify: bool = True) -> None:
+        """
+        Starts keeping the file listing live instead of rescanning.
+
+        The tree is walked once; afterwards creations, deletions, renames and
+        .gitignore edits are applied to the in-memory listing as they happen,
+        using inotify on Linux and polling elsewhere. Callbacks registered
+        with subscribe() receive each change. The watched listing follows the
+        file system, so use_git_index does not apply to it.
+
+        Args:
+            poll_interval: Seconds between re-walks when polling.
+            use_inotify: Set to False to force polling.
+
+        Raises:
+            ValueError: If repo_path is an archive.
+        """
+        if self.archive is not None:
+            raise ValueError("Archives cannot be watched")
+        if self._watcher is None:
+            self._watcher = FileWatcher(self, poll_interval, use_inotify)
+
+    def stop_watching(self) -> None:
+        """Stops a watch started with watch()."""
+        if self._watcher is not None:
+            watcher, self._watcher = self._watcher, None
+            self._relative_paths = watcher.snapshot()
+            watcher.stop()
+
+    def subscribe(self, callback: Callable[[FileChange], None]) -> None:
+        """
+        Registers a callback for changes to the listing while watching.
+
+        Args:
+            callback: Called from the watcher thread with each FileChange.
+        """
+        self._change_callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[FileChange], None]) -> None:
+        """Removes a callback registered with subscribe()."""
+        self._change_callbacks.remove(callback)
+
+    def _notify(self, change: FileChange) -> None:
+        """Passes a change from the watcher to every subscriber."""
+        self._file_kinds.pop(change.absolute_path, None)
+        self.content_hashes.pop(change.path, None)
+        if change.kind == DELETED:
+            self._content_index.discard(change.path)
+        for callback in list(self._change_callbacks):
+            try:
+                callback(change)
+            except Exception as e:
+                # A failing subscriber must not stop the watcher thread
+                print(f"Error handling change to {change.path}: {e}")
+
+    def build_content_index(
+        self,
+        file_paths: Optional[Iterable[Union[str, Path]]] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, ContentEntry]:
+        """
+        Hashes the content of many files on a thread pool.
+
+        Hashes recorded for a file with the same size and mtime are reused
+        without reading it. hashlib releases the GIL while hashing, so new
+        hashes are computed in parallel. With content_index set, the index
+        is saved afterwards.
+
+        Args:
+            file_paths: Paths to hash, absolute or relative to repo_path.
+                Defaults to every listed file, in which case files no longer
+                listed are dropped from the index.
+            max_workers: Number of hashing threads. Defaults to the
+                ThreadPoolExecutor default.
+
+        Returns:
+            ContentEntry of each readable file, keyed by "/"-separated path
+            relative to repo_path. Also kept as content_hashes.
+        """
+        full_scan = file_paths is None
+        if file_paths is None:
+            file_paths = self.iter_file_paths(relative=True)
+
+        hashes: Dict[str, ContentEntry] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self._hash_relative, self._relative_key(path))
+                for path in file_paths
+            ]
+            for future in futures:
+                relative_path, entry = future.result()
+                if entry is not None:
+                    hashes[relative_path] = entry
+
+        if full_scan:
+            self._content_index.prune(set(hashes))
+        self._content_index.save()
+        self.content_hashes = hashes
+        return hashes
+
+    def content_hash(
+        self,
+        file_path: Union[str, Path],
+        kinds: Optional[Collection[str]] = None,
+    ) -> Optional[ContentEntry]:
+        """
+        Returns the content hash of a single file, hashing it only if its
+        size or mtime changed since it was last hashed.
+
+        Args:
+            file_path: Path to the file, absolute or relative to repo_path.
+            kinds: If given, only files classified as one of these kinds
+                (see classify_file) are hashed, so e.g. oversized files are
+                not read in full just to be skipped. A hash still recorded
+                for the file's size and mtime is returned regardless.
+
+        Returns:
+            The file's ContentEntry, or None if it cannot be read or is not
+            of one of kinds.
+        """
+        relative_path, entry = self._hash_relative(self._relative_key(file_path), kinds)
+        if entry is not None:
+            self.content_hashes[relative_path] = entry
+        return entry
+
+    def save_content_index(self) -> None:
+        """Persists hashes computed by content_hash(), if content_index is set."""
+        self._content_index.save()
+
+    def _relative_key(self, file_path: Union[str, Path]) -> str:
+        """Returns the "/"-separated path of a file relative to repo_path."""
+        path = Path(file_path)
+        if path.is_absolute():
+            path = path.relative_to(self.repo_path)
+        return path.as_posix()
+
+    def _hash_relative(
+        self, relative_path: str, kinds: Optional[Collection[str]] = None
+    ) -> Tuple[str, Optional[ContentEntry]]:
+        """
+        Looks up or computes the hash of a file, recording new hashes. With
+        kinds, files of other kinds are not hashed.
+        """
+        if self.archive is not None:
+            if kinds is not None and self.classify_file(relative_path) not in kinds:
+                return relative_path, None
+            try:
+                return relative_path, self.archive.content_entry(relative_path)
+            except OSError:
+                return relative_path, None
+        path = os.path.join(self.repo_path, relative_path)
+        try:
+            stat = os.stat(path)
+            digest = self._content_index.lookup(relative_path, stat)
+            if digest is not None:
+                return relative_path, ContentEntry(
+                    stat.st_size, stat.st_mtime_ns, digest
+                )
+            if kinds is not None and self._kind_from_stat(path, stat) not in kinds:
+                return relative_path, None
+            entry = hash_file(path)
+        except OSError:
+            return relative_path, None
+        self._content_index.store(relative_path, entry)
+        return relative_path, entry
+
+    def classify_file(self, file_path: Union[str, Path]) -> Optional[str]:
+        """
+        Classifies a file as text, binary or oversized without reading it
+        whole.
+
+        Only the size and the first SNIFF_SIZE bytes are looked at, and the
+        result is cached until a watched change to the file is reported.
+
+        Args:
+            file_path: Path to the file.
+
+        Returns:
+            TEXT, BINARY or OVERSIZED, or None if the file cannot be read.
+        """
+        path = str(self.repo_path / file_path)
+        kind = self._file_kinds.get(path)
+        if kind is not None:
+            return kind
+        if self.archive is not None:
+            kind = self._classify_member(self._relative_key(file_path))
+            if kind is not None:
+                self._file_kinds[path] = kind
+            return kind
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if not S_ISREG(stat.st_mode):
+                    return None
+                if self._is_oversized(stat.st_size):
+                    kind = OVERSIZED
+                else:
+                    kind = classify_head(f.read(SNIFF_SIZE))
+        except OSError:
+            return None
+        self._file_kinds[path] = kind
+        return kind
+
+    def _classify_member(self, relative_path: str) -> Optional[str]:
+        """Classifies an archive member, or returns None if it can't be read."""
+        member = self.archive.members.get(relative_path)
+        if member is None:
+            return None
+        if self._is_oversized(member.size):
+            return OVERSIZED
+        try:
+            return classify_head(self.archive.read(relative_path, SNIFF_SIZE))
+        except OSError:
+            return None
+
+    def _is_oversized(self, size: int) -> bool:
+        return self.max_file_size is not None and size > self.max_file_size
+
+    def _kind_from_stat(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """
+        Classifies a file as classify_file does, without opening it if its
+        stat already shows it is oversized.
+        """
+        if S_ISREG(stat.st_mode) and self._is_oversized(stat.st_size):
+            return OVERSIZED
+        return self.classify_file(path)
 
     def read_file_text(self, file_path: Union[str, Path]) -> Optional[str]:
         """
         Reads the content of a file as text.
 
+        Binary and oversized files (see classify_file) are not read beyond
+        their first SNIFF_SIZE bytes.
+
         Args:
             file_path: Path to the file.
 
         Returns:
-            File content as string or None if file cannot be read.
+            File content as string or None if file cannot be read, or is
+            binary or oversized.
 
         Raises:
             UnicodeDecodeError: If the file cannot be decoded as UTF-8.
             PermissionError: If there are insufficient permissions to read the file.
         """
-        path = self.repo_path / file_path
+        path = str(self.repo_path / file_path)
+        kind = self._file_kinds.get(path)
+        if kind is not None and kind != TEXT:
+            return None
+        if self.archive is not None:
+            data = self._read_member_bytes(path, self._relative_key(file_path), kind)
+        else:
+            data = self._read_file_bytes(path, kind)
+        if data is None:
+            return None
+        # Universal newlines, as when reading in text mode
+        return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+    def _read_file_bytes(self, path: str, kind: Optional[str]) -> Optional[bytes]:
+        """
+        Reads a text file from disk for read_file_text, classifying it first
+        unless its kind is already known.
+        """
         try:
-            if path.exists() and path.is_file():
-                return path.read_text(encoding="utf-8")
-        except (UnicodeDecodeError, PermissionError) as e:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if not S_ISREG(stat.st_mode):
+                    return None
+                if self._is_oversized(stat.st_size):
+                    self._file_kinds[path] = OVERSIZED
+                    return None
+                if kind is None:
+                    # Sniff before reading the rest of a possibly large file
+                    head = f.read(SNIFF_SIZE)
+                    kind = classify_head(head)
+                    self._file_kinds[path] = kind
+                    if kind != TEXT:
+                        return None
+                    return head + f.read()
+                return f.read()
+        except PermissionError as e:
             raise e
         except Exception:
             return None
-        return None
+
+    def _read_member_bytes(
+        self, path: str, relative_path: str, kind: Optional[str]
+    ) -> Optional[bytes]:
+        """
+        Reads a text member from the archive for read_file_text. The member
+        is read whole and classified afterwards, since reading its head
+        first would make a compressed tar seek back.
+        """
+        member = self.archive.members.get(relative_path)
+        if member is None:
+            return None
+        if self._is_oversized(member.size):
+            self._file_kinds[path] = OVERSIZED
+            return None
+        try:
+            data = self.archive.read(relative_path)
+        except OSError:
+            return None
+        if kind is None:
+            kind = classify_head(data[:SNIFF_SIZE])
+            self._file_kinds[path] = kind
+            if kind != TEXT:
+                return None
+        return data
+
+    def read_many(
+        self,
+        file_paths: Iterable[Union[str, Path]],
+        ordered: bool = True,
+        max_workers: Optional[int] = None,
+        max_bytes_in_flight: int = DEFAULT_MAX_BYTES_IN_FLIGHT,
+    ) -> Iterator[Tuple[Union[str, Path], ReadResult]]:
+        """
+        Reads many files as text on a thread pool.
+
+        file_paths is consumed lazily, so it may be a generator such as
+        iter_file_paths(). New reads are only started while less than
+        max_bytes_in_flight characters of content are read but not yet
+        consumed, so memory stays bounded by roughly max_bytes_in_flight plus
+        one file per worker, whatever the number of files.
+
+        Args:
+            file_paths: Paths of the files to read.
+            ordered: If True, yield results in the order of file_paths;
+                otherwise yield them as reads complete.
+            max_workers: Number of reader threads. Defaults to the
+                ThreadPoolExecutor default. A compressed tar is always read
+                by a single thread, in order.
+            max_bytes_in_flight: Budget for content read ahead of the caller.
+
+        Yields:
+            Tuples of (path as given, result), where result is the file's
+            content, None if it cannot be read or is binary or oversized, or
+            the UnicodeDecodeError or PermissionError read_file_text raised.
+        """
+        paths = iter(file_paths)
+        in_flight = [0]
+        lock = threading.Lock()
+
+        def read(path: Union[str, Path]) -> Tuple[Union[str, Path], ReadResult]:
+            result = self._read_text_or_error(path)
+            if isinstance(result, str):
+                with lock:
+                    in_flight[0] += len(result)
+            return path, result
+
+        if max_workers is None:
+            # ThreadPoolExecutor's own default
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        if self.archive is not None and not self.archive.random_access:
+            # Parallel reads would make a compressed tar seek back
+            max_workers = 1
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Queue enough reads to keep every worker busy
+        max_pending = max_workers * 2
+        pending: Deque[Future] = deque()
+        try:
+            while True:
+                while len(pending) < max_pending and in_flight[0] < max_bytes_in_flight:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    pending.append(executor.submit(read, path))
+                if not pending:
+                    return
+
+                path, result = self._next_read(pending, ordered).result()
+                if isinstance(result, str):
+                    with lock:
+                        in_flight[0] -= len(result)
+                yield path, result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _read_text_or_error(self, file_path: Union[str, Path]) -> ReadResult:
+        """Reads a file with read_file_text, returning its errors."""
+        try:
+            return self.read_file_text(file_path)
+        except (UnicodeDecodeError, PermissionError) as e:
+            return e
+
+    @staticmethod
+    def _next_read(pending: Deque[Future], ordered: bool) -> Future:
+        """
+        Removes the read read_many hands out next: the oldest one if ordered,
+        otherwise the first to complete.
+        """
+        if ordered:
+            return pending.popleft()
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+        return future
 
     def read_file_stream(
-        self, file_path: Union[str, Path]
-    ) -> Optional[Iterator[bytes]]:
+        self,
+        file_path: Union[str, Path],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        mmap_threshold: Optional[int] = None,
+    ) -> Optional[Iterator[Union[bytes, memoryview]]]:
         """
-        Reads the content of a file as a binary stream.
+        Reads the content of a file as a binary stream of chunks.
+
+        The file is opened before this returns, so errors surface here; the
+        returned iterator reads lazily and closes the file when exhausted or
+        closed. Chunks are bytes unless mmap_threshold is set: files of at
+        least that many bytes are then memory-mapped and yielded as
+        memoryview slices of the mapping, so no chunk is copied into a bytes
+        object. Slices stay valid as long as they are referenced; the
+        mapping is unmapped once the last one is dropped. Archive members
+        are read from the archive and yielded as bytes.
 
         Args:
             file_path: Path to the file.
+            chunk_size: Maximum size of each chunk in bytes.
+            mmap_threshold: Minimum file size to memory-map, e.g.
+                DEFAULT_MMAP_THRESHOLD, or None to never memory-map.
 
         Returns:
-            An iterator of bytes or None if file cannot be read.
+            An iterator of bytes or memoryview chunks, or None if file cannot
+            be read.
 
         Raises:
             PermissionError: If there are insufficient permissions to read the file.
         """
+        if self.archive is not None:
+            relative_path = self._relative_key(file_path)
+            if relative_path not in self.archive.members:
+                return None
+            return self.archive.iter_chunks(relative_path, chunk_size)
+
         path = self.repo_path / file_path
         try:
-            if path.exists() and path.is_file():
-                return iter([path.read_bytes()])
+            f = open(path, "rb")
         except PermissionError as e:
             raise e
         except Exception:
             return None
-        return None
+
+        try:
+            stat = os.fstat(f.fileno())
+            if not S_ISREG(stat.st_mode):
+                f.close()
+                return None
+        except OSError:
+            f.close()
+            return None
+
+        if mmap_threshold is not None and stat.st_size >= max(mmap_threshold, 1):
+            return self._iter_mmap_chunks(f, chunk_size)
+        return self._iter_read_chunks(f, chunk_size)
+
+    @staticmethod
+    def _iter_read_chunks(f: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+        """Yields chunks read from an open file, closing it at the end."""
+        with f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    @staticmethod
+    def _iter_mmap_chunks(f: BinaryIO, chunk_size: int) -> Iterator[memoryview]:
+        """
+        Yields memoryview slices of a memory-mapped file, closing it at the
+        end.
+        """
+        with f:
+            try:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Not mappable (e.g. a special file): fall back to reading
+                yield from FileGetter._iter_read_chunks(f, chunk_size)
+                return
+            if hasattr(mapping, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapping.madvise(mmap.MADV_SEQUENTIAL)
+            # The mapping is not closed explicitly: the slices handed out
+            # keep it alive, and it is unmapped when the last one is dropped
+            view = memoryview(mapping)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    yield view[offset : offset + chunk_size]
+            finally:
+                view.release()
 
 
 def parse_pattern_list(arg: str) -> List[str]:
     """
     Parse a comma-separated string of glob patterns, preserving any commas that are part of the patterns.
-    Patterns can be quoted if they contain commas.
+    Patterns can be quoted if they contain commas. Commas inside "{...}"
+    alternatives, as in "src/**/*.{cpp,h}", never split patterns; the
+    alternatives are expanded by PatternMatcher.
 
     Args:
         arg: Comma-separated string of patterns
@@ -208,15 +1574,20 @@ def parse_pattern_list(arg: str) -> List[str]:
     patterns = []
     current = []
     in_quotes = False
+    brace_depth = 0
 
     for char in arg:
         if char == '"':
             in_quotes = not in_quotes
-        elif char == "," and not in_quotes:
+        elif char == "," and not in_quotes and brace_depth == 0:
             if current:
                 patterns.append("".join(current).strip().strip('"'))
                 current = []
         else:
+            if char == "{":
+                brace_depth += 1
+            elif char == "}" and brace_depth:
+                brace_depth -= 1
             current.append(char)
 
     if current:
@@ -225,13 +1596,82 @@ def parse_pattern_list(arg: str) -> List[str]:
     return patterns
 
 
+def _format_record(
+    path: str, output_format: str, stat: Optional[Tuple[int, int]]
+) -> bytes:
+    """Formats one file for write_listing, without its separator."""
+    if output_format == "ndjson":
+        record: Dict[str, object] = {"path": path}
+        if stat is not None:
+            record["size"] = stat[0]
+            record["mtime"] = stat[1] / 1e9
+        return json.dumps(record).encode("ascii")
+    line = os.fsencode(path)
+    if stat is not None:
+        line += f"\t{stat[0]}\t{stat[1] / 1e9}".encode("ascii")
+    return line
+
+
+def write_listing(
+    file_getter: FileGetter,
+    output_format: str,
+    out: BinaryIO,
+    with_stat: bool = False,
+) -> int:
+    """
+    Writes the file listing one record at a time while the walk progresses.
+
+    Formats:
+        lines: one path per line
+        null: paths terminated by NUL bytes, for xargs -0
+        ndjson: one JSON object per line, {"path": ...}
+
+    With with_stat, ndjson records gain "size" (bytes) and "mtime" (seconds
+    since the epoch) fields, and lines get both appended, tab-separated.
+    Both come from the walk's FileRecords, so no file is stat'ed twice.
+
+    Args:
+        file_getter: The FileGetter to list.
+        output_format: "lines", "null" or "ndjson".
+        out: Binary stream to write to. Paths are written as their file
+            system bytes.
+        with_stat: Whether to include each file's size and mtime.
+
+    Returns:
+        Number of files written.
+
+    Raises:
+        ValueError: If output_format is unknown, or with_stat is combined
+            with the null format.
+    """
+    if output_format not in ("lines", "null", "ndjson"):
+        raise ValueError(f"Unknown output format: {output_format}")
+    if with_stat and output_format == "null":
+        raise ValueError("Size and mtime cannot be written in the null format")
+    separator = b"\0" if output_format == "null" else b"\n"
+    count = 0
+    if with_stat:
+        root = os.path.join(str(file_getter.repo_path), "")
+        for record in file_getter.iter_file_records():
+            path = root + record.path.replace("/", os.sep)
+            stat = (record.size, record.mtime_ns)
+            out.write(_format_record(path, output_format, stat) + separator)
+            count += 1
+    else:
+        for path in file_getter.iter_file_paths():
+            out.write(_format_record(path, output_format, None) + separator)
+            count += 1
+    return count
+
+
 def main():
     parser = argparse.ArgumentParser(description="List files in a repository.")
     parser.add_argument(
         "repo_path",
         nargs="?",
         default=".",
-        help="Path to the repository (defaults to current directory)",
+        help="Path to the repository or to a zip or tar archive "
+        "(defaults to current directory)",
     )
     parser.add_argument(
         "--include",
@@ -243,14 +1683,103 @@ def main():
         type=parse_pattern_list,
         help='Comma-separated glob patterns to exclude. Use quotes for patterns containing commas. Example: "test_*.py,**/*.tmp"',
     )
+    parser.add_argument(
+        "--walk-threads",
+        type=int,
+        default=1,
+        help="Number of threads listing directories (default: 1). "
+        "Higher values speed up walks on network filesystems.",
+    )
+    parser.add_argument(
+        "--git-index",
+        action="store_true",
+        help="List the files tracked in the git index instead of walking the tree",
+    )
+    parser.add_argument(
+        "--untracked",
+        action="store_true",
+        help="With --git-index, also walk the tree for untracked files",
+    )
+    parser.add_argument(
+        "--scan-cache",
+        action="store_true",
+        help="Reuse directory listings from the previous run where unchanged",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for persistent caches (default: ~/.cache/eye-or)",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        help="Stop scanning after this many files",
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        help="Stop scanning once the listed files total this many bytes",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        help="Do not descend more than this many directories (0: root only)",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        help="Stop scanning after this many seconds",
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REF",
+        help="List only files that differ from this git ref, e.g. origin/main",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="list",
+        help="Output format (default: list). lines, null and ndjson are "
+        "written one file at a time while scanning.",
+    )
+    parser.add_argument(
+        "--stat",
+        action="store_true",
+        help="Include each file's size and mtime (lines and ndjson formats)",
+    )
 
     args = parser.parse_args()
+    if args.stat and args.format not in ("lines", "ndjson"):
+        parser.error("--stat requires --format lines or ndjson")
     file_getter = FileGetter(
         repo_path=args.repo_path,
         include_patterns=args.include,
         exclude_patterns=args.exclude,
+        walk_threads=args.walk_threads,
+        use_git_index=args.git_index,
+        include_untracked=args.untracked,
+        scan_cache=args.scan_cache,
+        cache_dir=args.cache_dir,
+        max_files=args.max_files,
+        max_bytes=args.max_bytes,
+        max_depth=args.max_depth,
+        time_limit=args.time_limit,
+        since=args.since,
     )
-    print(file_getter.get_file_paths())
+    if args.format == "list":
+        print(file_getter.get_file_paths())
+    else:
+        try:
+            write_listing(file_getter, args.format, sys.stdout.buffer, args.stat)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away, e.g. head; stop quietly as other tools do
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+    if file_getter.truncated:
+        print(
+            f"Warning: listing truncated by {file_getter.truncated_by}",
+            file=sys.stderr,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+import codecs
+
+TEXT = "text"
+BINARY = "binary"
+OVERSIZED = "oversized"
+
+# How much of a file is inspected to tell text from binary
+SNIFF_SIZE = 8192
+
+# Largest file read as text by default
+DEFAULT_MAX_FILE_SIZE = 32 << 20
+
+# Share of undecodable bytes above which a NUL-free file is considered binary
+_MAX_INVALID_RATIO = 0.1
+
+# Signatures of common binary formats, checked at offset 0
+_MAGIC_NUMBERS = (
+    b"\x89PNG\r\n\x1a\n",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",  # JPEG
+    b"II*\x00",  # TIFF
+    b"MM\x00*",
+    b"RIFF",  # WAV, AVI, WebP
+    b"OggS",
+    b"fLaC",
+    b"ID3",  # MP3
+    b"%PDF-",
+    b"PK\x03\x04",  # zip, jar, wheel, docx
+    b"\x1f\x8b",  # gzip
+    b"BZh",
+    b"\xfd7zXZ\x00",
+    b"(\xb5/\xfd",  # zstd
+    b"7z\xbc\xaf\x27\x1c",
+    b"Rar!\x1a\x07",
+    b"\x7fELF",
+    b"\xca\xfe\xba\xbe",  # Mach-O universal, Java class
+    b"\xcf\xfa\xed\xfe",  # Mach-O 64-bit
+    b"\xce\xfa\xed\xfe",
+    b"\x00asm",  # WebAssembly
+    b"SQLite format 3\x00",
+    b"\x93NUMPY",
+    b"PAR1",  # Parquet
+)
+
+
+def classify_head(head: bytes) -> str:
+    """
+    Classifies a file as text or binary from its first bytes.
+
+    A file is binary if it starts with a known binary signature, contains a
+    NUL byte, or has too many bytes that are not valid UTF-8. A multi-byte
+    character cut off at the end of head is not counted as invalid.
+
+    Args:
+        head: The first bytes of the file, typically SNIFF_SIZE of them.
+
+    Returns:
+        TEXT or BINARY.
+    """
+    if not head:
+        return TEXT
+    if head.startswith(_MAGIC_NUMBERS) or b"\x00" in head:
+        return BINARY
+
+    decoded = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(head)
+    invalid = decoded.count("\ufffd")
+    if invalid and invalid / len(head) > _MAX_INVALID_RATIO:
+        return BINARY
+    return TEXT
@@ -0,0 +1,116 @@
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List
+
+
+class FileRecord:
+    """
+    A listed file with the size and mtime it had when it was listed.
+
+    Records are meant to be held by the hundred thousand: they have no
+    instance dict, and every record of a directory shares one interned
+    directory prefix, so each record only owns its name.
+    """
+
+    __slots__ = ("directory", "name", "size", "mtime_ns")
+
+    def __init__(self, directory: str, name: str, size: int, mtime_ns: int) -> None:
+        """
+        Args:
+            directory: "/"-terminated directory path relative to the
+                repository root, or "" for the root. Interned.
+            name: The file name.
+            size: Size in bytes.
+            mtime_ns: Modification time in nanoseconds since the epoch.
+        """
+        self.directory = sys.intern(directory)
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def from_path(cls, path: str, size: int, mtime_ns: int) -> "FileRecord":
+        """Creates a record from a "/"-separated relative path."""
+        directory, _, name = path.rpartition("/")
+        return cls(directory + "/" if directory else "", name, size, mtime_ns)
+
+    @property
+    def path(self) -> str:
+        """The "/"-separated path relative to the repository root."""
+        return self.directory + self.name
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.path!r}, size={self.size}, mtime_ns={self.mtime_ns})"
+
+
+class FileTable:
+    """
+    Many FileRecords stored column by column.
+
+    Sizes and mtimes go into typed arrays and each directory prefix is
+    stored once, so a file costs little more than its name. Records are
+    created on access; use paths() to go through the paths alone.
+    """
+
+    __slots__ = (
+        "_directories",
+        "_directory_ids",
+        "_dir_index",
+        "_names",
+        "_sizes",
+        "_mtimes",
+    )
+
+    def __init__(self, records: Iterable[FileRecord] = ()) -> None:
+        """
+        Args:
+            records: Records to store, in order.
+        """
+        self._directories: List[str] = []
+        self._directory_ids: Dict[str, int] = {}
+        self._dir_index = array("I")
+        self._names: List[str] = []
+        self._sizes = array("q")
+        self._mtimes = array("q")
+        self.extend(records)
+
+    def append(self, record: FileRecord) -> None:
+        """Adds a record at the end."""
+        directory_id = self._directory_ids.get(record.directory)
+        if directory_id is None:
+            directory_id = len(self._directories)
+            self._directories.append(record.directory)
+            self._directory_ids[record.directory] = directory_id
+        self._dir_index.append(directory_id)
+        self._names.append(record.name)
+        self._sizes.append(record.size)
+        self._mtimes.append(record.mtime_ns)
+
+    def extend(self, records: Iterable[FileRecord]) -> None:
+        """Adds records at the end, in order."""
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, index: int) -> FileRecord:
+        return FileRecord(
+            self._directories[self._dir_index[index]],
+            self._names[index],
+            self._sizes[index],
+            self._mtimes[index],
+        )
+
+    def __iter__(self) -> Iterator[FileRecord]:
+        directories = self._directories
+        for directory_id, name, size, mtime_ns in zip(
+            self._dir_index, self._names, self._sizes, self._mtimes
+        ):
+            yield FileRecord(directories[directory_id], name, size, mtime_ns)
+
+    def paths(self) -> Iterator[str]:
+        """Yields the "/"-separated relative path of each file, in order."""
+        directories = self._directories
+        for directory_id, name in zip(self._dir_index, self._names):
+            yield directories[directory_id] + name
@@ -0,0 +1,64 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Union
+
+
+def _git(work_dir: Union[str, Path], *args: str) -> bytes:
+    """
+    Runs a git command in work_dir and returns its output.
+
+    Raises:
+        ValueError: If git is missing or the command fails.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(work_dir), *args],
+            capture_output=True,
+            check=False,
+        )
+    except OSError as e:
+        raise ValueError(f"Cannot run git: {e}") from e
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip()
+        raise ValueError(f"git {args[0]} failed: {message}")
+    return result.stdout
+
+
+def _split_paths(output: bytes) -> List[str]:
+    """Splits NUL-terminated paths from git's -z output."""
+    return [os.fsdecode(path) for path in output.split(b"\0") if path]
+
+
+def changed_files(work_dir: Union[str, Path], ref: str) -> List[str]:
+    """
+    Lists the files in a directory of a git work tree that differ from ref.
+
+    This covers committed, staged and unstaged changes as well as untracked
+    files that are not ignored by git. Deleted files are left out, since
+    there is nothing left to process. Renames show up as their new path.
+
+    Args:
+        work_dir: Directory inside a git work tree. Only files below it are
+            listed.
+        ref: Any git revision, e.g. "origin/main" or a commit id.
+
+    Returns:
+        "/"-separated paths relative to work_dir, in git's order.
+
+    Raises:
+        ValueError: If work_dir is not in a git work tree or ref is unknown.
+    """
+    diff = _git(
+        work_dir,
+        "diff",
+        "--name-only",
+        "-z",
+        "--no-renames",
+        "--diff-filter=d",
+        "--relative",
+        ref,
+        "--",
+    )
+    untracked = _git(work_dir, "ls-files", "-z", "--others", "--exclude-standard")
+    return list(dict.fromkeys(_split_paths(diff) + _split_paths(untracked)))
@@ -0,0 +1,203 @@
+import struct
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+# Fixed-size part of an index entry: ctime, mtime (seconds and nanoseconds),
+# dev, ino, mode, uid, gid and size as 32-bit integers, followed by the object
+# id and the 16-bit flags. The object id length depends on the hash algorithm.
+# Only mtime, mode, size, object id and flags are unpacked.
+_ENTRY_HEADER = {
+    20: struct.Struct(">8xII8xI8xI20sH"),
+    32: struct.Struct(">8xII8xI8xI32sH"),
+}
+
+_FLAG_EXTENDED = 0x4000
+# Length of the path, or _NAME_MASK if it is that long or longer
+_NAME_MASK = 0x0FFF
+_EXTENDED_SKIP_WORKTREE = 0x4000
+
+_MODE_TYPE_MASK = 0o170000
+_MODE_DIRECTORY = 0o040000
+_MODE_SYMLINK = 0o120000
+_MODE_GITLINK = 0o160000
+
+# Paths are decoded as os.fsdecode does, without a call per entry
+_FS_ENCODING = sys.getfilesystemencoding()
+_FS_ERRORS = sys.getfilesystemencodeerrors()
+
+
+@dataclass(slots=True)
+class IndexEntry:
+    """
+    A file tracked in the git index, as recorded when it was last staged.
+
+    Not frozen: an index holds one entry per tracked file, and a frozen
+    dataclass costs several times as much to construct.
+    """
+
+    path: str
+    mode: int
+    size: int
+    mtime_ns: int
+    oid: bytes
+
+    @property
+    def hexsha(self) -> str:
+        """The blob's object id as a hex string."""
+        return self.oid.hex()
+
+    @property
+    def is_symlink(self) -> bool:
+        """True if the entry is a symbolic link rather than a regular file."""
+        return self.mode & _MODE_TYPE_MASK == _MODE_SYMLINK
+
+
+def find_work_tree(path: Union[str, Path]) -> Optional[Tuple[Path, Path]]:
+    """
+    Finds the git work tree containing a path and its git directory.
+
+    Follows "gitdir:" files as used by linked worktrees and submodules.
+
+    Args:
+        path: A directory inside a git work tree.
+
+    Returns:
+        Tuple of (work tree root, git directory), or None if path is not in a
+        work tree.
+    """
+    path = Path(path).resolve()
+    for directory in (path, *path.parents):
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return directory, dot_git
+        if dot_git.is_file():
+            try:
+                content = dot_git.read_text(encoding="utf-8").strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir:"):
+                git_dir = directory / content[len("gitdir:") :].strip()
+                return directory, git_dir.resolve()
+            return None
+    return None
+
+
+def _object_id_length(git_dir: Path) -> int:
+    """Returns 32 for repositories using SHA-256 object ids, otherwise 20."""
+    config = git_dir / "config"
+    if not config.is_file():
+        # Linked worktrees keep their config in the common directory
+        common = git_dir / "commondir"
+        if not common.is_file():
+            return 20
+        config = (git_dir / common.read_text().strip()).resolve() / "config"
+    try:
+        for line in config.read_text(encoding="utf-8", errors="replace").splitlines():
+            key, _, value = line.partition("=")
+            if key.strip().lower() == "objectformat":
+                return 32 if value.strip().lower() == "sha256" else 20
+    except OSError:
+        pass
+    return 20
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decodes git's offset varint used for v4 path compression."""
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def read_git_index(git_dir: Union[str, Path]) -> List[IndexEntry]:
+    """
+    Parses the entries of a git index file (versions 2, 3 and 4).
+
+    Entries that do not correspond to a file in the work tree are dropped:
+    submodules, sparse directory entries and skip-worktree entries. Paths
+    with unresolved merge conflicts appear once per stage in the index but
+    only once in the result.
+
+    Args:
+        git_dir: Path to the git directory.
+
+    Returns:
+        Index entries in index order, which is sorted by path.
+
+    Raises:
+        ValueError: If the index file is malformed or of an unknown version.
+        OSError: If the index file cannot be read.
+    """
+    git_dir = Path(git_dir)
+    with open(git_dir / "index", "rb") as f:
+        data = f.read()
+
+    if len(data) < 12 or data[:4] != b"DIRC":
+        raise ValueError(f"Not a git index file: {git_dir / 'index'}")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        raise ValueError(f"Unsupported git index version: {version}")
+
+    header = _ENTRY_HEADER[_object_id_length(git_dir)]
+    unpack_header = header.unpack_from
+    entries: List[IndexEntry] = []
+    previous_path = b""
+    last_kept = None
+    offset = 12
+
+    try:
+        for _ in range(count):
+            start = offset
+            mtime, mtime_nsec, mode, size, oid, flags = unpack_header(data, offset)
+            offset += header.size
+            extended_flags = 0
+            if version >= 3 and flags & _FLAG_EXTENDED:
+                (extended_flags,) = struct.unpack_from(">H", data, offset)
+                offset += 2
+
+            if version == 4:
+                strip, offset = _read_varint(data, offset)
+                end = data.index(b"\0", offset)
+                raw_path = (
+                    previous_path[: len(previous_path) - strip] + data[offset:end]
+                )
+                offset = end + 1
+            else:
+                name_length = flags & _NAME_MASK
+                if name_length < _NAME_MASK:
+                    end = offset + name_length
+                else:
+                    end = data.index(b"\0", offset)
+                raw_path = data[offset:end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                offset = start + ((end - start + 8) & ~7)
+            previous_path = raw_path
+
+            mode_type = mode & _MODE_TYPE_MASK
+            if (
+                raw_path == last_kept
+                or extended_flags & _EXTENDED_SKIP_WORKTREE
+                or mode_type in (_MODE_DIRECTORY, _MODE_GITLINK)
+            ):
+                continue
+            last_kept = raw_path
+
+            entries.append(
+                IndexEntry(
+                    raw_path.decode(_FS_ENCODING, _FS_ERRORS),
+                    mode,
+                    size,
+                    mtime * 1_000_000_000 + mtime_nsec,
+                    oid,
+                )
+            )
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Truncated or corrupt git index: {git_dir / 'index'}") from e
+
+    return entries
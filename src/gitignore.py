@@ -0,0 +1,350 @@
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+# Characters that make a pattern a glob rather than a literal path
+GLOB_CHARS = frozenset("*?[\\")
+
+
+def _translate_class(body: str) -> str:
+    """Translates the inside of a "[...]" character class."""
+    negated = body[:1] in ("!", "^")
+    if negated:
+        body = body[1:]
+    chars: List[str] = []
+    i = 0
+    while i < len(body):
+        char = body[i]
+        if char == "\\" and i + 1 < len(body):
+            i += 1
+            chars.append(re.escape(body[i]))
+        elif char == "-":
+            chars.append(char)
+        else:
+            chars.append(re.escape(char))
+        i += 1
+    return ("^" if negated else "") + "".join(chars)
+
+
+def _translate_stars(pattern: str, i: int) -> Tuple[str, int]:
+    """Translates the run of "*" starting at ``i``; returns (regex, next index)."""
+    n = len(pattern)
+    j = i
+    while j < n and pattern[j] == "*":
+        j += 1
+    if j - i == 2 and (i == 0 or pattern[i - 1] == "/"):
+        if j < n and pattern[j] == "/":
+            # "**/" matches zero or more leading directories
+            return "(?:.*/)?", j + 1
+        if j == n:
+            # trailing "**" matches everything inside
+            return ".*", j
+    return "[^/]*", j
+
+
+def _translate_bracket(pattern: str, i: int) -> Tuple[str, int]:
+    """Translates the "[...]" starting at ``i``; returns (regex, next index)."""
+    n = len(pattern)
+    j = i + 1
+    if j < n and pattern[j] in "!^":
+        j += 1
+    if j < n and pattern[j] == "]":
+        j += 1
+    while j < n and pattern[j] != "]":
+        j += 1
+    if j >= n:
+        # Unterminated class: treat "[" literally
+        return re.escape("["), i + 1
+    return f"(?!/)[{_translate_class(pattern[i + 1 : j])}]", j + 1
+
+
+def translate_glob(pattern: str) -> str:
+    """
+    Translates a gitignore glob into a regex body.
+
+    "*" and "?" never match "/", "**" spans directories when it forms a whole
+    path segment, and a backslash escapes the next character.
+    """
+    parts: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            part, i = _translate_stars(pattern, i)
+        elif char == "[":
+            part, i = _translate_bracket(pattern, i)
+        elif char == "?":
+            part, i = "[^/]", i + 1
+        elif char == "\\" and i + 1 < n:
+            part, i = re.escape(pattern[i + 1]), i + 2
+        else:
+            part, i = re.escape(char), i + 1
+        parts.append(part)
+    return "".join(parts)
+
+
+class GitIgnoreRule:
+    """A single parsed line of a .gitignore file."""
+
+    __slots__ = ("pattern", "negated", "dir_only", "anchored")
+
+    def __init__(self, pattern: str, negated: bool, dir_only: bool, anchored: bool):
+        self.pattern = pattern
+        self.negated = negated
+        self.dir_only = dir_only
+        self.anchored = anchored
+
+    @classmethod
+    def parse(cls, line: str) -> Optional["GitIgnoreRule"]:
+        """
+        Parses a .gitignore line.
+
+        Args:
+            line: A raw line from a .gitignore file.
+
+        Returns:
+            The parsed rule, or None for blank lines and comments.
+        """
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            return None
+
+        # Trailing spaces are ignored unless escaped with a backslash
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+
+        # A slash at the beginning or middle anchors the pattern to the
+        # directory of the .gitignore file; otherwise it matches at any depth.
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return None
+
+        return cls(line, negated, dir_only, anchored)
+
+
+class _RuleBuckets:
+    """
+    Rules of one .gitignore bucketed by shape for fast lookup.
+
+    Each bucket maps to the highest rule index it holds, so the last matching
+    rule, which decides the outcome in git, is found without trying every rule.
+    """
+
+    def __init__(self, indexed_rules: List[Tuple[int, GitIgnoreRule]]) -> None:
+        self.names: Dict[str, int] = {}
+        self.extensions: Dict[str, int] = {}
+        self.paths: Dict[str, int] = {}
+        name_globs: List[Tuple[int, str]] = []
+        path_globs: List[Tuple[int, str]] = []
+
+        for index, rule in indexed_rules:
+            pattern = rule.pattern
+            literal = not any(char in GLOB_CHARS for char in pattern)
+            if rule.anchored:
+                if literal:
+                    self.paths[pattern] = index
+                else:
+                    path_globs.append((index, translate_glob(pattern)))
+            elif literal:
+                self.names[pattern] = index
+            elif (
+                pattern.startswith("*.")
+                and not any(char in GLOB_CHARS for char in pattern[2:])
+                and "." not in pattern[2:]
+            ):
+                self.extensions[pattern[1:]] = index
+            else:
+                name_globs.append((index, translate_glob(pattern)))
+
+        self.name_regex = self._compile(name_globs)
+        self.path_regex = self._compile(path_globs)
+
+    @staticmethod
+    def _compile(globs: List[Tuple[int, str]]) -> Optional[Pattern[str]]:
+        """
+        Combines globs into one regex whose first matching alternative is the
+        rule with the highest index; the alternative's group name encodes it.
+        """
+        if not globs:
+            return None
+        alternatives = [f"(?P<r{index}>{body})\\Z" for index, body in reversed(globs)]
+        return re.compile("|".join(alternatives), re.DOTALL)
+
+    def last_match(self, relative_path: str, name: str) -> int:
+        """Returns the index of the last matching rule, or -1 if none match."""
+        # Runs for every listed path, so empty buckets are skipped and max()
+        # is avoided
+        best = self.names.get(name, -1)
+
+        if self.extensions:
+            dot = name.rfind(".")
+            if dot != -1:
+                index = self.extensions.get(name[dot:], -1)
+                if index > best:
+                    best = index
+
+        if self.paths:
+            index = self.paths.get(relative_path, -1)
+            if index > best:
+                best = index
+
+        if self.name_regex is not None:
+            match = self.name_regex.match(name)
+            if match:
+                best = max(best, int(match.lastgroup[1:]))
+
+        if self.path_regex is not None:
+            match = self.path_regex.match(relative_path)
+            if match:
+                best = max(best, int(match.lastgroup[1:]))
+
+        return best
+
+
+class GitIgnoreMatcher:
+    """
+    The compiled rules of a single ignore file.
+
+    Directory-only rules ("build/") are kept out of the bucket set used for
+    files, so each lookup is a handful of dict probes and at most two regex
+    matches regardless of how many rules the file has.
+    """
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        """
+        Parses and compiles ignore rules.
+
+        Args:
+            lines: Lines in .gitignore syntax.
+        """
+        self.rules: List[GitIgnoreRule] = []
+        for line in lines:
+            rule = GitIgnoreRule.parse(line)
+            if rule is not None:
+                self.rules.append(rule)
+
+        # True if no rule for files has a slash, so whether a file is ignored
+        # depends on its name alone
+        self.files_match_by_name = not any(
+            rule.anchored and not rule.dir_only for rule in self.rules
+        )
+        indexed = list(enumerate(self.rules))
+        self._file_buckets = _RuleBuckets(
+            [(index, rule) for index, rule in indexed if not rule.dir_only]
+        )
+        self._dir_buckets = _RuleBuckets(indexed)
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional["GitIgnoreMatcher"]:
+        """
+        Compiles an ignore file from disk.
+
+        Args:
+            path: Path to the ignore file.
+
+        Returns:
+            The compiled matcher, or None if the file is missing, unreadable
+            or holds no rules.
+        """
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                matcher = cls(f)
+        except OSError:
+            return None
+        return matcher if matcher.rules else None
+
+    def match(self, relative_path: str, name: str, is_dir: bool) -> Optional[bool]:
+        """
+        Matches a path against the rules of this file.
+
+        Args:
+            relative_path: "/"-separated path relative to the ignore file's
+                directory.
+            name: The last component of the path.
+            is_dir: True if the path is a directory.
+
+        Returns:
+            True if ignored, False if re-included by a negated rule, and None
+            if no rule matches.
+        """
+        buckets = self._dir_buckets if is_dir else self._file_buckets
+        index = buckets.last_match(relative_path, name)
+        if index == -1:
+            return None
+        return not self.rules[index].negated
+
+
+class IgnoreStack:
+    """
+    The ignore matchers that apply inside one directory.
+
+    Each directory shares its parent's stack and only adds a link when it has
+    its own .gitignore, so stacks are built once per directory during a walk
+    and inherited by every subdirectory.
+    """
+
+    __slots__ = ("matcher", "base", "parent")
+
+    def __init__(
+        self,
+        matcher: Optional[GitIgnoreMatcher],
+        base: str = "",
+        parent: Optional["IgnoreStack"] = None,
+    ) -> None:
+        """
+        Args:
+            matcher: Compiled rules for this level, or None for an empty root.
+            base: "/"-terminated directory prefix the rules are relative to,
+                or "" for the repository root.
+            parent: The stack of the enclosing directory.
+        """
+        self.matcher = matcher
+        self.base = base
+        self.parent = parent
+
+    def push(self, matcher: Optional[GitIgnoreMatcher], base: str) -> "IgnoreStack":
+        """Returns a child stack, or this stack if there is nothing to add."""
+        if matcher is None:
+            return self
+        return IgnoreStack(matcher, base, self)
+
+    @property
+    def files_match_by_name(self) -> bool:
+        """True if whether a file is ignored depends on its name alone."""
+        stack: Optional[IgnoreStack] = self
+        while stack is not None:
+            if stack.matcher is not None and not stack.matcher.files_match_by_name:
+                return False
+            stack = stack.parent
+        return True
+
+    def is_ignored(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        """
+        Applies git precedence: deeper ignore files override shallower ones,
+        and within a file the last matching rule wins.
+
+        Args:
+            relative_path: "/"-separated path relative to the repository root.
+            name: The last component of the path.
+            is_dir: True if the path is a directory.
+
+        Returns:
+            True if the path is ignored.
+        """
+        stack: Optional[IgnoreStack] = self
+        while stack is not None:
+            if stack.matcher is not None:
+                result = stack.matcher.match(
+                    relative_path[len(stack.base) :], name, is_dir
+                )
+                if result is not None:
+                    return result
+            stack = stack.parent
+        return False
@@ -1,26 +1,10 @@
 import argparse
+import sys
 from pathlib import Path
 
 from dependency_graph import DependencyGraph
 from file_getter import FileGetter, parse_pattern_list
-
-
-def get_common_module_prefix(modules):
-    """Find the common prefix of module paths using dot notation."""
-    if not modules:
-        return ""
-
-    # Split all modules into their components
-    split_modules = [mod.split(".") for mod in modules]
-
-    # Find the common prefix components
-    common = []
-    for parts in zip(*split_modules):
-        if len(set(parts)) != 1:
-            break
-        common.append(parts[0])
-
-    return ".".join(common)
+from result_cache import ResultCache
 
 
 def main():
@@ -49,6 +33,62 @@ def main():
             'containing commas. Example: "test_*.py,**/*.tmp"'
         ),
     )
+    parser.add_argument(
+        "--walk-threads",
+        type=int,
+        default=1,
+        help=(
+            "Number of threads listing directories (default: 1). "
+            "Higher values speed up walks on network filesystems."
+        ),
+    )
+    parser.add_argument(
+        "--git-index",
+        action="store_true",
+        help="List the files tracked in the git index instead of walking the tree",
+    )
+    parser.add_argument(
+        "--untracked",
+        action="store_true",
+        help="With --git-index, also walk the tree for untracked files",
+    )
+    parser.add_argument(
+        "--scan-cache",
+        action="store_true",
+        help="Reuse directory listings from the previous run where unchanged",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for persistent caches (default: ~/.cache/eye-or)",
+    )
+    parser.add_argument(
+        "--max-files",
+        type=int,
+        help="Stop scanning after this many files",
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        help="Stop scanning once the listed files total this many bytes",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        help="Do not descend more than this many directories (0: root only)",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        help="Stop scanning after this many seconds",
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REF",
+        help=(
+            "Only report files that differ from this git ref, e.g. origin/main. "
+            "Imports of unchanged files come from the result cache."
+        ),
+    )
     parser.add_argument(
         "--output",
         "-o",
@@ -68,36 +108,52 @@ def main():
         repo_path=args.repo_path,
         include_patterns=args.include,
         exclude_patterns=args.exclude,
+        walk_threads=args.walk_threads,
+        use_git_index=args.git_index,
+        include_untracked=args.untracked,
+        scan_cache=args.scan_cache,
+        cache_dir=args.cache_dir,
+        max_files=args.max_files,
+        max_bytes=args.max_bytes,
+        max_depth=args.max_depth,
+        time_limit=args.time_limit,
+        # Lets unchanged files be matched to cached results by a stat
+        content_index=args.since is not None,
     )
 
-    # Build dependency graph
-    files = file_getter.get_file_paths()
-    dep_graph = DependencyGraph(files, args.repo_path)
-
-    # Compute common prefix to trim from module paths
-    common_prefix = get_common_module_prefix(list(dep_graph.graph.keys()))
+    # Imports resolve against every file, so the graph always covers the
+    # whole repository; with --since, only changed files are parsed
+    result_cache = ResultCache.open(args.cache_dir) if args.since else None
+    try:
+        changed = set(file_getter.changed_since(args.since)) if args.since else None
+
+        # Build dependency graph, parsing files while the walk is in progress
+        files = file_getter.iter_file_paths()
+        dep_graph = DependencyGraph(files, args.repo_path, file_getter, result_cache)
+    finally:
+        if result_cache is not None:
+            result_cache.close()
+    if file_getter.truncated:
+        print(
+            f"Warning: scan truncated by {file_getter.truncated_by}; "
+            "the graph only covers the files found before that",
+            file=sys.stderr,
+        )
+
+    # Files to report, keyed by path relative to the repository; --since
+    # limits them to the changed ones
+    graph = dep_graph.to_dict(only=changed)
 
     # Save to JSON if output path specified
     if args.output:
         output_path = Path(args.output)
         # Create parent directories if they don't exist
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        dep_graph.save_json(str(output_path))
+        dep_graph.save_json(str(output_path), only=changed)
     else:
         # Print the graph to stdout if no output file specified
-        for module, deps in dep_graph.graph.items():
-            trimmed_module = (
-                module[len(common_prefix) + 1 :]
-                if common_prefix and module.startswith(common_prefix)
-                else module
-            )
-            trimmed_deps = [
-                dep[len(common_prefix) + 1 :]
-                if common_prefix and dep.startswith(common_prefix)
-                else dep
-                for dep in deps
-            ]
-            print(f"{trimmed_module} -> {list(trimmed_deps)}")
+        for module, deps in graph.items():
+            print(f"{module} -> {deps}")
 
     # Check for cycles if requested
     if args.check_cycles:
@@ -105,13 +161,7 @@ def main():
         if cycles:
             print("\nWarning: Dependency cycles detected:")
             for cycle in cycles:
-                trimmed_cycle = [
-                    mod[len(common_prefix) + 1 :]
-                    if common_prefix and mod.startswith(common_prefix)
-                    else mod
-                    for mod in cycle
-                ]
-                print(" -> ".join(trimmed_cycle))
+                print(" -> ".join(cycle))
         else:
             print("\nNo dependency cycles detected.")
 
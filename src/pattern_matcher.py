@@ -0,0 +1,226 @@
+import re
+from typing import Iterable, List, Optional, Pattern, Set, Tuple
+
+from gitignore import GLOB_CHARS, translate_glob
+
+
+def _is_literal(pattern: str) -> bool:
+    """Returns True if the pattern contains no glob metacharacters."""
+    return not any(char in GLOB_CHARS for char in pattern)
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Returns the part of a pattern before its first glob metacharacter."""
+    for index, char in enumerate(pattern):
+        if char in GLOB_CHARS:
+            return pattern[:index]
+    return pattern
+
+
+def _find_brace_group(pattern: str) -> Optional[Tuple[int, List[int], int]]:
+    """
+    Finds the first "{...}" group with a comma at its own nesting level.
+
+    Returns:
+        Tuple of (index of "{", indexes of its top-level commas, index of
+        "}"), or None if the pattern has no such group.
+    """
+    n = len(pattern)
+    for start in range(n):
+        if pattern[start] != "{" or (start and pattern[start - 1] == "\\"):
+            continue
+        depth = 0
+        commas: List[int] = []
+        i = start
+        while i < n:
+            char = pattern[i]
+            if char == "\\":
+                i += 1
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            elif char == "," and depth == 1:
+                commas.append(i)
+            i += 1
+        if i < n and commas:
+            return start, commas, i
+    return None
+
+
+def expand_braces(pattern: str) -> List[str]:
+    """
+    Expands "{a,b}" alternatives in a glob, as a shell does.
+
+    Groups may be nested, as in "src/{app,lib/{io,net}}/*.py". Braces without
+    a comma at their own level, unbalanced braces and braces escaped with a
+    backslash are kept literally.
+
+    Args:
+        pattern: Glob pattern to expand.
+
+    Returns:
+        The expanded patterns in order, without duplicates.
+    """
+    group = _find_brace_group(pattern)
+    if group is None:
+        return [pattern]
+    start, commas, end = group
+    bounds = [start, *commas, end]
+    head = pattern[:start]
+    tails = expand_braces(pattern[end + 1 :])
+    expanded: List[str] = []
+    for left, right in zip(bounds, bounds[1:]):
+        for alternative in expand_braces(pattern[left + 1 : right]):
+            expanded.extend(head + alternative + tail for tail in tails)
+    return list(dict.fromkeys(expanded))
+
+
+def _compile_alternation(regexes: List[str]) -> Optional[Pattern[str]]:
+    """Combines translated globs into a single regex, or None if there are none."""
+    if not regexes:
+        return None
+    return re.compile("(?:" + "|".join(sorted(regexes)) + r")\Z")
+
+
+class PatternMatcher:
+    """
+    A set of glob patterns compiled once for fast repeated matching.
+
+    Patterns are matched against paths relative to the repository root, with
+    the glob syntax of .gitignore files:
+
+    - ``{a,b}`` alternatives are expanded first and may be nested
+    - ``*``, ``?`` and ``[...]`` never match ``/``, while ``**`` as a whole
+      path segment matches any number of directories, so ``src/**/*.py``
+      matches both ``src/a.py`` and ``src/a/b/c.py``
+    - a pattern without ``/`` matches a file or directory name at any depth
+      (``*.py``, ``node_modules/``); other patterns match the whole relative
+      path, with an optional leading ``/``
+    - a pattern ending in ``/`` only matches directories
+    - a backslash escapes the next character
+
+    Instead of trying every pattern in turn, the expanded patterns are
+    bucketed so that most lookups are a hash probe:
+
+    - literal names and paths go into exact sets
+    - ``*.ext`` patterns go into an extension set
+    - everything else is folded into one combined regex
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        """
+        Compiles the given patterns.
+
+        Args:
+            patterns: Glob patterns to compile.
+        """
+        self.patterns: Set[str] = set(patterns)
+        self._names: Set[str] = set()
+        self._paths: Set[str] = set()
+        self._extensions: Set[str] = set()
+        self._dir_names: Set[str] = set()
+        self._dir_paths: Set[str] = set()
+        regexes: List[str] = []
+        dir_regexes: List[str] = []
+        prefixes: Set[str] = set()
+
+        for pattern in self.patterns:
+            for expanded in expand_braces(pattern):
+                dir_only = expanded.endswith("/")
+                expanded = expanded.rstrip("/")
+                anchored = "/" in expanded
+                expanded = expanded.lstrip("/")
+                if not expanded:
+                    continue
+                # Every match of an anchored pattern starts with its literal
+                # part; an unanchored one can match anywhere
+                prefixes.add(_literal_prefix(expanded) if anchored else "")
+
+                if _is_literal(expanded):
+                    if dir_only:
+                        exact = self._dir_paths if anchored else self._dir_names
+                    else:
+                        exact = self._paths if anchored else self._names
+                    exact.add(expanded)
+                elif dir_only:
+                    dir_regexes.append(self._translate(expanded, anchored))
+                elif (
+                    not anchored
+                    and expanded.startswith("*.")
+                    and _is_literal(expanded[2:])
+                    and "." not in expanded[2:]
+                ):
+                    self._extensions.add(expanded[1:])
+                else:
+                    regexes.append(self._translate(expanded, anchored))
+
+        self._regex = _compile_alternation(regexes)
+        self._dir_regex = _compile_alternation(dir_regexes)
+
+        # Tells which directories can contain a match. None if some pattern
+        # can match anywhere.
+        self._prefixes: Optional[Tuple[str, ...]] = (
+            None if "" in prefixes else tuple(sorted(prefixes))
+        )
+
+    @staticmethod
+    def _translate(pattern: str, anchored: bool) -> str:
+        """Translates a glob into a regex matched against the whole path."""
+        regex = translate_glob(pattern)
+        return regex if anchored else "(?:.*/)?" + regex
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def matches(self, relative_path: str, is_dir: bool = False) -> bool:
+        """
+        Checks whether a path matches any of the compiled patterns.
+
+        Args:
+            relative_path: Path relative to the repository root, "/"-separated.
+            is_dir: True if the path is a directory.
+
+        Returns:
+            True if any pattern matches, False otherwise.
+        """
+        name = relative_path.rpartition("/")[2]
+        if relative_path in self._paths or name in self._names:
+            return True
+
+        if self._extensions:
+            dot = name.rfind(".")
+            if dot != -1 and name[dot:] in self._extensions:
+                return True
+
+        if self._regex is not None and self._regex.match(relative_path):
+            return True
+
+        if is_dir:
+            if relative_path in self._dir_paths or name in self._dir_names:
+                return True
+            if self._dir_regex is not None and self._dir_regex.match(relative_path):
+                return True
+
+        return False
+
+    def can_match_under(self, directory: str) -> bool:
+        """
+        Checks whether any pattern could match a path inside a directory,
+        judging only from the literal leading part of each pattern.
+
+        Args:
+            directory: "/"-terminated directory path relative to the
+                repository root.
+
+        Returns:
+            False if no path below directory can match, True otherwise.
+        """
+        if self._prefixes is None:
+            return True
+        for prefix in self._prefixes:
+            if directory.startswith(prefix) or prefix.startswith(directory):
+                return True
+        return False
@@ -0,0 +1,174 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Set, Tuple, Union
+
+from cache_dir import default_cache_dir
+
+RESULT_CACHE_VERSION = 2
+
+# Default bound on the stored keys and values, in bytes
+DEFAULT_MAX_CACHE_BYTES = 256 << 20
+
+# Eviction frees this fraction of max_bytes beyond what is needed, so that it
+# does not run again on every flush
+_EVICTION_SLACK = 0.1
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used INTEGER NOT NULL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)",
+)
+
+
+class ResultCache:
+    """
+    A persistent store of per-file results keyed by content.
+
+    Keys are content digests from FileGetter's content index, possibly
+    combined with whatever else the result depends on, so a cached result
+    stays valid for as long as some file has that content, whatever its path
+    or the repository it is in. kind separates the results of different
+    stages, such as token counts per encoding and parsed imports.
+
+    Values are stored as JSON. The store is safe to use from several
+    threads.
+
+    The store is bounded: when flush() finds the keys and values take more
+    than max_bytes, the least recently used results are evicted. Uses are
+    recorded in memory and written by flush(), so a lookup never writes.
+    """
+
+    def __init__(
+        self, path: Union[str, Path], max_bytes: Optional[int] = DEFAULT_MAX_CACHE_BYTES
+    ) -> None:
+        """
+        Opens or creates the store at path.
+
+        Args:
+            path: Location of the SQLite database.
+            max_bytes: Bound on the size of the stored keys and values, or
+                None for no bound. SQLite's own overhead comes on top.
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Results read since the last flush, whose last_used is stale
+        self._used: Set[Tuple[str, str]] = set()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != RESULT_CACHE_VERSION:
+            self._connection.execute("DROP TABLE IF EXISTS results")
+            self._connection.execute(f"PRAGMA user_version={RESULT_CACHE_VERSION}")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+
+    @classmethod
+    def open(
+        cls,
+        cache_dir: Optional[Union[str, Path]] = None,
+        max_bytes: Optional[int] = DEFAULT_MAX_CACHE_BYTES,
+    ) -> "ResultCache":
+        """Opens the result store shared by all repositories in cache_dir."""
+        root = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        return cls(root / "results.sqlite", max_bytes)
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """
+        Returns a cached result, or None if there is none.
+
+        Args:
+            kind: The stage the result belongs to.
+            key: Content digest the result was computed from.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._used.add((kind, key))
+        return json.loads(row[0])
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        """
+        Stores a result. Changes are written by flush() or close().
+
+        Args:
+            kind: The stage the result belongs to.
+            key: Content digest the result was computed from.
+            value: JSON-serializable result.
+        """
+        encoded = json.dumps(value, separators=(",", ":"))
+        size = len(kind) + len(key) + len(encoded)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (kind, key, value, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, key, encoded, size, time.time_ns()),
+            )
+
+    def flush(self) -> None:
+        """
+        Records the use of results read since the last flush, evicts the
+        least recently used results if the store is over max_bytes, and
+        commits to disk.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Does the work of flush(). The caller holds the lock."""
+        if self._used:
+            now = time.time_ns()
+            self._connection.executemany(
+                "UPDATE results SET last_used = ? WHERE kind = ? AND key = ?",
+                [(now, kind, key) for kind, key in self._used],
+            )
+            self._used.clear()
+        if self.max_bytes is not None:
+            self._evict(self.max_bytes)
+        self._connection.commit()
+
+    def _evict(self, max_bytes: int) -> None:
+        """Deletes the least recently used results beyond max_bytes."""
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if total <= max_bytes:
+            return
+        excess = total - max_bytes + int(max_bytes * _EVICTION_SLACK)
+        victims = []
+        freed = 0
+        rows = self._connection.execute(
+            "SELECT kind, key, size FROM results ORDER BY last_used"
+        )
+        for kind, key, size in rows:
+            if freed >= excess:
+                break
+            victims.append((kind, key))
+            freed += size
+        rows.close()
+        self._connection.executemany(
+            "DELETE FROM results WHERE kind = ? AND key = ?", victims
+        )
+
+    def close(self) -> None:
+        """Flushes the store and closes the database."""
+        with self._lock:
+            self._flush()
+            self._connection.close()
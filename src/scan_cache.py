@@ -0,0 +1,102 @@
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from cache_dir import (
+    RACY_WINDOW_NS,
+    cache_file_for,
+    load_cache_file,
+    write_cache_file,
+)
+
+SCAN_CACHE_VERSION = 1
+
+
+class ScanCache:
+    """
+    A persistent snapshot of raw directory listings keyed by directory mtime.
+
+    Adding, removing or renaming an entry updates the mtime of its directory,
+    so a listing can be reused as long as the directory's mtime and inode are
+    unchanged. The snapshot holds listings before ignore rules are applied,
+    which means edits to .gitignore or to include/exclude patterns are picked
+    up without invalidating anything.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """
+        Loads the snapshot at path, starting empty if it is missing or stale.
+
+        Args:
+            path: Location of the snapshot file.
+        """
+        self.path = Path(path)
+        self.started_ns = time.time_ns()
+        self._previous: Dict[str, list] = load_cache_file(
+            self.path, SCAN_CACHE_VERSION, "dirs"
+        )
+        self._current: Dict[str, list] = {}
+        self._dirty = False
+
+    @classmethod
+    def for_repo(
+        cls, repo_path: Union[str, Path], cache_dir: Optional[Union[str, Path]] = None
+    ) -> "ScanCache":
+        """Opens the scan snapshot of a repository in cache_dir."""
+        return cls(cache_file_for(repo_path, "scan.json", cache_dir))
+
+    def lookup(
+        self, prefix: str, stat: os.stat_result
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Returns the cached listing of a directory if it is still valid.
+
+        Args:
+            prefix: "/"-terminated directory path relative to the repository.
+            stat: Current stat result of the directory.
+
+        Returns:
+            Tuple of (file names, subdirectory names), or None on a miss.
+        """
+        entry = self._previous.get(prefix)
+        if entry is None:
+            return None
+        mtime_ns, ino, files, dirs = entry
+        if mtime_ns != stat.st_mtime_ns or ino != stat.st_ino:
+            return None
+        self._current[prefix] = entry
+        return files, dirs
+
+    def store(
+        self, prefix: str, stat: os.stat_result, files: List[str], dirs: List[str]
+    ) -> None:
+        """
+        Records a fresh listing of a directory.
+
+        Args:
+            prefix: "/"-terminated directory path relative to the repository.
+            stat: Stat result of the directory taken before it was listed.
+            files: Names of the files in the directory.
+            dirs: Names of the subdirectories.
+        """
+        self._dirty = True
+        if stat.st_mtime_ns >= self.started_ns - RACY_WINDOW_NS:
+            return
+        self._current[prefix] = [stat.st_mtime_ns, stat.st_ino, files, dirs]
+
+    def save(self) -> None:
+        """
+        Writes the directories seen in this scan as the new snapshot.
+
+        Directories that were not visited, because they were removed or are
+        now ignored, are dropped. Nothing is written if every listing came
+        from the previous snapshot. Errors writing the cache are ignored.
+        """
+        if self._dirty or len(self._current) != len(self._previous):
+            write_cache_file(self.path, SCAN_CACHE_VERSION, "dirs", self._current)
+
+        # A later walk with the same instance validates against this scan
+        self._previous, self._current = self._current, {}
+        self._dirty = False
+        self.started_ns = time.time_ns()
@@ -0,0 +1,175 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bytes read from the start of a file to take its byte statistics; the rest
+# of a larger file is assumed to be like its start
+ESTIMATE_SAMPLE_BYTES = 64 << 10
+
+# Tokens per byte assumed for ASCII non-whitespace, whitespace and non-ASCII
+# bytes, roughly those of cl100k_base and o200k_base on source code. Only
+# their proportions matter once an extension is calibrated.
+DEFAULT_RATES = (0.3, 0.05, 0.4)
+
+# Relative error reported for extensions without calibration data
+DEFAULT_RELATIVE_ERROR = 0.5
+
+# Files with fewer exact tokens than this are not used for calibration, as
+# their ratio is mostly noise
+MIN_CALIBRATION_TOKENS = 64
+
+_ASCII = bytes(range(128))
+_WHITESPACE = b" \t\r\n"
+
+# Bytes of each class: ASCII non-whitespace, whitespace, non-ASCII
+ByteStats = Tuple[float, float, float]
+
+
+def byte_stats(head: bytes, size: int) -> ByteStats:
+    """
+    Counts the bytes of a file by class, extrapolating from its start.
+
+    Args:
+        head: The first bytes of the file, e.g. ESTIMATE_SAMPLE_BYTES of them
+        size: Size of the whole file in bytes
+
+    Returns:
+        Estimated numbers of ASCII non-whitespace, whitespace and non-ASCII
+        bytes in the file
+    """
+    if not head:
+        return (float(size), 0.0, 0.0)
+    non_ascii = len(head.translate(None, _ASCII))
+    whitespace = len(head) - len(head.translate(None, _WHITESPACE))
+    scale = size / len(head)
+    return (
+        (len(head) - non_ascii - whitespace) * scale,
+        whitespace * scale,
+        non_ascii * scale,
+    )
+
+
+@dataclass(frozen=True)
+class TokenEstimate:
+    """An estimated token count: tokens, give or take error."""
+
+    tokens: int
+    error: int
+
+
+class TokenEstimator:
+    """
+    Predicts token counts from byte statistics, without encoding.
+
+    A file's bytes are weighted by class with DEFAULT_RATES and multiplied
+    by a ratio for its extension. Ratios are calibrated on files of the
+    same repository counted exactly. The error reported for an extension is
+    the largest relative error seen when predicting each calibration file
+    from the others (leave-one-out), so it is an empirical bound rather
+    than a guarantee.
+    """
+
+    def __init__(
+        self,
+        ratios: Optional[Dict[str, float]] = None,
+        relative_errors: Optional[Dict[str, float]] = None,
+        default_ratio: float = 1.0,
+        default_relative_error: float = DEFAULT_RELATIVE_ERROR,
+    ) -> None:
+        """
+        Args:
+            ratios: Calibrated ratio of each extension, such as ".py"
+            relative_errors: Relative error bound of each extension
+            default_ratio: Ratio for extensions not in ratios
+            default_relative_error: Relative error bound for extensions not
+                in relative_errors
+        """
+        self.ratios = ratios or {}
+        self.relative_errors = relative_errors or {}
+        self.default_ratio = default_ratio
+        self.default_relative_error = default_relative_error
+
+    @staticmethod
+    def weighted_bytes(stats: ByteStats) -> float:
+        """Returns the token count DEFAULT_RATES predict for byte stats."""
+        return sum(rate * count for rate, count in zip(DEFAULT_RATES, stats))
+
+    @classmethod
+    def calibrate(
+        cls, samples: Iterable[Tuple[str, ByteStats, int]]
+    ) -> "TokenEstimator":
+        """
+        Fits an estimator to files counted exactly.
+
+        Args:
+            samples: Tuples of (extension, byte stats, exact token count)
+
+        Returns:
+            The calibrated estimator
+        """
+        # Predictions and exact counts of each extension
+        by_extension: Dict[str, List[Tuple[float, int]]] = {}
+        for extension, stats, tokens in samples:
+            predicted = cls.weighted_bytes(stats)
+            if tokens >= MIN_CALIBRATION_TOKENS and predicted > 0:
+                by_extension.setdefault(extension, []).append((predicted, tokens))
+
+        ratios = {}
+        relative_errors = {}
+        for extension, pairs in by_extension.items():
+            ratios[extension] = _ratio(pairs)
+            error = _leave_one_out_error(pairs)
+            if error is not None:
+                relative_errors[extension] = error
+
+        every_pair = [pair for pairs in by_extension.values() for pair in pairs]
+        default_ratio = _ratio(every_pair) if every_pair else 1.0
+        default_error = _leave_one_out_error(every_pair)
+        if relative_errors:
+            default_error = max([default_error or 0.0, *relative_errors.values()])
+        return cls(
+            ratios,
+            relative_errors,
+            default_ratio,
+            DEFAULT_RELATIVE_ERROR if default_error is None else default_error,
+        )
+
+    def estimate(self, extension: str, stats: ByteStats) -> TokenEstimate:
+        """
+        Estimates the token count of a file.
+
+        Args:
+            extension: The file's extension, lower case, such as ".py"
+            stats: The file's byte stats, from byte_stats
+
+        Returns:
+            The estimate and its error bound
+        """
+        tokens = self.weighted_bytes(stats) * self.ratios.get(
+            extension, self.default_ratio
+        )
+        relative_error = self.relative_errors.get(
+            extension, self.default_relative_error
+        )
+        return TokenEstimate(round(tokens), math.ceil(tokens * relative_error))
+
+
+def _ratio(pairs: List[Tuple[float, int]]) -> float:
+    """Returns the ratio of total exact to total predicted tokens."""
+    return sum(tokens for _, tokens in pairs) / sum(predicted for predicted, _ in pairs)
+
+
+def _leave_one_out_error(pairs: List[Tuple[float, int]]) -> Optional[float]:
+    """
+    Returns the largest relative error of predicting each exact count with
+    the ratio of the other pairs, or None with fewer than two pairs.
+    """
+    if len(pairs) < 2:
+        return None
+    total_predicted = sum(predicted for predicted, _ in pairs)
+    total_tokens = sum(tokens for _, tokens in pairs)
+    error = 0.0
+    for predicted, tokens in pairs:
+        ratio = (total_tokens - tokens) / (total_predicted - predicted)
+        error = max(error, abs(tokens - predicted * ratio) / tokens)
+    return error
@@ -0,0 +1,386 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from file_getter import FileGetter
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# inotify event flags, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """
+    A change to the file listing of a watched FileGetter.
+
+    Renames are reported as a deletion of the old path followed by a creation
+    of the new one.
+    """
+
+    kind: str
+    path: str
+    absolute_path: str
+
+
+class _Inotify:
+    """A minimal ctypes binding to the Linux inotify API."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Watches a directory, returning its watch descriptor.
+
+        Raises:
+            OSError: If the watch cannot be added, e.g. ENOSPC once the
+                fs.inotify.max_user_watches limit is reached.
+        """
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        """Reads pending events as (watch descriptor, mask, name) tuples."""
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """
+    Keeps a FileGetter's file listing up to date as the tree changes.
+
+    On Linux, every non-ignored directory gets an inotify watch and events
+    are applied to the listing as they arrive. Creating, editing or removing
+    a .gitignore re-evaluates only the directory it lives in. Elsewhere, or if
+    inotify is unavailable, the tree is re-walked every poll_interval seconds
+    and the listing is diffed. If a directory cannot be watched, e.g. once
+    the inotify watch limit is reached, the watcher warns on stderr and
+    switches the whole tree to polling.
+
+    Subscribers registered with FileGetter.subscribe() are called from the
+    watcher thread, once per change.
+    """
+
+    def __init__(
+        self,
+        file_getter: "FileGetter",
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ) -> None:
+        """
+        Walks the tree once and starts watching it.
+
+        Args:
+            file_getter: The FileGetter whose rules decide what is listed.
+            poll_interval: Seconds between re-walks when polling.
+            use_inotify: Set to False to force polling.
+        """
+        self.file_getter = file_getter
+        self.poll_interval = poll_interval
+        self._root = os.path.join(str(file_getter.repo_path), "")
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        # Ordered set of "/"-separated relative file paths
+        self._paths: Dict[str, None] = {}
+        # Watch descriptor <-> directory prefix
+        self._wd_prefix: Dict[int, str] = {}
+        self._prefix_wd: Dict[str, int] = {}
+        self._mtimes: Dict[str, int] = {}
+        # Pipe that wakes the inotify thread on stop()
+        self._wake_read: Optional[int] = None
+        self._wake_write: Optional[int] = None
+
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+
+        if self._inotify is not None:
+            try:
+                self._paths = dict.fromkeys(self._scan_and_watch(""))
+            except OSError as e:
+                self._fall_back_to_polling(e)
+        if self._inotify is not None:
+            self._wake_read, self._wake_write = os.pipe()
+            target = self._run_inotify
+        else:
+            self._paths = dict.fromkeys(self.file_getter._walk_filesystem())
+            self._mtimes = self._stat_all(self._paths)
+            target = self._run_polling
+
+        self._thread = threading.Thread(
+            target=target, name="eye-or-watcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def uses_inotify(self) -> bool:
+        """True if changes come from inotify rather than polling."""
+        return self._inotify is not None
+
+    def snapshot(self) -> List[str]:
+        """Returns the current listing as relative paths."""
+        with self._lock:
+            return list(self._paths)
+
+    def stop(self) -> None:
+        """Stops watching and releases the inotify descriptor."""
+        self._stop.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"\0")
+        self._thread.join()
+        if self._inotify is not None:
+            self._inotify.close()
+        if self._wake_write is not None:
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+
+    def _emit(self, kind: str, path: str) -> None:
+        """
+        Applies a change to the listing and notifies the FileGetter's
+        subscribers. Any kind other than DELETED adds the path, and is
+        reported as CREATED or MODIFIED depending on whether it was listed.
+        """
+        if kind == DELETED:
+            if path not in self._paths:
+                return
+            del self._paths[path]
+        else:
+            kind = MODIFIED if path in self._paths else CREATED
+            self._paths[path] = None
+        self.file_getter._notify(FileChange(kind, path, self._root + path))
+
+    # inotify
+
+    def _scan_and_watch(self, prefix: str) -> List[str]:
+        """
+        Walks the subtree at prefix, adding a watch to each directory kept by
+        the ignore rules and max_depth.
+
+        Returns:
+            Relative paths of the files kept in the subtree.
+
+        Raises:
+            OSError: If a directory that still exists cannot be watched.
+        """
+        files: List[str] = []
+        pending = [prefix]
+        while pending:
+            current = pending.pop()
+            if self.file_getter._exceeds_max_depth(current):
+                # A directory created below max_depth, which the walk skips
+                self.file_getter._truncate("max_depth")
+                continue
+            try:
+                wd = self._inotify.add_watch(self._root + current, _WATCH_MASK)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                    # Removed since it was listed; its parent reports that
+                    continue
+                raise
+            self._wd_prefix[wd] = current
+            self._prefix_wd[current] = wd
+            result = self.file_getter._scan_directory(current)
+            if result is None:
+                continue
+            kept_files, kept_dirs = result
+            files.extend(kept_files)
+            pending.extend(reversed(kept_dirs))
+        return files
+
+    def _unwatch(self, prefix: str) -> None:
+        """Removes the watches of the subtree at prefix."""
+        for current in [p for p in self._prefix_wd if p.startswith(prefix)]:
+            wd = self._prefix_wd.pop(current)
+            self._wd_prefix.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _paths_under(self, prefix: str) -> List[str]:
+        return [path for path in self._paths if path.startswith(prefix)]
+
+    def _rescan(self, prefix: str) -> None:
+        """Re-walks the subtree at prefix and emits the differences."""
+        self._unwatch(prefix)
+        before = set(self._paths_under(prefix))
+        after = self._scan_and_watch(prefix)
+        for path in before.difference(after):
+            self._emit(DELETED, path)
+        for path in after:
+            if path not in before:
+                self._emit(CREATED, path)
+
+    def _fall_back_to_polling(self, error: OSError) -> None:
+        """
+        Drops all watches after a directory could not be watched, so the
+        tree is polled instead of being watched in part.
+        """
+        print(
+            f"Cannot watch {error.filename}: {error.strerror}; "
+            "polling for changes instead",
+            file=sys.stderr,
+        )
+        self._inotify.close()
+        self._inotify = None
+        self._wd_prefix.clear()
+        self._prefix_wd.clear()
+        self._mtimes = self._stat_all(self._paths)
+
+    def _run_inotify(self) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._inotify.fd, self._wake_read], [], [])
+            if self._stop.is_set():
+                return
+            if self._inotify.fd not in readable:
+                continue
+            with self._lock:
+                try:
+                    for wd, mask, name in self._inotify.read_events():
+                        self._handle_event(wd, mask, name)
+                except OSError as e:
+                    self._fall_back_to_polling(e)
+            if self._inotify is None:
+                # The first poll picks up what the failed event missed
+                self._run_polling()
+                return
+
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        """Applies a single inotify event to the listing."""
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: fall back to re-walking everything
+            self.file_getter._invalidate_ignore_rules("")
+            self._rescan("")
+            return
+        if mask & IN_IGNORED:
+            prefix = self._wd_prefix.pop(wd, None)
+            if prefix is not None and self._prefix_wd.get(prefix) == wd:
+                del self._prefix_wd[prefix]
+            return
+
+        prefix = self._wd_prefix.get(wd)
+        if prefix is None or not name:
+            return
+        path = prefix + name
+
+        if name == ".gitignore" and not mask & IN_ISDIR:
+            # The rules of the whole subtree may have changed
+            self.file_getter._invalidate_ignore_rules(prefix)
+            self._rescan(prefix)
+            return
+
+        if mask & IN_ISDIR:
+            self._handle_dir_event(mask, path)
+        else:
+            self._handle_file_event(mask, path)
+
+    def _handle_dir_event(self, mask: int, path: str) -> None:
+        """Adds or drops the subtree of a created, moved or deleted directory."""
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._unwatch(path + "/")
+            for file_path in self._paths_under(path + "/"):
+                self._emit(DELETED, file_path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            if not self.file_getter._is_ignored_relative(path, True):
+                for file_path in self._scan_and_watch(path + "/"):
+                    self._emit(CREATED, file_path)
+
+    def _handle_file_event(self, mask: int, path: str) -> None:
+        """Adds, updates or drops a single file."""
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._emit(DELETED, path)
+        elif mask & (IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE):
+            if not self.file_getter._is_ignored_relative(path, False):
+                self._emit(MODIFIED, path)
+
+    # polling
+
+    def _stat_all(self, paths: Dict[str, None]) -> Dict[str, int]:
+        """Returns the mtimes of the given relative paths."""
+        mtimes: Dict[str, int] = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(self._root + path).st_mtime_ns
+            except OSError:
+                continue
+        return mtimes
+
+    def _run_polling(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.file_getter._invalidate_ignore_rules("")
+            current = dict.fromkeys(self.file_getter._walk_filesystem())
+            mtimes = self._stat_all(current)
+            with self._lock:
+                for path in [p for p in self._paths if p not in current]:
+                    self._emit(DELETED, path)
+                for path in current:
+                    if path not in self._paths:
+                        self._emit(CREATED, path)
+                    elif mtimes.get(path) != self._mtimes.get(path):
+                        self._emit(MODIFIED, path)
+                self._paths = current
+                self._mtimes = mtimes
@@ -0,0 +1,85 @@
+import threading
+from collections import deque
+from typing import Deque, Generic, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class WorkStealingQueue(Generic[T]):
+    """
+    A set of per-worker deques for recursive work such as directory walks.
+
+    Each worker pushes the work it discovers onto its own deque and pops from
+    the same end, so it keeps descending into the subtree it is already in.
+    An idle worker steals from the opposite end of another worker's deque,
+    which holds the oldest and usually largest pending subtrees. The queue
+    tracks outstanding items, so workers know the walk is finished once every
+    deque is empty and nothing is still in progress.
+    """
+
+    def __init__(self, workers: int) -> None:
+        """
+        Args:
+            workers: Number of workers that will call get().
+        """
+        self._deques: List[Deque[T]] = [deque() for _ in range(workers)]
+        self._condition = threading.Condition()
+        self._outstanding = 0
+        self._closed = False
+
+    def put(self, worker: int, items: Iterable[T]) -> None:
+        """
+        Adds work discovered by a worker to its own deque.
+
+        Args:
+            worker: Index of the worker adding the items.
+            items: Items to add, in the order they should be processed.
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._condition:
+            # Reversed so that pop() hands them out in their original order
+            self._deques[worker].extend(reversed(items))
+            self._outstanding += len(items)
+            self._condition.notify(len(items))
+
+    def get(self, worker: int) -> Optional[T]:
+        """
+        Takes the next item for a worker, stealing if its own deque is empty.
+
+        Blocks while other workers may still produce work.
+
+        Args:
+            worker: Index of the calling worker.
+
+        Returns:
+            The next item, or None once all work is done or the queue is closed.
+        """
+        count = len(self._deques)
+        with self._condition:
+            while not self._closed:
+                own = self._deques[worker]
+                if own:
+                    return own.pop()
+                for offset in range(1, count):
+                    victim = self._deques[(worker + offset) % count]
+                    if victim:
+                        return victim.popleft()
+                if self._outstanding == 0:
+                    return None
+                self._condition.wait()
+            return None
+
+    def task_done(self) -> None:
+        """Marks an item returned by get() as finished."""
+        with self._condition:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._condition.notify_all()
+
+    def close(self) -> None:
+        """Stops handing out work, releasing any blocked workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
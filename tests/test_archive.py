@@ -0,0 +1,123 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from archive import Archive, TarArchive, ZipArchive, open_archive
+from file_getter import FileGetter
+
+FILES = {
+    "a.py": b"print('a')\n",
+    "pkg/__init__.py": b"",
+    "pkg/mod.py": b"x = 1\n" * 1000,
+    "pkg/data/blob.bin": bytes(range(256)) * 64,
+    "docs/readme.md": "# résumé\n".encode(),
+    ".gitignore": b"*.log\n",
+    "skip.log": b"ignored\n",
+}
+
+
+def write_tree(root: Path) -> Path:
+    for path, content in FILES.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content)
+    return root
+
+
+def make_tar(path: Path, tree: Path, mode: str) -> Path:
+    with tarfile.open(path, mode) as tar:
+        for name in FILES:
+            tar.add(tree / name, arcname=name)
+        link = tarfile.TarInfo("link.py")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "a.py"
+        tar.addfile(link)
+        evil = tarfile.TarInfo("../evil.py")
+        evil.size = 1
+        tar.addfile(evil, io.BytesIO(b"x"))
+    return path
+
+
+def make_zip(path: Path, tree: Path) -> Path:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in FILES:
+            zf.write(tree / name, name)
+        zf.writestr("pkg/empty_dir/", b"")
+        zf.writestr("../evil.py", b"x")
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    return write_tree(tmp_path / "tree")
+
+
+@pytest.fixture(
+    params=[
+        ("t.tar", "w"),
+        ("t.tar.gz", "w:gz"),
+        ("t.tar.bz2", "w:bz2"),
+        ("t.tar.xz", "w:xz"),
+        ("t.zip", None),
+    ]
+)
+def archive_path(request, tmp_path, tree):
+    name, mode = request.param
+    if mode is None:
+        return make_zip(tmp_path / name, tree)
+    return make_tar(tmp_path / name, tree, mode)
+
+
+def test_members_and_reads(archive_path):
+    archive = open_archive(archive_path)
+    try:
+        assert isinstance(
+            archive, ZipArchive if archive_path.suffix == ".zip" else TarArchive
+        )
+        assert sorted(archive.members) == sorted(FILES)
+        # Backwards, to make a compressed tar start over
+        for path in reversed(list(archive.members)):
+            assert archive.read(path) == FILES[path]
+            assert archive.read(path, 5) == FILES[path][:5]
+            assert b"".join(archive.iter_chunks(path, 1000)) == FILES[path]
+            assert archive.members[path].size == len(FILES[path])
+        entry = archive.content_entry("pkg/mod.py")
+        assert entry == archive.content_entry("pkg/mod.py")
+        with pytest.raises(FileNotFoundError):
+            archive.read("missing.py")
+    finally:
+        archive.close()
+
+
+def test_file_getter_lists_archive_like_directory(archive_path, tree):
+    listed = FileGetter(archive_path).get_file_paths(relative=True)
+    assert sorted(listed) == sorted(FileGetter(tree).get_file_paths(relative=True))
+    assert "skip.log" not in listed
+    getter = FileGetter(archive_path)
+    assert getter.read_file_text("docs/readme.md") == FILES["docs/readme.md"].decode()
+    assert getter.read_file_text("pkg/data/blob.bin") is None
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_text("hello\n" * 200)
+    with pytest.raises(ValueError):
+        open_archive(path)
+
+
+def test_truncated_archive(tmp_path, tree):
+    path = make_tar(tmp_path / "t.tar.gz", tree, "w:gz")
+    path.write_bytes(path.read_bytes()[:200])
+    with pytest.raises(ValueError):
+        open_archive(path)
+
+
+def test_incomplete_subclass_fails_when_created(tmp_path):
+    class ReadOnly(Archive):
+        def read(self, path, limit=None):
+            return b""
+
+    with pytest.raises(TypeError):
+        ReadOnly(tmp_path / "x.zip")
@@ -0,0 +1,331 @@
+import asyncio
+import os
+import random
+import time
+
+import pytest
+import regex
+import tiktoken
+
+import file_getter
+from count_tokens import AsyncTokenCounter, TokenCounter, _split_point
+from result_cache import ResultCache
+from watcher import MODIFIED, FileChange
+
+# A byte-level encoding: one token per byte within each pretoken. Offline
+# stand-in for the real encodings, which are downloaded on first use.
+BYTE_ENCODING = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+
+# Pre-tokenizer patterns of cl100k_base and o200k_base, as in tiktoken_ext
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+"""
+    r"""| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+O200K_PATTERN = "|".join(
+    [
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]
+)
+
+# Texts the pre-tokenizers keep together across a newline or a space
+STREAM_TEXTS = [
+    "x;\n//y",
+    "a = 1;\n// note\n\tb = 2;\n/* c */\n",
+    "\n\t As it was\n  said",
+    "end.\n\n\nnext  word   and\tmore\n",
+    "x\n/y\n//z word, word;\n//w",
+]
+
+
+def pretoken_encoding(pattern):
+    """
+    An encoding with a token for every pre-token of STREAM_TEXTS and of
+    their prefixes and suffixes, so text cut where the pre-tokenizer does
+    not split it usually counts differently from the whole.
+    """
+    ranks = {bytes([i]): i for i in range(256)}
+    for text in STREAM_TEXTS:
+        parts = [text[:cut] for cut in range(len(text))]
+        parts += [text[cut:] for cut in range(len(text))]
+        for part in parts:
+            for piece in regex.findall(pattern, part):
+                piece = piece.encode()
+                for end in range(2, len(piece) + 1):
+                    ranks.setdefault(piece[:end], len(ranks))
+    return tiktoken.Encoding(
+        name="pretokens", pat_str=pattern, mergeable_ranks=ranks, special_tokens={}
+    )
+
+
+def write_tree(root, files):
+    # Old enough that content hashes are trusted on the next run
+    past = time.time_ns() - 3600 * 10**9
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode()
+        (root / path).write_bytes(content)
+        os.utime(root / path, ns=(past, past))
+    return root
+
+
+@pytest.fixture
+def tree(tmp_path):
+    return write_tree(
+        tmp_path / "repo",
+        {
+            "a.py": "x = 1\n" * 20,
+            "b.py": "y = 2\n" * 20,
+            "big.txt": "word " * 1000,
+            "blob.dat": b"\x00" * 100,
+        },
+    )
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    paths = []
+    hash_file = file_getter.hash_file
+
+    def recording_hash_file(path):
+        paths.append(os.path.basename(path))
+        return hash_file(path)
+
+    monkeypatch.setattr(file_getter, "hash_file", recording_hash_file)
+    return paths
+
+
+@pytest.mark.parametrize("stream_large_files", [False, True])
+def test_result_cache_only_hashes_counted_files(
+    tree, tmp_path, hashed, stream_large_files
+):
+    def count():
+        cache = ResultCache(tmp_path / "cache" / "results.db")
+        try:
+            counter = TokenCounter(
+                str(tree),
+                max_file_size=1000,
+                result_cache=cache,
+                tokenizer=BYTE_ENCODING,
+                stream_large_files=stream_large_files,
+            )
+            return counter.count_all_files()
+        finally:
+            cache.close()
+
+    uncached = TokenCounter(
+        str(tree),
+        max_file_size=1000,
+        tokenizer=BYTE_ENCODING,
+        stream_large_files=stream_large_files,
+    ).count_all_files()
+
+    assert count() == uncached
+    expected = ["a.py", "b.py", "big.txt"] if stream_large_files else ["a.py", "b.py"]
+    assert sorted(hashed) == expected
+
+    hashed.clear()
+    assert count() == uncached
+    assert hashed == []
+
+
+def test_result_cache_misses_changed_content(tree, tmp_path):
+    def count():
+        cache = ResultCache(tmp_path / "cache" / "results.db")
+        try:
+            counter = TokenCounter(
+                str(tree), result_cache=cache, tokenizer=BYTE_ENCODING
+            )
+            return counter.count_all_files()
+        finally:
+            cache.close()
+
+    a_py = str(tree / "a.py")
+    assert count()[a_py] == 120
+    write_tree(tree, {"a.py": "x = 10\n" * 30})
+    assert count()[a_py] == 210
+    # Back to the first content, whose count is still cached under its digest
+    write_tree(tree, {"a.py": "x = 1\n" * 20})
+    assert count()[a_py] == 120
+
+
+@pytest.mark.parametrize("pattern", [CL100K_PATTERN, O200K_PATTERN])
+@pytest.mark.parametrize("text", STREAM_TEXTS)
+def test_split_point_is_exact(pattern, text):
+    encoding = pretoken_encoding(pattern)
+    whole = len(encoding.encode_ordinary(text))
+    # Cuts made at a boundary; where none is in reach the cut is made at end
+    cuts = {
+        _split_point(text, end)
+        for end in range(1, len(text))
+        if _split_point(text, end) < end
+    }
+    for cut in cuts:
+        parts = encoding.encode_ordinary(text[:cut]) + encoding.encode_ordinary(
+            text[cut:]
+        )
+        assert len(parts) == whole, (text[:cut], text[cut:])
+
+
+@pytest.mark.parametrize("pattern", [CL100K_PATTERN, O200K_PATTERN])
+def test_stream_count_equals_whole_count(tmp_path, pattern):
+    counter = TokenCounter(str(tmp_path), tokenizer=pretoken_encoding(pattern))
+    text = "".join(STREAM_TEXTS) * 20
+    chunks = [text[i : i + 7].encode() for i in range(0, len(text), 7)]
+    whole = counter.count_tokens_in_text(text)
+    for chunk_chars in (32, 48, 64, 100):
+        assert counter.count_tokens_in_stream(chunks, chunk_chars) == whole
+
+
+def test_split_point_keeps_o200k_pretokens():
+    encoding = pretoken_encoding(O200K_PATTERN)
+    # Cut after the newline, the whole and the parts pre-tokenize differently
+    text = "x;\n//y"
+    assert len(encoding.encode_ordinary(text)) != len(
+        encoding.encode_ordinary(text[:3])
+    ) + len(encoding.encode_ordinary(text[3:]))
+    assert _split_point(text, len(text) - 1) != 3
+    assert _split_point("x;\nyy", 5) == 3
+    assert _split_point("\n\t As", 5) == 5
+    assert _split_point("a b", 3) == 1
+
+
+# Largest relative error allowed between a calibrated estimate and the exact
+# count on the generated corpus
+ESTIMATE_TOLERANCE = 0.1
+
+WORDS = ["value", "count", "items", "path", "name", "result", "index", "data"]
+
+
+def python_source(seed):
+    """Generates a Python module of varying length and indentation."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rng.randint(3, 12)):
+        lines.append(f"def {rng.choice(WORDS)}_{i}({rng.choice(WORDS)}, key=None):")
+        lines.append(f'    """{" ".join(rng.choices(WORDS, k=rng.randint(3, 10)))}."""')
+        for _ in range(rng.randint(2, 8)):
+            indent = "    " * rng.randint(1, 3)
+            lines.append(
+                f"{indent}{rng.choice(WORDS)} = "
+                f"{rng.choice(WORDS)}[{rng.randint(0, 999)}] + {rng.choice(WORDS)}"
+            )
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Sixteen Python modules, twice as many as calibration counts."""
+    files = {f"pkg/m{i}.py": python_source(i) for i in range(16)}
+    return write_tree(tmp_path / "corpus", files), files
+
+
+@pytest.fixture
+def word_encoding(corpus):
+    """
+    An encoding with one token per cl100k_base pre-token of the corpus, so
+    counts behave like those of a real vocabulary.
+    """
+    ranks = {bytes([i]): i for i in range(256)}
+    for text in corpus[1].values():
+        for piece in regex.findall(CL100K_PATTERN, text):
+            piece = piece.encode()
+            for end in range(2, len(piece) + 1):
+                ranks.setdefault(piece[:end], len(ranks))
+    return tiktoken.Encoding(
+        name="words", pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={}
+    )
+
+
+@pytest.fixture
+def encoded(word_encoding, monkeypatch):
+    """Records every text the word encoding encodes."""
+    texts = []
+    encode_ordinary = word_encoding.encode_ordinary
+
+    def recording_encode_ordinary(text):
+        texts.append(text)
+        return encode_ordinary(text)
+
+    monkeypatch.setattr(word_encoding, "encode_ordinary", recording_encode_ordinary)
+    return texts
+
+
+def test_calibrated_estimate_is_within_tolerance(corpus, word_encoding):
+    root, files = corpus
+    counter = TokenCounter(str(root), tokenizer=word_encoding, estimate=True)
+    counts = counter.count_all_files()
+
+    estimated = 0
+    for path, text in files.items():
+        file_path = str(root / path)
+        exact = len(word_encoding.encode_ordinary(text))
+        assert abs(counts[file_path] - exact) <= ESTIMATE_TOLERANCE * exact
+        estimated += counter.estimate_errors[file_path] > 0
+    assert estimated == len(files) // 2
+
+
+def assert_only_calibration_encoded(counter, files, encoded):
+    """Checks that only the files counted for the calibration were encoded."""
+    root = counter.file_getter.repo_path
+    calibrated = {
+        files[os.path.relpath(file_path, root).replace(os.sep, "/")]
+        for file_path, error in counter.estimate_errors.items()
+        if error == 0
+    }
+    assert len(calibrated) < len(files)
+    assert sorted(encoded) == sorted(calibrated)
+
+
+def test_estimate_never_encodes(corpus, word_encoding, encoded):
+    root, files = corpus
+    counter = TokenCounter(str(root), tokenizer=word_encoding, estimate=True)
+    counter.count_all_files()
+    assert_only_calibration_encoded(counter, files, encoded)
+
+    encoded.clear()
+    counter.estimate_tokens_in_file("pkg/m0.py")
+    counter.handle_change(FileChange(MODIFIED, "pkg/m1.py", str(root / "pkg/m1.py")))
+    assert encoded == []
+
+
+def test_async_estimate_never_encodes(corpus, word_encoding, encoded):
+    root, files = corpus
+    counter = TokenCounter(str(root), tokenizer=word_encoding, estimate=True)
+    token_counts = asyncio.run(AsyncTokenCounter(counter).count_all_files())
+
+    assert len(token_counts) == len(files)
+    assert_only_calibration_encoded(counter, files, encoded)
+
+
+@pytest.mark.parametrize("num_threads", [1, 2])
+@pytest.mark.parametrize("cached", [False, True])
+def test_counts_keep_listing_order(tree, tmp_path, num_threads, cached):
+    cache = ResultCache(tmp_path / "cache" / "results.db") if cached else None
+    counter = TokenCounter(
+        str(tree),
+        max_file_size=1000,
+        result_cache=cache,
+        tokenizer=BYTE_ENCODING,
+        num_threads=num_threads,
+    )
+    listing = counter.file_getter.get_file_paths()
+    # Twice, so the second run takes counts from the cache, if there is one
+    for _ in range(2):
+        assert list(counter.count_all_files()) == listing
+        assert list(counter.count_all_encodings()) == listing
+    if cache is not None:
+        cache.close()
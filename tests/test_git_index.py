@@ -0,0 +1,113 @@
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from file_getter import FileGetter
+from git_index import read_git_index
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def make_repo(root: Path, files: dict) -> Path:
+    git(root, "init", "-q")
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+    git(root, "add", "-A")
+    return root
+
+
+FILES = {
+    "a.py": "print(1)\n",
+    "keep/sub/k.py": "k = 1\n",
+    "keep/sub/deeper/x.txt": "x\n",
+    "docs/readme.md": "# docs\n",
+    "z.txt": "z\n",
+}
+
+
+@pytest.mark.parametrize("version", ["2", "3", "4"])
+def test_read_git_index_matches_ls_files(tmp_path, version):
+    repo = make_repo(tmp_path, FILES)
+    git(repo, "update-index", "--index-version", version)
+    os.symlink("a.py", repo / "link.py")
+    git(repo, "add", "link.py")
+
+    expected = []
+    for line in git(repo, "ls-files", "-s").splitlines():
+        info, path = line.split("\t")
+        mode, oid, _stage = info.split()
+        expected.append((path, int(mode, 8), oid))
+
+    entries = read_git_index(repo / ".git")
+    assert [(e.path, e.mode, e.hexsha) for e in entries] == expected
+    assert [e.path for e in entries if e.is_symlink] == ["link.py"]
+    sizes = {e.path: e.size for e in entries}
+    assert sizes["a.py"] == len(FILES["a.py"])
+
+
+def test_read_git_index_rejects_garbage(tmp_path):
+    (tmp_path / "index").write_bytes(b"DIRC\x00\x00\x00\x02\x00\x00\x00\x05")
+    with pytest.raises(ValueError):
+        read_git_index(tmp_path)
+    (tmp_path / "index").write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        read_git_index(tmp_path)
+
+
+@pytest.mark.parametrize("include_untracked", [True, False])
+def test_git_index_listing_follows_ls_files(tmp_path, include_untracked):
+    repo = make_repo(tmp_path, FILES)
+    (repo / "keep/sub/k.py").unlink()
+    (repo / "new.py").write_text("new\n")
+
+    def getter():
+        return FileGetter(repo, use_git_index=True, include_untracked=include_untracked)
+
+    paths = getter().get_file_paths(relative=True)
+    records = getter().get_file_records()
+    assert paths == [record.path for record in records]
+
+    # As in git ls-files, a deleted file is listed until the deletion is
+    # staged, with the size recorded in the index, and reads as missing
+    tracked = git(repo, "ls-files").splitlines()
+    assert paths == tracked + (["new.py"] if include_untracked else [])
+    sizes = {record.path: record.size for record in records}
+    assert sizes == {path: len(FILES.get(path, "new\n")) for path in paths}
+    assert getter().read_file_text("keep/sub/k.py") is None
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"include_patterns": ["**/*.py"]},
+        {"exclude_patterns": ["keep/sub/", "*.md"]},
+        {"max_depth": 1},
+    ],
+)
+def test_git_index_listing_matches_walk(tmp_path, options):
+    repo = make_repo(
+        tmp_path,
+        {
+            **FILES,
+            "build/out.py": "out\n",
+            "keep/x.pyc": "pyc\n",
+            "keep/sub/__init__.py": "\n",
+            "docs/_build/page.md": "# page\n",
+        },
+    )
+    indexed = FileGetter(repo, use_git_index=True, **options)
+    walked = FileGetter(repo, **options)
+    paths = indexed.get_file_paths(relative=True)
+    assert sorted(paths) == sorted(walked.get_file_paths(relative=True))
+    assert indexed.truncated == walked.truncated
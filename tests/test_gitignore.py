@@ -0,0 +1,148 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from file_getter import FileGetter
+from gitignore import GitIgnoreMatcher, GitIgnoreRule
+
+
+def git_listing(repo: Path) -> list:
+    output = subprocess.run(
+        [
+            "git",
+            "-C",
+            str(repo),
+            "-c",
+            "core.excludesFile=/dev/null",
+            "ls-files",
+            "-co",
+            "--exclude-standard",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return sorted(output.splitlines())
+
+
+IGNORE_FILES = {
+    ".gitignore": "\n".join(
+        [
+            "# comment",
+            "*.tmp",
+            "!keep.tmp",
+            "/top.txt",
+            "build/",
+            "docs/**/*.draft",
+            "**/cache",
+            "a?c.py",
+            "[xy]z.py",
+            "trailing.py   ",
+            "\\#hash.py",
+            "",
+        ]
+    ),
+    "src/.gitignore": "gen/\n!build/\n/local.py\n*.txt\n!notes.txt\n",
+    "src/deep/.gitignore": "!*.tmp\nonly_here.py\n",
+}
+
+FILES = [
+    "main.py",
+    "top.txt",
+    "sub/top.txt",
+    "x.tmp",
+    "keep.tmp",
+    "build/out.py",
+    "sub/build/out.py",
+    "docs/a/b/page.draft",
+    "docs/page.draft",
+    "docs/page.md",
+    "cache/c.py",
+    "sub/cache/c.py",
+    "abc.py",
+    "abbc.py",
+    "xz.py",
+    "zz.py",
+    "trailing.py",
+    "#hash.py",
+    "src/gen/g.py",
+    "src/build/b.py",
+    "src/local.py",
+    "src/deep/local.py",
+    "src/a.txt",
+    "src/notes.txt",
+    "src/deep/d.tmp",
+    "src/deep/only_here.py",
+    "only_here.py",
+]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    for path, content in IGNORE_FILES.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+    for path in FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(f"# {path}\n")
+    return tmp_path
+
+
+def test_listing_matches_git(repo):
+    listed = FileGetter(repo).get_file_paths(relative=True)
+    assert sorted(listed) == git_listing(repo)
+
+
+def test_parallel_listing_matches_git(repo):
+    listed = FileGetter(repo, walk_threads=4).get_file_paths(relative=True)
+    assert sorted(listed) == git_listing(repo)
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("", None),
+        ("# comment", None),
+        ("/", None),
+        ("*.py", ("*.py", False, False, False)),
+        ("!keep.py", ("keep.py", True, False, False)),
+        ("build/", ("build", False, True, False)),
+        ("/top", ("top", False, False, True)),
+        ("a/b", ("a/b", False, False, True)),
+        ("name   ", ("name", False, False, False)),
+        ("name\\ ", ("name\\ ", False, False, False)),
+    ],
+)
+def test_parse(line, expected):
+    rule = GitIgnoreRule.parse(line)
+    if expected is None:
+        assert rule is None
+    else:
+        assert (rule.pattern, rule.negated, rule.dir_only, rule.anchored) == expected
+
+
+@pytest.mark.parametrize(
+    "relative_path, is_dir, expected",
+    [
+        ("x.log", False, True),
+        ("a/b/x.log", False, True),
+        ("important.log", False, False),
+        ("build", True, True),
+        ("build", False, None),
+        ("a/build", True, True),
+        ("top.txt", False, True),
+        ("a/top.txt", False, None),
+        ("doc/a/b/c.md", False, True),
+        ("doc/c.md", False, True),
+        ("docs/c.md", False, None),
+        ("main.py", False, None),
+    ],
+)
+def test_match(relative_path, is_dir, expected):
+    matcher = GitIgnoreMatcher(
+        ["*.log", "!important.log", "build/", "/top.txt", "doc/**/*.md"]
+    )
+    name = relative_path.rsplit("/", 1)[-1]
+    assert matcher.match(relative_path, name, is_dir) is expected
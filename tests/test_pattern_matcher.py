@@ -0,0 +1,128 @@
+import pytest
+
+from file_getter import FileGetter
+from pattern_matcher import PatternMatcher, expand_braces
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("*.py", ["*.py"]),
+        ("*.{py,md}", ["*.py", "*.md"]),
+        ("{a,b}/{c,d}", ["a/c", "a/d", "b/c", "b/d"]),
+        (
+            "src/{app,lib/{io,net}}/*.py",
+            ["src/app/*.py", "src/lib/io/*.py", "src/lib/net/*.py"],
+        ),
+        ("{a,a}", ["a"]),
+        ("x{a}", ["x{a}"]),
+        ("{a,b", ["{a,b"]),
+        ("\\{a,b}", ["\\{a,b}"]),
+    ],
+)
+def test_expand_braces(pattern, expected):
+    assert expand_braces(pattern) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, relative_path, is_dir, expected",
+    [
+        # Brace alternatives, nested too
+        ("*.{py,md}", "a/b.py", False, True),
+        ("*.{py,md}", "a/b.md", False, True),
+        ("*.{py,md}", "a/b.txt", False, False),
+        ("src/{app,lib/{io,net}}/*.py", "src/app/x.py", False, True),
+        ("src/{app,lib/{io,net}}/*.py", "src/lib/net/x.py", False, True),
+        ("src/{app,lib/{io,net}}/*.py", "src/lib/x.py", False, False),
+        ("src/{app,lib/{io,net}}/*.py", "src/lib/fs/x.py", False, False),
+        ("\\{a,b}", "{a,b}", False, True),
+        ("\\{a,b}", "a", False, False),
+        # "**/" at the start, in the middle and at the end
+        ("**/test_*.py", "test_a.py", False, True),
+        ("**/test_*.py", "a/b/test_a.py", False, True),
+        ("src/**/*.py", "src/a.py", False, True),
+        ("src/**/*.py", "src/a/b/c.py", False, True),
+        ("src/**/*.py", "lib/src/a.py", False, False),
+        ("docs/**", "docs/a/b.md", False, True),
+        ("docs/**", "docs", True, False),
+        ("docs/**", "docsx/a.md", False, False),
+        # "*" and "?" do not cross "/"
+        ("src/*.py", "src/a.py", False, True),
+        ("src/*.py", "src/a/b.py", False, False),
+        ("a*b", "a/b", False, False),
+        ("a?b", "a/b", False, False),
+        # Patterns without "/" match names at any depth
+        ("*.py", "a/b/c.py", False, True),
+        ("main.py", "a/main.py", False, True),
+        # A trailing "/" matches directories only
+        ("build/", "build", True, True),
+        ("build/", "x/build", True, True),
+        ("build/", "build", False, False),
+        ("/out/", "out", True, True),
+        ("/out/", "x/out", True, False),
+        ("out/*/", "out/a", True, True),
+        ("out/*/", "out/a", False, False),
+    ],
+)
+def test_match(pattern, relative_path, is_dir, expected):
+    assert PatternMatcher([pattern]).matches(relative_path, is_dir) is expected
+
+
+@pytest.mark.parametrize(
+    "patterns, directory, expected",
+    [
+        (["src/**/*.py", "docs/*.md"], "src/", True),
+        (["src/**/*.py", "docs/*.md"], "src/a/b/", True),
+        (["src/**/*.py", "docs/*.md"], "docs/", True),
+        (["src/**/*.py", "docs/*.md"], "lib/", False),
+        (["src/**/*.py", "docs/*.md"], "do/", False),
+        (["src/app/*.py"], "src/", True),
+        (["src/app/*.py"], "src/lib/", False),
+        (["*.py"], "lib/", True),
+        (["**/x.py"], "lib/", True),
+    ],
+)
+def test_can_match_under(patterns, directory, expected):
+    assert PatternMatcher(patterns).can_match_under(directory) is expected
+
+
+FILES = [
+    "main.py",
+    "README.md",
+    "src/a.py",
+    "src/app/b.py",
+    "src/app/b.txt",
+    "src/lib/io/c.py",
+    "src/lib/net/d.py",
+    "src/lib/fs/e.py",
+    "docs/index.md",
+    "docs/api/f.md",
+    "lib/src/g.py",
+    "tests/test_h.py",
+    "tests/unit/test_i.py",
+]
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        ["src/**/*.py"],
+        ["src/{app,lib/{io,net}}/*.py"],
+        ["docs/*.md", "**/test_*.py"],
+        ["*.md"],
+        ["/main.py", "src/app/"],
+        ["tests/**"],
+    ],
+)
+def test_include_pruning_matches_unpruned_walk(tmp_path, patterns):
+    for path in FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(f"# {path}\n")
+
+    matcher = PatternMatcher(patterns)
+    everything = FileGetter(tmp_path).get_file_paths(relative=True)
+    unpruned = [path for path in everything if matcher.matches(path)]
+    listed = FileGetter(tmp_path, include_patterns=patterns).get_file_paths(
+        relative=True
+    )
+    assert sorted(listed) == sorted(unpruned)
@@ -0,0 +1,42 @@
+import pytest
+
+from file_getter import DEFAULT_MMAP_THRESHOLD, FileGetter
+
+
+@pytest.fixture
+def big_file(tmp_path):
+    content = bytes(range(256)) * ((DEFAULT_MMAP_THRESHOLD + (1 << 20)) // 256)
+    (tmp_path / "big.bin").write_bytes(content)
+    return tmp_path, content
+
+
+@pytest.mark.parametrize("mmap_threshold", [None, DEFAULT_MMAP_THRESHOLD, 1])
+def test_join(big_file, mmap_threshold):
+    root, content = big_file
+    chunks = FileGetter(root).read_file_stream("big.bin", mmap_threshold=mmap_threshold)
+    assert b"".join(chunks) == content
+
+
+@pytest.mark.parametrize("mmap_threshold", [None, DEFAULT_MMAP_THRESHOLD, 1])
+def test_chunks_stay_valid(big_file, mmap_threshold):
+    root, content = big_file
+    chunks = list(
+        FileGetter(root).read_file_stream(
+            "big.bin", chunk_size=1 << 20, mmap_threshold=mmap_threshold
+        )
+    )
+    assert len(chunks) == len(content) >> 20
+    assert [bytes(chunk) for chunk in chunks] == [
+        content[offset : offset + (1 << 20)]
+        for offset in range(0, len(content), 1 << 20)
+    ]
+
+
+def test_yields_bytes_by_default(big_file):
+    root, _ = big_file
+    chunks = FileGetter(root).read_file_stream("big.bin")
+    assert all(type(chunk) is bytes for chunk in chunks)
+
+
+def test_missing_file(tmp_path):
+    assert FileGetter(tmp_path).read_file_stream("missing.bin") is None
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from result_cache import ResultCache
+
+
+def put_sized(cache, key, size):
+    """Stores a result of the given accounted size under key."""
+    cache.put("k", key, "x" * (size - len("k") - len(key) - 2))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "results.db", max_bytes=350)
+    for key in "abc":
+        put_sized(cache, key, 100)
+    cache.flush()
+    assert cache.get("k", "a") is not None
+    # Records the use of "a", so "b" is now the least recently used
+    cache.flush()
+
+    put_sized(cache, "d", 100)
+    cache.flush()
+
+    assert cache.get("k", "b") is None
+    for key in "acd":
+        assert cache.get("k", key) is not None
+    cache.close()
+
+
+def test_unbounded_cache_keeps_everything(tmp_path):
+    cache = ResultCache(tmp_path / "results.db", max_bytes=None)
+    for key in "abcdef":
+        put_sized(cache, key, 1000)
+    cache.flush()
+    assert all(cache.get("k", key) is not None for key in "abcdef")
+    cache.close()
+
+
+def test_reopen_after_close(tmp_path):
+    path = tmp_path / "cache" / "results.db"
+    cache = ResultCache(path)
+    cache.put("count:bytes", "digest", 42)
+    cache.put("imports", "digest", ["os", "sys"])
+    cache.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.get("count:bytes", "digest")
+
+    reopened = ResultCache(path)
+    assert reopened.get("count:bytes", "digest") == 42
+    assert reopened.get("imports", "digest") == ["os", "sys"]
+    assert reopened.get("count:bytes", "other") is None
+    reopened.close()
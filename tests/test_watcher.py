@@ -0,0 +1,164 @@
+import errno
+import sys
+import threading
+import time
+
+import pytest
+
+import watcher
+from file_getter import FileGetter
+from watcher import CREATED, DELETED
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+
+BACKENDS = [
+    pytest.param(True, id="inotify", marks=linux_only),
+    pytest.param(False, id="polling"),
+]
+
+
+class Changes:
+    """Collects the changes reported to a subscriber."""
+
+    def __init__(self) -> None:
+        self.changes = []
+        self._condition = threading.Condition()
+
+    def __call__(self, change) -> None:
+        with self._condition:
+            self.changes.append((change.kind, change.path))
+            self._condition.notify_all()
+
+    def wait_for(self, kind: str, path: str, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while (kind, path) not in self.changes:
+                remaining = deadline - time.monotonic()
+                assert remaining > 0, f"no {kind} {path} in {self.changes}"
+                self._condition.wait(remaining)
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """Starts watching a FileGetter and stops it after the test."""
+    getters = []
+
+    def watch(use_inotify: bool, **kwargs):
+        file_getter = FileGetter(tmp_path, **kwargs)
+        changes = Changes()
+        file_getter.subscribe(changes)
+        file_getter.watch(poll_interval=0.05, use_inotify=use_inotify)
+        getters.append(file_getter)
+        return file_getter, changes
+
+    yield watch
+    for file_getter in getters:
+        file_getter.stop_watching()
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_created_directory_respects_max_depth(tmp_path, watched, use_inotify):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.py").write_text("x = 1\n")
+    file_getter, changes = watched(use_inotify, max_depth=1)
+
+    (tmp_path / "a" / "deep").mkdir()
+    (tmp_path / "a" / "deep" / "n.py").write_text("n = 1\n")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "y.py").write_text("y = 1\n")
+    # Events arrive in order, so the deep file has been handled by now
+    changes.wait_for(CREATED, "b/y.py")
+
+    assert sorted(file_getter.get_file_paths(relative=True)) == ["a/x.py", "b/y.py"]
+    assert (CREATED, "a/deep/n.py") not in changes.changes
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_file_changes(tmp_path, watched, use_inotify):
+    (tmp_path / "old.py").write_text("x = 1\n")
+    (tmp_path / "gone.py").write_text("x = 1\n")
+    file_getter, changes = watched(use_inotify)
+    assert file_getter._watcher.uses_inotify is use_inotify
+
+    (tmp_path / "new.py").write_text("x = 1\n")
+    (tmp_path / "gone.py").unlink()
+    (tmp_path / "old.py").rename(tmp_path / "renamed.py")
+    changes.wait_for(CREATED, "new.py")
+    changes.wait_for(DELETED, "gone.py")
+    changes.wait_for(DELETED, "old.py")
+    changes.wait_for(CREATED, "renamed.py")
+
+    assert sorted(file_getter.get_file_paths(relative=True)) == [
+        "new.py",
+        "renamed.py",
+    ]
+
+
+@pytest.mark.parametrize("use_inotify", BACKENDS)
+def test_directory_changes(tmp_path, watched, use_inotify):
+    for name in ["old/a.py", "old/sub/b.py", "gone/c.py"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("x = 1\n")
+    file_getter, changes = watched(use_inotify)
+
+    (tmp_path / "new" / "sub").mkdir(parents=True)
+    (tmp_path / "new" / "sub" / "d.py").write_text("x = 1\n")
+    (tmp_path / "gone" / "c.py").unlink()
+    (tmp_path / "gone").rmdir()
+    (tmp_path / "old").rename(tmp_path / "renamed")
+    changes.wait_for(CREATED, "new/sub/d.py")
+    changes.wait_for(DELETED, "gone/c.py")
+    changes.wait_for(DELETED, "old/sub/b.py")
+    changes.wait_for(CREATED, "renamed/sub/b.py")
+
+    assert sorted(file_getter.get_file_paths(relative=True)) == [
+        "new/sub/d.py",
+        "renamed/a.py",
+        "renamed/sub/b.py",
+    ]
+
+
+def fail_watches(monkeypatch, name: str) -> None:
+    """Makes adding an inotify watch fail with ENOSPC below directory name."""
+    add_watch = watcher._Inotify.add_watch
+
+    def limited_add_watch(self, path, mask):
+        if name in path.split("/"):
+            raise OSError(errno.ENOSPC, "No space left on device", path)
+        return add_watch(self, path, mask)
+
+    monkeypatch.setattr(watcher._Inotify, "add_watch", limited_add_watch)
+
+
+@linux_only
+def test_watch_failure_at_start_polls(tmp_path, watched, monkeypatch, capsys):
+    (tmp_path / "full").mkdir()
+    (tmp_path / "full" / "a.py").write_text("x = 1\n")
+    fail_watches(monkeypatch, "full")
+    file_getter, changes = watched(True)
+
+    assert not file_getter._watcher.uses_inotify
+    assert "polling" in capsys.readouterr().err
+    assert file_getter.get_file_paths(relative=True) == ["full/a.py"]
+    (tmp_path / "full" / "b.py").write_text("x = 1\n")
+    changes.wait_for(CREATED, "full/b.py")
+
+
+@linux_only
+def test_watch_failure_while_watching_polls(tmp_path, watched, monkeypatch, capsys):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    fail_watches(monkeypatch, "full")
+    file_getter, changes = watched(True)
+    assert file_getter._watcher.uses_inotify
+
+    (tmp_path / "full").mkdir()
+    (tmp_path / "full" / "b.py").write_text("x = 1\n")
+    changes.wait_for(CREATED, "full/b.py")
+    (tmp_path / "a.py").unlink()
+    changes.wait_for(DELETED, "a.py")
+
+    assert not file_getter._watcher.uses_inotify
+    assert "polling" in capsys.readouterr().err
+    assert file_getter.get_file_paths(relative=True) == ["full/b.py"]